@@ -0,0 +1,6 @@
+"""
+Micro-benchmarks for AST hot paths.
+
+Run using ``tox -e benchmark`` or ``pytest benchmark`` (requires
+`pytest-benchmark <https://pypi.org/project/pytest-benchmark/>`_).
+"""
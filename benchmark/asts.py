@@ -0,0 +1,151 @@
+"""
+Synthesize pandoc ASTs of realistic sizes.
+
+Sections mix headers, paragraphs of text with inline markup, cards, exercises,
+images, lists, index terms and TikZ figures in roughly the proportions found in
+real courses. Output is deterministic for a given size and seed.
+"""
+
+from random import Random
+
+#: Number of top-level blocks per benchmark size
+SIZES = {"small": 20, "medium": 200, "large": 2000}
+
+#: Static files referenced by images
+STATIC_FILES = tuple(f"figure-{num}.png" for num in range(10))
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua enim ad minim veniam "
+    "quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo "
+    "consequat duis aute irure in reprehenderit voluptate velit esse cillum "
+    "fugiat nulla pariatur excepteur sint occaecat cupidatat non proident"
+).split()
+
+TIKZ_CODE = r"""\begin{tikzpicture}
+\draw[thick] (0,0) -- (0,{num}) -- (1,3.25) -- (2,2) -- (2,0) -- cycle;
+\end{tikzpicture}"""
+
+
+def _attr(identifier="", classes=None, attributes=None):
+    return [identifier, classes or [], attributes or []]
+
+
+class _SectionBuilder:
+    def __init__(self, seed):
+        self._random = Random(seed)
+        self._count = 0
+
+    def _words(self, num):
+        inlines = []
+        for word in self._random.choices(WORDS, k=num):
+            if inlines:
+                inlines.append({"t": "Space"})
+            inlines.append({"t": "Str", "c": word})
+        return inlines
+
+    def _inline(self):
+        kind = self._random.randrange(20)
+        if kind == 0:
+            return {"t": "Emph", "c": self._words(2)}
+        if kind == 1:
+            return {"t": "Strong", "c": self._words(2)}
+        if kind == 2:
+            return {"t": "Math", "c": [{"t": "InlineMath"}, r"\sum_{i=1}^n x_i^2"]}
+        if kind == 3:
+            return {
+                "t": "Link",
+                "c": [_attr(), self._words(2), ["https://www.example.com/", ""]],
+            }
+        if kind == 4:
+            term = " ".join(self._random.choices(WORDS, k=2))
+            attr = _attr(attributes=[["data-index-term", term]])
+            return {"t": "Span", "c": [attr, self._words(2)]}
+        return None
+
+    def para(self, num_words=60):
+        """Create a paragraph with text and inline markup."""
+        content = []
+        for _ in range(num_words // 5):
+            if content:
+                content.append({"t": "Space"})
+            content.extend(self._words(5))
+            inline = self._inline()
+            if inline:
+                content += [{"t": "Space"}, inline]
+        return {"t": "Para", "c": content}
+
+    def header(self):
+        """Create a header."""
+        level = self._random.choice((2, 3))
+        return {"t": "Header", "c": [level, _attr(), self._words(4)]}
+
+    def card(self):
+        """Create an example or info card."""
+        card_class = self._random.choice(("example", "info"))
+        content = [self.para(30) for _ in range(self._random.randint(1, 3))]
+        return {"t": "Div", "c": [_attr(classes=[card_class]), content]}
+
+    def exercise(self):
+        """Create an exercise with questions."""
+        self._count += 1
+        content = [self.para(20)]
+        for _ in range(self._random.randint(1, 4)):
+            question = {
+                "t": "Span",
+                "c": [
+                    _attr(classes=["question"], attributes=[["points", "2"]]),
+                    self._words(3),
+                ],
+            }
+            content.append({"t": "Para", "c": [question]})
+        attr = _attr(f"exercise-{self._count}", ["exercise"])
+        return {"t": "Div", "c": [attr, content]}
+
+    def image(self):
+        """Create a paragraph containing an image."""
+        path = f"/{self._random.choice(STATIC_FILES)}"
+        image = {"t": "Image", "c": [_attr(), self._words(3), [path, ""]]}
+        return {"t": "Para", "c": [image]}
+
+    def bullet_list(self):
+        """Create a bullet list."""
+        items = [[self.para(10)] for _ in range(self._random.randint(2, 5))]
+        return {"t": "BulletList", "c": items}
+
+    def tikz_figure(self):
+        """Create a figure with caption and TikZ code."""
+        self._count += 1
+        code = TIKZ_CODE.replace("{num}", str(self._count))
+        code_block = {"t": "CodeBlock", "c": [_attr(classes=["tikz"]), code]}
+        caption = {"t": "Para", "c": self._words(6)}
+        return {"t": "Div", "c": [_attr(classes=["figure"]), [caption, code_block]]}
+
+    def block(self, num):
+        """Create block number ``num`` of a section."""
+        for interval, factory in (
+            (40, self.tikz_figure),
+            (25, self.exercise),
+            (20, self.bullet_list),
+            (15, self.image),
+            (10, self.card),
+            (8, self.header),
+        ):
+            if num % interval == interval - 1:
+                return factory()
+        return self.para()
+
+
+def make_section_ast(num_blocks, seed=0):
+    """
+    Create a section AST.
+
+    :param num_blocks: Number of top-level blocks
+    :type num_blocks: int
+    :param seed: Random seed
+    :type seed: int
+
+    :rtype: list of dicts
+    """
+    builder = _SectionBuilder(seed)
+    return [builder.header()] + [builder.block(num) for num in range(num_blocks - 1)]
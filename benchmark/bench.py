@@ -0,0 +1,345 @@
+"""
+Compare build performance against stored baselines.
+
+Runs a fixed set of scenarios on generated courses (see
+:mod:`benchmark.course`) and measures the phases of
+:meth:`InnoconvRunner.run <innoconv.runner.InnoconvRunner.run>`. Results are
+stored as JSON baselines. A later run (e.g. of a new innoconv release) is
+compared against a baseline, printing per-phase deltas.
+
+.. code-block:: console
+
+  $ python -m benchmark.bench run --output baseline.json
+  $ pip install innoconv==NEW_VERSION
+  $ python -m benchmark.bench compare baseline.json
+
+By default external tools are replaced by the fake toolchain (see
+:mod:`benchmark.toolchain`) so only the Python side is compared. Use
+``--real-tools`` to include pandoc and LaTeX.
+
+A phase counts as regressed if its mean time grew by more than the threshold
+*and* the difference is significant according to Welch's t-test, so noisy
+phases don't fail the comparison. Differences of a few milliseconds are
+ignored.
+"""
+
+from contextlib import ExitStack
+import json
+from math import sqrt
+from os.path import join
+import platform
+from shutil import rmtree
+from statistics import mean, stdev
+import sys
+from tempfile import TemporaryDirectory
+import time
+
+import click
+
+from benchmark.course import CourseSpec, generate_course
+from benchmark.toolchain import fake_toolchain
+from innoconv.constants import CONTENT_BASENAME, DEFAULT_EXTENSIONS
+from innoconv.manifest import Manifest
+from innoconv.metadata import __version__
+from innoconv.runner import InnoconvRunner
+
+# baselines are also taken of releases without these features
+try:
+    from innoconv.depgraph import DependencyGraph
+except ImportError:  # pragma: no cover
+    DependencyGraph = None
+try:
+    from innoconv.instrumentation import add_recorder, remove_recorder
+    from innoconv.instrumentation.abstract import AbstractRecorder
+except ImportError:  # pragma: no cover
+    add_recorder = remove_recorder = None
+    AbstractRecorder = object
+
+#: Benchmark scenarios (course spec and whether to rebuild a single change)
+SCENARIOS = {
+    "full": ({"depth": 3, "breadth": 5}, False),
+    "incremental": ({"depth": 3, "breadth": 5}, True),
+    "tikz": ({"depth": 2, "breadth": 4, "tikz": 10}, False),
+    "static": (
+        {"depth": 2, "breadth": 4, "images": 10, "static_files": 200},
+        False,
+    ),
+}
+
+#: Phases of the runner (``run`` is the whole build)
+PHASES = (
+    "run",
+    "preflight",
+    "start",
+    "pre_conversion",
+    "convert",
+    "post_conversion",
+    "finish",
+)
+
+#: Differences of mean durations below this (in seconds) are ignored
+MIN_DIFFERENCE = 0.01
+
+#: Minimal absolute t-statistic for a significant difference (about 95%)
+T_CRITICAL = 2.0
+
+
+class PhaseTimes(AbstractRecorder):
+    """Record wall time of runner phases (summed over languages)."""
+
+    def __init__(self):
+        """Initialize PhaseTimes."""
+        self.phases = dict.fromkeys(PHASES, 0.0)
+
+    def span_finished(self, span):
+        """Add span duration to its phase (phases of other versions are ignored)."""
+        if span.category == "runner" and span.name in self.phases:
+            self.phases[span.name] += span.wall
+
+
+def _build(source_dir, output_dir):
+    manifest = Manifest.from_directory(source_dir)
+    options = {}
+    if DependencyGraph is not None:
+        # like the innoconv command, so the incremental scenario measures
+        # incremental builds
+        options["depgraph"] = DependencyGraph.load(source_dir, output_dir)
+    runner = InnoconvRunner(
+        source_dir, output_dir, manifest, DEFAULT_EXTENSIONS, **options
+    )
+    if add_recorder is None:
+        # without instrumentation only the whole build can be measured
+        start = time.perf_counter()
+        runner.run()
+        return {"run": time.perf_counter() - start}
+    recorder = PhaseTimes()
+    add_recorder(recorder)
+    try:
+        runner.run()
+    finally:
+        remove_recorder(recorder)
+    return recorder.phases
+
+
+def _change_section(source_dir, num):
+    """Change a single section (like an author would)."""
+    filepath = join(source_dir, "en", "1-section", f"{CONTENT_BASENAME}.md")
+    with open(filepath, "a", encoding="utf-8") as content_file:
+        content_file.write(f"\nChange number {num}.\n")
+
+
+def run_scenario(name, repeat, tmp_dir):
+    """
+    Run a scenario repeatedly.
+
+    :param name: Scenario name (see :data:`SCENARIOS`)
+    :type name: str
+    :param repeat: Number of measured builds
+    :type repeat: int
+    :param tmp_dir: Folder for course and output
+    :type tmp_dir: str
+
+    :returns: Phase name mapped to the list of measured durations
+    :rtype: dict
+    """
+    spec_options, incremental = SCENARIOS[name]
+    source_dir = join(tmp_dir, name, "course")
+    output_dir = join(tmp_dir, name, "output")
+    generate_course(source_dir, CourseSpec(**spec_options))
+    samples = {}
+    if incremental:
+        _build(source_dir, output_dir)
+    for num in range(repeat):
+        if incremental:
+            _change_section(source_dir, num)
+        else:
+            rmtree(output_dir, ignore_errors=True)
+        for phase, duration in _build(source_dir, output_dir).items():
+            samples.setdefault(phase, []).append(duration)
+    return samples
+
+
+def run_scenarios(scenarios, repeat, real_tools=False):
+    """
+    Run scenarios and return results ready to be stored as JSON.
+
+    :param scenarios: Scenario names
+    :type scenarios: list[str]
+    :param repeat: Number of measured builds per scenario
+    :type repeat: int
+    :param real_tools: Use real pandoc and LaTeX
+    :type real_tools: bool
+
+    :rtype: dict
+    """
+    results = {
+        "innoconv_version": __version__,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.time(),
+        "real_tools": real_tools,
+        "scenarios": {},
+    }
+    with ExitStack() as stack:
+        tmp_dir = stack.enter_context(TemporaryDirectory(prefix="innoconv-bench-"))
+        if not real_tools:
+            stack.enter_context(fake_toolchain())
+        for name in scenarios:
+            click.echo(f"Running scenario {name}...", err=True)
+            results["scenarios"][name] = run_scenario(name, repeat, tmp_dir)
+    return results
+
+
+def compare_samples(baseline, current, threshold):
+    """
+    Compare two lists of durations.
+
+    :param baseline: Baseline durations
+    :type baseline: list[float]
+    :param current: Current durations
+    :type current: list[float]
+    :param threshold: Relative change that is considered relevant
+    :type threshold: float
+
+    :returns: Relative change of the mean and verdict (``"regression"``,
+              ``"improvement"`` or ``""``)
+    :rtype: (float, str)
+    """
+    base_mean, cur_mean = mean(baseline), mean(current)
+    delta = (cur_mean - base_mean) / base_mean if base_mean else 0.0
+    if abs(delta) <= threshold or abs(cur_mean - base_mean) < MIN_DIFFERENCE:
+        return delta, ""
+    # Welch's t-test (needs at least two samples each)
+    if len(baseline) > 1 and len(current) > 1:
+        std_err = sqrt(
+            stdev(baseline) ** 2 / len(baseline) + stdev(current) ** 2 / len(current)
+        )
+        if std_err and abs(cur_mean - base_mean) / std_err < T_CRITICAL:
+            return delta, ""
+    return delta, "regression" if delta > 0 else "improvement"
+
+
+def compare_results(baseline, current, threshold):
+    """
+    Compare results of two runs.
+
+    :param baseline: Baseline results (see :func:`run_scenarios`)
+    :type baseline: dict
+    :param current: Current results
+    :type current: dict
+    :param threshold: Relative change that is considered relevant
+    :type threshold: float
+
+    :returns: Rows of scenario, phase, baseline mean, current mean, relative
+              change and verdict
+    :rtype: list[tuple]
+    """
+    rows = []
+    for name, phases in current["scenarios"].items():
+        try:
+            base_phases = baseline["scenarios"][name]
+        except KeyError:
+            continue
+        for phase in PHASES:
+            # phases can be missing in results of other versions
+            if phase not in base_phases or phase not in phases:
+                continue
+            base, cur = base_phases[phase], phases[phase]
+            delta, verdict = compare_samples(base, cur, threshold)
+            rows.append((name, phase, mean(base), mean(cur), delta, verdict))
+    return rows
+
+
+def _format_rows(rows):
+    lines = [
+        f"{'scenario':<12} {'phase':<16} {'baseline':>9} {'current':>9} {'delta':>8}"
+    ]
+    for name, phase, base, cur, delta, verdict in rows:
+        lines.append(
+            f"{name:<12} {phase:<16} {base:8.3f}s {cur:8.3f}s {delta:+8.1%}  {verdict}"
+        )
+    return "\n".join(lines)
+
+
+def _load(path):
+    with open(path, encoding="utf-8") as in_file:
+        return json.load(in_file)
+
+
+@click.group()
+def cli():
+    """Compare build performance against stored baselines."""
+
+
+_scenario_option = click.option(
+    "-s",
+    "--scenario",
+    "scenarios",
+    type=click.Choice(list(SCENARIOS)),
+    multiple=True,
+    help="Run only this scenario (repeatable).  [default: all]",
+)
+_repeat_option = click.option(
+    "--repeat", default=5, show_default=True, help="Number of builds per scenario."
+)
+_real_tools_option = click.option(
+    "--real-tools", is_flag=True, help="Use real pandoc and LaTeX."
+)
+
+
+@cli.command()
+@_scenario_option
+@_repeat_option
+@_real_tools_option
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, writable=True),
+    required=True,
+    help="Write results to this file.",
+)
+def run(scenarios, repeat, real_tools, output):
+    """Run scenarios and store results as baseline."""
+    results = run_scenarios(scenarios or list(SCENARIOS), repeat, real_tools)
+    with open(output, "w", encoding="utf-8") as out_file:
+        json.dump(results, out_file, indent=2)
+
+
+@cli.command()
+@_scenario_option
+@_repeat_option
+@_real_tools_option
+@click.option(
+    "--threshold",
+    default=0.1,
+    show_default=True,
+    help="Relative slowdown that counts as regression.",
+)
+@click.option(
+    "--current",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Compare stored results instead of running scenarios.",
+)
+@click.argument("baseline", type=click.Path(exists=True, dir_okay=False))
+def compare(  # pylint: disable=too-many-arguments
+    *, scenarios, repeat, real_tools, threshold, current, baseline
+):
+    """Compare a run against a baseline (exit code 1 on regression)."""
+    baseline = _load(baseline)
+    if current:
+        current = _load(current)
+    else:
+        scenarios = scenarios or list(baseline["scenarios"])
+        current = run_scenarios(scenarios, repeat, real_tools)
+    click.echo(
+        f"innoconv {baseline['innoconv_version']} (baseline) -> "
+        f"{current['innoconv_version']} (current)"
+    )
+    rows = compare_results(baseline, current, threshold)
+    click.echo(_format_rows(rows))
+    if any(verdict == "regression" for *_, verdict in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
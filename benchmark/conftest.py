@@ -0,0 +1,62 @@
+"""Fixtures for benchmarks."""
+
+from glob import glob
+import json
+from os.path import basename, join, splitext
+import tracemalloc
+
+import pytest
+
+from benchmark.asts import make_section_ast, SIZES
+from benchmark.record import FIXTURES_DIR
+
+#: Peak memory per benchmark (reported at the end of the session)
+PEAK_MEMORY = {}
+
+
+def _get_asts():
+    asts = {name: make_section_ast(size) for name, size in SIZES.items()}
+    for path in sorted(glob(join(FIXTURES_DIR, "*.json"))):
+        with open(path, encoding="utf-8") as fixture_file:
+            asts[f"recorded-{splitext(basename(path))[0]}"] = json.load(fixture_file)
+    return asts
+
+
+ASTS = _get_asts()
+
+
+@pytest.fixture(params=list(ASTS), name="ast_json")
+def fixture_ast_json(request):
+    """Provide section ASTs as pandoc JSON output."""
+    return json.dumps(ASTS[request.param])
+
+
+@pytest.fixture(name="measure_memory")
+def fixture_measure_memory(request, benchmark):
+    """
+    Provide a function that measures peak memory of a single call.
+
+    The result is stored in the benchmark's ``extra_info`` and reported at the
+    end of the session.
+    """
+
+    def measure_memory(func, *args, **kwargs):
+        tracemalloc.start()
+        try:
+            func(*args, **kwargs)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info["peak_memory"] = peak
+        PEAK_MEMORY[request.node.name] = peak
+
+    return measure_memory
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Report peak memory of benchmarks."""
+    if not PEAK_MEMORY:
+        return
+    terminalreporter.section("peak memory")
+    for name, peak in sorted(PEAK_MEMORY.items()):
+        terminalreporter.write_line(f"{peak / 2**20:10.2f} MiB  {name}")
@@ -0,0 +1,270 @@
+r"""
+Generate synthetic courses of configurable size.
+
+Courses are valid innoconv content: every language has the same section tree,
+sections contain text with index terms, cards, exercises with questions,
+images and Ti\ *k*\Z figures. Static files, custom pages and footer
+fragments are created as well. Output is deterministic for a given seed.
+
+.. code-block:: python
+
+  spec = CourseSpec(depth=4, breadth=10)  # 11111 sections per language
+  generate_course("/tmp/course", spec)
+"""
+
+from os import makedirs
+from os.path import join
+from random import Random
+
+import yaml
+
+from innoconv.constants import (
+    CONTENT_BASENAME,
+    FOOTER_FRAGMENT_PREFIX,
+    MANIFEST_BASENAME,
+    PAGES_FOLDER,
+    STATIC_FOLDER,
+)
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod "
+    "tempor incididunt ut labore et dolore magna aliqua enim ad minim veniam "
+    "quis nostrud exercitation ullamco laboris nisi aliquip ex ea commodo "
+    "consequat duis aute irure in reprehenderit voluptate velit esse cillum "
+    "fugiat nulla pariatur excepteur sint occaecat cupidatat non proident"
+).split()
+
+#: Number of distinct index terms (terms repeat across sections)
+INDEX_VOCABULARY = 200
+
+TIKZ_TEMPLATE = r"""```tikz
+\begin{{tikzpicture}}
+\draw[thick] (0,0) -- (0,{num}) -- (1,3.25) -- (2,2) -- (2,0) -- cycle;
+\node at (1,-0.25) {{{label}}};
+\end{{tikzpicture}}
+```"""
+
+
+class CourseSpec:
+    r"""
+    Size and features of a synthetic course.
+
+    :param languages: Language codes
+    :type languages: tuple[str]
+    :param depth: Depth of the section tree (0 creates the root section only)
+    :type depth: int
+    :param breadth: Number of subsections per section
+    :type breadth: int
+    :param paragraphs: Text paragraphs per section
+    :type paragraphs: int
+    :param cards: Info and example cards per section
+    :type cards: int
+    :param exercises: Exercises per section
+    :type exercises: int
+    :param questions: Questions per exercise
+    :type questions: int
+    :param index_terms: Index terms per section
+    :type index_terms: int
+    :param tikz: Ti\ *k*\Z figures per section
+    :type tikz: int
+    :param images: Images per section
+    :type images: int
+    :param static_files: Number of static files (referenced by images)
+    :type static_files: int
+    :param static_size: Size of every static file in bytes
+    :type static_size: int
+    :param pages: Number of custom pages
+    :type pages: int
+    :param footer: Create footer fragments
+    :type footer: bool
+    :param seed: Random seed
+    :type seed: int
+    """
+
+    defaults = {
+        "languages": ("en", "de"),
+        "depth": 2,
+        "breadth": 3,
+        "paragraphs": 5,
+        "cards": 2,
+        "exercises": 1,
+        "questions": 3,
+        "index_terms": 3,
+        "tikz": 1,
+        "images": 1,
+        "static_files": 10,
+        "static_size": 10000,
+        "pages": 2,
+        "footer": True,
+        "seed": 0,
+    }
+
+    def __init__(self, **options):
+        """Initialize CourseSpec."""
+        for key in options:
+            if key not in self.defaults:
+                raise RuntimeError(f"Unknown course option: {key}")
+        for key, default in self.defaults.items():
+            setattr(self, key, options.get(key, default))
+
+    def section_count(self):
+        """Return number of sections per language (including the root)."""
+        # pylint: disable=no-member
+        return sum(self.breadth**level for level in range(self.depth + 1))
+
+    def to_json(self):
+        """Convert to JSON-serializable dict."""
+        return {key: getattr(self, key) for key in self.defaults}
+
+
+class _SectionWriter:
+    """Create section markdown (identical structure for all languages)."""
+
+    def __init__(self, spec, section_id):
+        self._spec = spec
+        self._section_id = section_id
+        self._random = Random(f"{spec.seed}-{section_id}")
+
+    def _words(self, num):
+        return " ".join(self._random.choices(WORDS, k=num))
+
+    def paragraph(self, index_terms=0):
+        """Create a paragraph with index terms."""
+        sentences = [f"{self._words(12).capitalize()}." for _ in range(4)]
+        for num in range(index_terms):
+            word = self._random.choice(WORDS)
+            term = f"{word} {self._random.randrange(INDEX_VOCABULARY)}"
+            index_term = f'[{term}]{{data-index-term="{term}"}}'
+            sentences[num % 4] = f"{sentences[num % 4][:-1]} {index_term}."
+        return " ".join(sentences)
+
+    def _card(self):
+        card_class = self._random.choice(("example", "info"))
+        return f":::{{.{card_class}}}\n{self.paragraph()}\n:::"
+
+    def _exercise(self, num):
+        exercise_id = f"exercise-{self._section_id}-{num}"
+        questions = "\n\n".join(
+            f"[{self._words(3)}]{{.question points={self._random.randint(1, 4)}}}"
+            for _ in range(self._spec.questions)
+        )
+        return (
+            f":::{{.exercise #{exercise_id}}}\n{self.paragraph()}\n\n{questions}\n:::"
+        )
+
+    def _image(self):
+        filename = f"figure-{self._random.randrange(self._spec.static_files)}.png"
+        return f"![{self._words(3)}](/{filename})"
+
+    def _tikz(self, num):
+        label = f"{self._section_id}-{num}"
+        code = TIKZ_TEMPLATE.format(num=self._random.randint(1, 9), label=label)
+        return f":::{{.figure}}\n{self._words(6)}\n\n{code}\n:::"
+
+    def content(self, title):
+        """Create section content."""
+        spec = self._spec
+        blocks = [
+            f"---\ntitle: {title}\nshort_title: {self._section_id}\n---",
+            f"# {title}",
+        ]
+        # distribute index terms over paragraphs
+        for num in range(spec.paragraphs):
+            terms = len(range(num, spec.index_terms, spec.paragraphs))
+            blocks.append(self.paragraph(terms))
+        blocks += [self._card() for _ in range(spec.cards)]
+        blocks += [self._exercise(num) for num in range(spec.exercises)]
+        if spec.static_files:
+            blocks += [self._image() for _ in range(spec.images)]
+        blocks += [self._tikz(num) for num in range(spec.tikz)]
+        return "\n\n".join(blocks) + "\n"
+
+
+class _CourseWriter:
+    """Write course files for a spec."""
+
+    def __init__(self, target_dir, spec):
+        self._target_dir = target_dir
+        self._spec = spec
+
+    def _write(self, path, text):
+        makedirs(join(self._target_dir, *path[:-1]), exist_ok=True)
+        with open(join(self._target_dir, *path), "w", encoding="utf-8") as out:
+            out.write(text)
+
+    def _sections(self, numbers=()):
+        """Yield section numbers in the order the runner traverses them."""
+        yield numbers
+        if len(numbers) < self._spec.depth:
+            for num in range(1, self._spec.breadth + 1):
+                yield from self._sections(numbers + (num,))
+
+    def write_manifest(self):
+        """Write course manifest."""
+        spec = self._spec
+        data = {
+            "title": {lang: f"Synthetic course ({lang})" for lang in spec.languages},
+            "languages": list(spec.languages),
+            "min_score": 80,
+        }
+        if spec.pages:
+            data["pages"] = [
+                {
+                    "id": f"page-{num}",
+                    "icon": "info",
+                    "linked": ["nav", "footer"],
+                    "title": {lang: f"Page {num}" for lang in spec.languages},
+                }
+                for num in range(spec.pages)
+            ]
+        self._write((f"{MANIFEST_BASENAME}.yml",), yaml.safe_dump(data))
+
+    def write_static_files(self):
+        """Write common static files and course logo."""
+        size = self._spec.static_size
+        random = Random(self._spec.seed)
+        filenames = [f"figure-{num}.png" for num in range(self._spec.static_files)]
+        makedirs(join(self._target_dir, STATIC_FOLDER), exist_ok=True)
+        for filename in filenames + ["_logo.png"]:
+            with open(join(self._target_dir, STATIC_FOLDER, filename), "wb") as out:
+                out.write(random.getrandbits(8 * size).to_bytes(size, "little"))
+
+    def write_language(self, lang):
+        """Write sections, pages and footer fragments for a language."""
+        width = len(str(self._spec.breadth))
+        for numbers in self._sections():
+            section_id = ".".join(str(num) for num in numbers) or "0"
+            parts = tuple(f"{num:0{width}d}-section" for num in numbers)
+            title = f"Section {section_id} ({lang})"
+            content = _SectionWriter(self._spec, section_id).content(title)
+            self._write((lang,) + parts + (f"{CONTENT_BASENAME}.md",), content)
+        for num in range(self._spec.pages):
+            text = _SectionWriter(self._spec, f"page-{num}").paragraph()
+            content = f"---\ntitle: Page {num} ({lang})\n---\n\n{text}\n"
+            self._write((lang, PAGES_FOLDER, f"page-{num}.md"), content)
+        if self._spec.footer:
+            for part in ("a", "b"):
+                text = _SectionWriter(self._spec, f"footer-{part}").paragraph()
+                filename = f"{FOOTER_FRAGMENT_PREFIX}_{part}.md"
+                self._write((lang, filename), f"{text}\n")
+
+
+def generate_course(target_dir, spec):
+    """
+    Write a synthetic course to a directory.
+
+    :param target_dir: Course source directory (created if necessary)
+    :type target_dir: str
+    :param spec: Course size and features
+    :type spec: CourseSpec
+
+    :returns: Number of content files
+    :rtype: int
+    """
+    writer = _CourseWriter(target_dir, spec)
+    writer.write_manifest()
+    writer.write_static_files()
+    for lang in spec.languages:
+        writer.write_language(lang)
+    per_language = spec.section_count() + spec.pages + (2 if spec.footer else 0)
+    return per_language * len(spec.languages)
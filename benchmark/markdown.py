@@ -0,0 +1,179 @@
+"""
+Convert a small subset of pandoc markdown to pandoc JSON.
+
+Stands in for pandoc where no recorded output is available (see
+:mod:`benchmark.toolchain`). Supports what :mod:`benchmark.course` generates:
+YAML metadata, ATX headers, paragraphs, fenced divs and code blocks, images,
+links and bracketed spans with attributes. Anything else is treated as text.
+"""
+
+import json
+import re
+import shlex
+
+import yaml
+
+#: API version written to the document
+PANDOC_API_VERSION = [1, 22, 2]
+
+INLINE_PATTERN = re.compile(
+    r"(?P<image>!\[(?P<alt>[^\]]*)\]\((?P<src>[^)\s]+)\))"
+    r"|(?P<link>\[(?P<text>[^\]]*)\]\((?P<url>[^)\s]+)\))"
+    r"|(?P<span>\[(?P<content>[^\]]*)\]\{(?P<attr>[^}]*)\})"
+)
+HEADER_PATTERN = re.compile(r"(#{1,6})\s+(.*)")
+DIV_PATTERN = re.compile(r":{3,}\s*\{(.*)\}\s*$")
+DIV_END_PATTERN = re.compile(r":{3,}\s*$")
+FENCE_PATTERN = re.compile(r"```\s*(\w*)\s*$")
+BLOCK_START_PATTERN = re.compile(r":{3,}|```|#{1,6}\s")
+
+
+def _attr(text=""):
+    identifier, classes, attributes = "", [], []
+    for token in shlex.split(text):
+        if token.startswith("#"):
+            identifier = token[1:]
+        elif token.startswith("."):
+            classes.append(token[1:])
+        elif "=" in token:
+            attributes.append(token.split("=", 1))
+    return [identifier, classes, attributes]
+
+
+def _words(text):
+    inlines = []
+    for num, word in enumerate(text.split(" ")):
+        if num:
+            inlines.append({"t": "Space"})
+        if word:
+            inlines.append({"t": "Str", "c": word})
+    return inlines
+
+
+def _inlines(text):
+    inlines = []
+    pos = 0
+    for match in INLINE_PATTERN.finditer(text):
+        start, end = match.span()
+        inlines += _words(text[pos:start])
+        if match["image"]:
+            target = [match["src"], ""]
+            inlines.append({"t": "Image", "c": [_attr(), _words(match["alt"]), target]})
+        elif match["link"]:
+            target = [match["url"], ""]
+            inlines.append({"t": "Link", "c": [_attr(), _words(match["text"]), target]})
+        else:
+            attr = _attr(match["attr"])
+            inlines.append({"t": "Span", "c": [attr, _words(match["content"])]})
+        pos = end
+    inlines += _words(text[pos:])
+    return [inline for inline in inlines if inline != {"t": "Str", "c": ""}]
+
+
+def _identifier(inlines):
+    text = " ".join(inline["c"] for inline in inlines if inline["t"] == "Str")
+    text = re.sub(r"[^\w\s.-]", "", text.lower())
+    return re.sub(r"\s+", "-", text).lstrip("0123456789.-")
+
+
+def _meta(text):
+    meta = {}
+    for key, value in (yaml.safe_load(text) or {}).items():
+        if isinstance(value, bool):
+            meta[key] = {"t": "MetaBool", "c": value}
+        else:
+            meta[key] = {"t": "MetaInlines", "c": _inlines(str(value))}
+    return meta
+
+
+class _BlockParser:
+    """Parse blocks line by line."""
+
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._stack = [[]]
+        self._para = []
+
+    def _end_para(self):
+        if self._para:
+            inlines = _inlines(" ".join(self._para))
+            self._stack[-1].append({"t": "Para", "c": inlines})
+            self._para = []
+
+    def _code_block(self, classes):
+        code = []
+        for line in self._lines:
+            if line.rstrip() == "```":
+                break
+            code.append(line)
+        attr = ["", [classes] if classes else [], []]
+        return {"t": "CodeBlock", "c": [attr, "\n".join(code)]}
+
+    def _line(self, line):
+        div = DIV_PATTERN.match(line)
+        if div:
+            content = []
+            self._stack[-1].append({"t": "Div", "c": [_attr(div[1]), content]})
+            self._stack.append(content)
+            return
+        if DIV_END_PATTERN.match(line):
+            if len(self._stack) > 1:
+                self._stack.pop()
+            return
+        fence = FENCE_PATTERN.match(line)
+        if fence:
+            self._stack[-1].append(self._code_block(fence[1]))
+            return
+        header = HEADER_PATTERN.match(line)
+        if header:
+            inlines = _inlines(header[2])
+            attr = [_identifier(inlines), [], []]
+            self._stack[-1].append(
+                {"t": "Header", "c": [len(header[1]), attr, inlines]}
+            )
+
+    def parse(self):
+        """Return list of blocks."""
+        for line in self._lines:
+            line = line.rstrip()
+            if line and not BLOCK_START_PATTERN.match(line):
+                self._para.append(line.strip())
+                continue
+            self._end_para()
+            self._line(line)
+        self._end_para()
+        return self._stack[0]
+
+
+def convert(text):
+    """
+    Convert markdown to a pandoc document.
+
+    :param text: Markdown source
+    :type text: str
+
+    :rtype: dict
+    """
+    meta = {}
+    if text.startswith("---\n"):
+        end = text.find("\n---\n", 4)
+        if end != -1:
+            meta = _meta(text[4:end])
+            text = text[end:].split("\n", 2)[2]
+    return {
+        "pandoc-api-version": PANDOC_API_VERSION,
+        "meta": meta,
+        "blocks": _BlockParser(text.split("\n")).parse(),
+    }
+
+
+def convert_to_json(text):
+    """
+    Convert markdown to pandoc JSON output.
+
+    :param text: Markdown source
+    :type text: str
+
+    :rtype: bytes
+    """
+    return json.dumps(convert(text)).encode()
@@ -0,0 +1,40 @@
+"""
+Record pandoc ASTs for benchmarks.
+
+Converts content files using pandoc and stores the resulting ASTs in
+``benchmark/fixtures``. Recorded ASTs are picked up by the benchmarks in
+addition to the synthesized ones.
+
+.. code-block:: console
+
+  $ python -m benchmark.record path/to/section/content.md my-section
+"""
+
+import json
+from os.path import dirname, join, realpath
+import sys
+
+from innoconv.utils import to_ast
+
+#: Folder for recorded ASTs
+FIXTURES_DIR = join(dirname(realpath(__file__)), "fixtures")
+
+
+def record(filepath, name):
+    """
+    Convert a file and store its AST as fixture.
+
+    :param filepath: Content file
+    :type filepath: str
+    :param name: Fixture name
+    :type name: str
+    """
+    ast, *_ = to_ast(filepath, ignore_missing_title=True)
+    with open(join(FIXTURES_DIR, f"{name}.json"), "w", encoding="utf-8") as out:
+        json.dump(ast, out)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("Usage: python -m benchmark.record FILE NAME")
+    record(sys.argv[1], sys.argv[2])
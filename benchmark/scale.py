@@ -0,0 +1,148 @@
+"""
+Scale test: convert a synthetic course using the innoconv CLI.
+
+Generates a course (see :mod:`benchmark.course`) and runs the full
+``innoconv`` command on it in a subprocess, recording wall time and peak
+memory. Additional arguments after ``--`` are passed to innoconv.
+
+.. code-block:: console
+
+  $ python -m benchmark.scale --depth 4 --breadth 10 --results scale.json
+  $ python -m benchmark.scale --depth 3 -- --extensions join_strings --timings
+  $ python -m benchmark.scale --depth 4 --breadth 10 --fake-tools
+
+Peak memory is the maximum resident set size reported by the operating system
+for innoconv and the tools it started, whichever process was the largest.
+
+Only available on Unix-like systems.
+"""
+
+import json
+import os
+from os.path import join
+import re
+import sys
+from tempfile import TemporaryDirectory
+import time
+
+import click
+
+from benchmark.course import CourseSpec, generate_course
+
+
+def run_innoconv(source_dir, output_dir, args=(), fake_tools=False):
+    """
+    Run innoconv in a subprocess and measure time and peak memory.
+
+    :param source_dir: Content source directory
+    :type source_dir: str
+    :param output_dir: Output directory (overwritten)
+    :type output_dir: str
+    :param args: Additional innoconv arguments
+    :type args: list[str]
+    :param fake_tools: Use fake pandoc and TeX tools (see
+                       :mod:`benchmark.toolchain`)
+    :type fake_tools: bool
+
+    :returns: Exit code, wall time in seconds and maximum RSS in bytes
+    :rtype: dict
+    """
+    if fake_tools:
+        command = [sys.executable, "-m", "benchmark.toolchain", "--"]
+    else:
+        command = [sys.executable, "-m", "innoconv"]
+    command += ["--force", "-o", output_dir]
+    start = time.perf_counter()
+    pid = os.spawnv(os.P_NOWAIT, sys.executable, command + list(args) + [source_dir])
+    _, status, usage = os.wait4(pid, 0)
+    seconds = time.perf_counter() - start
+    if os.WIFEXITED(status):
+        exit_code = os.WEXITSTATUS(status)
+    else:
+        exit_code = -os.WTERMSIG(status)
+    # Linux reports kilobytes, macOS bytes
+    max_rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return {"exit_code": exit_code, "seconds": seconds, "max_rss": max_rss}
+
+
+def _spec_options(func):
+    """Add a CLI option for every course spec field."""
+    helptexts = dict(re.findall(r":param (\w+): (.*)", CourseSpec.__doc__))
+    for name, default in reversed(CourseSpec.defaults.items()):
+        option = name.replace("_", "-")
+        helptext = helptexts[name].replace("\\ *k*\\", "k")  # TikZ
+        kwargs = {"default": default, "help": helptext, "show_default": True}
+        if isinstance(default, bool):
+            decorator = click.option(f"--{option}/--no-{option}", **kwargs)
+        elif isinstance(default, tuple):
+            kwargs["default"] = ",".join(default)
+            kwargs["callback"] = lambda _, __, value: tuple(value.split(","))
+            decorator = click.option(f"--{option}", **kwargs)
+        else:
+            decorator = click.option(f"--{option}", type=type(default), **kwargs)
+        func = decorator(func)
+    return func
+
+
+@click.command(help=__doc__.split("\n\n", maxsplit=1)[0])
+@_spec_options
+@click.option("--runs", default=1, show_default=True, help="Number of runs.")
+@click.option(
+    "--fake-tools",
+    is_flag=True,
+    help="Replace pandoc and TeX by a fake toolchain (measures Python only).",
+)
+@click.option(
+    "--course-dir",
+    type=click.Path(file_okay=False, writable=True, resolve_path=True),
+    help="Keep generated course in this directory.",
+)
+@click.option(
+    "--results",
+    type=click.Path(dir_okay=False, writable=True, resolve_path=True),
+    help="Write results as JSON.",
+)
+@click.argument("innoconv_args", nargs=-1, type=click.UNPROCESSED)
+def cli(  # pylint: disable=too-many-arguments,too-many-locals
+    runs, fake_tools, course_dir, results, innoconv_args, **options
+):
+    """Generate a course and convert it."""
+    spec = CourseSpec(**options)
+    with TemporaryDirectory(prefix="innoconv-scale-") as tmp_dir:
+        source_dir = course_dir or join(tmp_dir, "course")
+        start = time.perf_counter()
+        content_files = generate_course(source_dir, spec)
+        click.echo(
+            f"Generated {content_files} content files "
+            f"({spec.section_count()} sections per language) "
+            f"in {time.perf_counter() - start:.1f}s: {source_dir}"
+        )
+
+        measurements = []
+        for num in range(runs):
+            output_dir = join(tmp_dir, "output")
+            result = run_innoconv(source_dir, output_dir, innoconv_args, fake_tools)
+            measurements.append(result)
+            click.echo(
+                f"Run {num + 1}: {result['seconds']:.3f}s, "
+                f"peak RSS {result['max_rss'] / 2**20:.1f} MiB, "
+                f"exit code {result['exit_code']}"
+            )
+            if result["exit_code"]:
+                break
+
+    if results:
+        data = {
+            "spec": spec.to_json(),
+            "content_files": content_files,
+            "innoconv_args": list(innoconv_args),
+            "fake_tools": fake_tools,
+            "runs": measurements,
+        }
+        with open(results, "w", encoding="utf-8") as out_file:
+            json.dump(data, out_file, indent=2)
+    sys.exit(measurements[-1]["exit_code"])
+
+
+if __name__ == "__main__":
+    cli()  # pylint: disable=no-value-for-parameter
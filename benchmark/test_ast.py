@@ -0,0 +1,55 @@
+"""Benchmarks for AST traversal, querying and decoding."""
+
+import json
+
+from innoconv.traverse_ast import ElementIndex, TraverseAst
+from innoconv.utils import make_object_hook, to_string
+
+
+def _noop(*_):
+    pass
+
+
+def test_json_decode(benchmark, measure_memory, ast_json):
+    """Decode pandoc output (baseline for element hooks)."""
+    measure_memory(json.loads, ast_json)
+    benchmark(json.loads, ast_json)
+
+
+def test_json_decode_object_hook(benchmark, measure_memory, ast_json):
+    """Decode pandoc output calling a no-op element hook on every element."""
+    object_hook = make_object_hook({"*": [_noop]})
+    measure_memory(json.loads, ast_json, object_hook=object_hook)
+    benchmark(json.loads, ast_json, object_hook=object_hook)
+
+
+def test_traverse_ast(benchmark, measure_memory, ast_json):
+    """Traverse the whole AST."""
+    ast = json.loads(ast_json)
+    traverse = TraverseAst(_noop).traverse
+    measure_memory(traverse, ast)
+    benchmark(traverse, ast)
+
+
+def test_element_index(benchmark, measure_memory, ast_json):
+    """Build an element index and query it."""
+    ast = json.loads(ast_json)
+
+    def index_and_query():
+        index = ElementIndex(ast)
+        return len(index.find("Div", "exercise")) + len(index.find("Image"))
+
+    measure_memory(index_and_query)
+    benchmark(index_and_query)
+
+
+def test_to_string(benchmark, measure_memory, ast_json):
+    """Convert the inline content of all paragraphs to strings."""
+    paras = [block["c"] for block in json.loads(ast_json) if block["t"] == "Para"]
+
+    def convert():
+        for para in paras:
+            to_string(para)
+
+    measure_memory(convert)
+    benchmark(convert)
@@ -0,0 +1,44 @@
+"""Smoke tests for the benchmark comparison (no timing involved)."""
+
+from os.path import join
+from unittest.mock import patch
+
+from benchmark import bench
+from benchmark.course import CourseSpec, generate_course
+from benchmark.toolchain import fake_toolchain
+from innoconv.utils import to_ast
+
+
+def test_build(tmp_path):
+    """Ensure a build reports all runner phases."""
+    source_dir = join(tmp_path, "course")
+    generate_course(source_dir, CourseSpec(depth=1, breadth=2))
+    with fake_toolchain():
+        build = bench._build  # pylint: disable=protected-access
+        phases = build(source_dir, join(tmp_path, "output"))
+    assert set(phases) == set(bench.PHASES)
+    assert phases["preflight"] > 0
+    assert phases["run"] > phases["convert"]
+
+
+def test_incremental(tmp_path):
+    """Ensure the incremental scenario converts the changed section only."""
+    source_dir = join(tmp_path, "course")
+    output_dir = join(tmp_path, "output")
+    generate_course(source_dir, CourseSpec(depth=1, breadth=2))
+    build = bench._build  # pylint: disable=protected-access
+    with fake_toolchain():
+        build(source_dir, output_dir)
+        bench._change_section(source_dir, 0)  # pylint: disable=protected-access
+        with patch("innoconv.runner.to_ast", wraps=to_ast) as mock_to_ast:
+            build(source_dir, output_dir)
+    converted = [args[0] for args, _ in mock_to_ast.call_args_list]
+    assert converted == [join(source_dir, "en", "1-section", "content.md")]
+
+
+def test_compare_missing_phase():
+    """Ensure phases missing in the baseline (e.g. older versions) are skipped."""
+    current = {"scenarios": {"full": {phase: [1.0] for phase in bench.PHASES}}}
+    baseline = {"scenarios": {"full": {"run": [1.0]}}}
+    rows = bench.compare_results(baseline, current, 0.1)
+    assert [row[1] for row in rows] == ["run"]
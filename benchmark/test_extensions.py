@@ -0,0 +1,72 @@
+"""
+Benchmarks for extensions processing a single file.
+
+Every round decodes pandoc output with the extension's element hooks and
+runs the file events, just like the runner does. Compare with
+``test_json_decode`` to see the extension's share.
+"""
+
+import json
+
+import pytest
+
+from benchmark.asts import STATIC_FILES
+from innoconv.constants import STATIC_FOLDER
+from innoconv.ext.copy_static import CopyStatic
+from innoconv.ext.index_terms import IndexTerms
+from innoconv.ext.join_strings import JoinStrings
+from innoconv.ext.number_cards import NumberCards
+from innoconv.ext.tikz2svg import Tikz2Svg
+from innoconv.manifest import Manifest
+from innoconv.traverse_ast import ElementIndex
+from innoconv.utils import make_object_hook
+
+#: Rounds per benchmark (every round needs a fresh extension and AST)
+ROUNDS = 10
+
+MANIFEST = Manifest({"languages": ("en",), "title": {"en": "Title"}, "min_score": 90})
+
+EXTENSIONS = (CopyStatic, IndexTerms, JoinStrings, NumberCards, Tikz2Svg)
+
+
+@pytest.fixture(scope="module", name="source_dir")
+def fixture_source_dir(tmp_path_factory):
+    """Create a source directory with static files."""
+    source_dir = tmp_path_factory.mktemp("source")
+    static_dir = source_dir / STATIC_FOLDER
+    static_dir.mkdir()
+    for filename in STATIC_FILES:
+        (static_dir / filename).write_bytes(b"")
+    return str(source_dir)
+
+
+def _start_extension(ext_class, source_dir, output_dir):
+    ext = ext_class(MANIFEST)
+    ext.extension_list([ext])
+    ext.start(output_dir, source_dir)
+    ext.pre_conversion("en")
+    ext.pre_process_file("en/section-1")
+    return ext
+
+
+def _process_file(ext, ast_json):
+    hooks = {elem_type: [hook] for elem_type, hook in ext.element_hooks().items()}
+    object_hook = make_object_hook(hooks) if hooks else None
+    ast = json.loads(ast_json, object_hook=object_hook)
+    ext.element_index(ElementIndex(ast))
+    ext.post_process_file(ast, "Title", "section", None, "Title")
+
+
+@pytest.mark.parametrize("ext_class", EXTENSIONS, ids=lambda cls: cls.__name__)
+def test_extension(  # pylint: disable=too-many-arguments
+    *, benchmark, measure_memory, ast_json, ext_class, source_dir, tmp_path
+):
+    """Process a file with an extension."""
+
+    def setup():
+        ext = _start_extension(ext_class, source_dir, str(tmp_path))
+        return (ext, ast_json), {}
+
+    args, _ = setup()
+    measure_memory(_process_file, *args)
+    benchmark.pedantic(_process_file, setup=setup, rounds=ROUNDS)
@@ -0,0 +1,43 @@
+"""
+Benchmarks for the whole conversion of a generated course.
+
+External tools are replaced by :mod:`benchmark.toolchain`, so only the Python
+side of the pipeline is measured.
+"""
+
+import pytest
+
+from benchmark.course import CourseSpec, generate_course
+from benchmark.toolchain import fake_toolchain
+from innoconv.constants import DEFAULT_EXTENSIONS
+from innoconv.manifest import Manifest
+from innoconv.runner import InnoconvRunner
+
+#: Rounds per benchmark
+ROUNDS = 5
+
+COURSE_SPEC = CourseSpec(depth=2, breadth=5)
+
+
+@pytest.fixture(scope="module", name="course_dir")
+def fixture_course_dir(tmp_path_factory):
+    """Generate a course."""
+    course_dir = str(tmp_path_factory.mktemp("course"))
+    generate_course(course_dir, COURSE_SPEC)
+    return course_dir
+
+
+@pytest.mark.parametrize("stream", (False, True), ids=("default", "stream"))
+def test_pipeline(benchmark, measure_memory, course_dir, tmp_path, stream):
+    """Convert a course using all default extensions."""
+
+    def convert():
+        manifest = Manifest.from_directory(course_dir)
+        runner = InnoconvRunner(
+            course_dir, str(tmp_path), manifest, DEFAULT_EXTENSIONS, stream=stream
+        )
+        runner.run()
+
+    with fake_toolchain():
+        measure_memory(convert)
+        benchmark.pedantic(convert, rounds=ROUNDS)
@@ -0,0 +1,333 @@
+"""
+Fake pandoc and TeX toolchain for reproducible benchmarks.
+
+External tools dominate and blur build times. To measure the Python side of
+the pipeline in isolation, pandoc, pdflatex and pdf2svg are replaced by an
+in-process fake that replays recorded tool outputs. Outputs are keyed by a
+hash of the tool input, so recordings stay valid as long as content doesn't
+change.
+
+Outputs that were never recorded are synthesized: pandoc output using
+:mod:`benchmark.markdown`, PDF and SVG files as small placeholders. Courses
+generated by :mod:`benchmark.course` can be converted without any external
+tool installed.
+
+Record outputs of the real tools once, then run innoconv with the fakes:
+
+.. code-block:: console
+
+  $ python -m benchmark.toolchain --record -- -f path/to/content
+  $ python -m benchmark.toolchain -- -f --timings path/to/content
+
+Within Python use :func:`fake_toolchain`.
+"""
+
+from contextlib import contextmanager, ExitStack
+from functools import partial
+from hashlib import sha256
+from importlib import import_module
+from io import BytesIO
+import os
+from os.path import basename, join
+import shlex
+import subprocess
+from unittest.mock import patch
+
+import click
+
+from benchmark.markdown import convert_to_json
+from benchmark.record import FIXTURES_DIR
+from innoconv.cli import cli as innoconv_cli
+
+#: Default folder for recorded tool outputs
+RECORDINGS_DIR = join(FIXTURES_DIR, "toolchain")
+
+#: Modules that start external tools
+PATCH_MODULES = ("innoconv.utils", "innoconv.ext.tikz2svg")
+
+#: Names tools are started with in these modules (releases before
+#: instrumentation use ``Popen`` directly)
+POPEN_NAMES = ("MeasuredPopen", "Popen")
+
+FAKE_PDF = b"%PDF-1.5\n% innoconv fake toolchain {key}\n%%EOF\n"
+
+FAKE_SVG = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<svg xmlns="http://www.w3.org/2000/svg" width="{size}pt" height="{size}pt" '
+    'viewBox="0 0 {size} {size}" version="1.1">\n'
+    '<g id="surface1"><path id="path-{key}" style="stroke:none;" fill="#fe00fe" '
+    'd="M 0 0 L {size} {offset} L {offset} {size} Z"/>\n'
+    '<path stroke="#fe00fe" d="M 0 {offset} L {size} 0"/></g>\n'
+    "</svg>\n"
+)
+
+
+class ToolError(Exception):
+    """A real tool failed while recording."""
+
+    def __init__(self, returncode, stderr):
+        """Initialize ToolError."""
+        super().__init__(returncode, stderr)
+        self.returncode = returncode
+        self.stderr = stderr
+
+
+def _hash(*parts):
+    digest = sha256()
+    for part in parts:
+        digest.update(sha256(part).digest())
+    return digest.hexdigest()
+
+
+def _read(path):
+    with open(path, "rb") as in_file:
+        return in_file.read()
+
+
+def _write(path, data):
+    with open(path, "wb") as out_file:
+        out_file.write(data)
+
+
+class FakeToolchain:
+    """
+    Replay (or record) outputs of external tools.
+
+    :param recordings_dir: Folder for recorded tool outputs
+    :type recordings_dir: str
+    :param record: Run the real tools and record their outputs
+    :type record: bool
+    """
+
+    def __init__(self, recordings_dir=RECORDINGS_DIR, record=False):
+        """Initialize FakeToolchain."""
+        self._recordings_dir = recordings_dir
+        self._record = record
+        self.stats = {"replayed": 0, "synthesized": 0, "recorded": 0}
+
+    def run(self, args, stdin, cwd):
+        """
+        Run a tool.
+
+        :param args: Command line
+        :type args: list[str]
+        :param stdin: Data passed to standard input
+        :type stdin: bytes
+        :param cwd: Working directory
+        :type cwd: str
+
+        :returns: Standard output
+        :rtype: bytes
+
+        :raises ToolError: if a real tool failed while recording
+        :raises RuntimeError: if the tool is unknown
+        """
+        tool = basename(args[0])
+        try:
+            func = getattr(self, f"_{tool}")
+        except AttributeError as exc:
+            raise RuntimeError(f"Unknown tool: {tool}") from exc
+        return func(args, stdin, cwd)
+
+    def _replay(self, tool, key, run_real, synthesize):
+        path = join(self._recordings_dir, tool, key)
+        if self._record:
+            data = run_real()
+            os.makedirs(join(self._recordings_dir, tool), exist_ok=True)
+            _write(path, data)
+            self.stats["recorded"] += 1
+            return data
+        try:
+            data = _read(path)
+        except FileNotFoundError:
+            self.stats["synthesized"] += 1
+            return synthesize()
+        self.stats["replayed"] += 1
+        return data
+
+    @staticmethod
+    def _run_real(args, stdin, cwd):
+        try:
+            proc = subprocess.run(
+                args, input=stdin, cwd=cwd, capture_output=True, check=False
+            )
+        except OSError as exc:
+            raise RuntimeError(f"Could not run {args[0]}: {exc}") from exc
+        if proc.returncode != 0:
+            raise ToolError(proc.returncode, proc.stderr)
+        return proc.stdout
+
+    def _pandoc(self, args, stdin, cwd):
+        source = _read(join(cwd, args[-1]))
+        key = _hash(" ".join(args[1:-1]).encode(), source)
+        return self._replay(
+            "pandoc",
+            key,
+            partial(self._run_real, args, stdin, cwd),
+            partial(convert_to_json, source.decode()),
+        )
+
+    def _pdflatex(self, args, stdin, cwd):
+        pdf_path = join(cwd, f"{args[args.index('-jobname') + 1]}.pdf")
+
+        def _run_real():
+            self._run_real(args, stdin, cwd)
+            return _read(pdf_path)
+
+        key = _hash(stdin)
+        fake_pdf = FAKE_PDF.replace(b"{key}", key.encode())
+        _write(pdf_path, self._replay("pdflatex", key, _run_real, lambda: fake_pdf))
+        return b""
+
+    def _pdf2svg(self, args, stdin, cwd):
+        pdf_path, svg_path = join(cwd, args[1]), join(cwd, args[2])
+
+        def _run_real():
+            self._run_real(args, stdin, cwd)
+            return _read(svg_path)
+
+        def _synthesize():
+            offset = int(key[:2], 16) % 50
+            svg = FAKE_SVG.format(size=100, offset=offset, key=key[:8])
+            return svg.encode()
+
+        key = _hash(_read(pdf_path))
+        _write(svg_path, self._replay("pdf2svg", key, _run_real, _synthesize))
+        return b""
+
+
+class _Stdin(BytesIO):
+    """Standard input that keeps its data after being closed."""
+
+    value = b""
+
+    def close(self):
+        """Remember data and close."""
+        if not self.closed:
+            self.value = self.getvalue()
+        super().close()
+
+
+class _Output:
+    """Standard output or error that runs the tool when first read."""
+
+    def __init__(self, proc, name):
+        self._proc = proc
+        self._name = name
+
+    def read(self, size=-1):
+        """Read data (runs the tool if necessary)."""
+        self._proc.wait()
+        return getattr(self._proc, self._name).read(size)
+
+
+class FakePopen:  # pylint: disable=too-many-instance-attributes
+    """
+    Drop-in replacement for :class:`subprocess.Popen` backed by a fake toolchain.
+
+    Only the parts of the interface used by innoconv are implemented. The tool
+    runs when its output is first read or on ``wait`` and ``communicate``.
+    """
+
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        args,
+        *,
+        stdin=None,
+        stdout=None,
+        stderr=None,
+        cwd=None,
+        shell=False,
+        toolchain,
+        span=None,  # pylint: disable=unused-argument
+    ):
+        """Initialize FakePopen."""
+        self.args = shlex.split(args) if shell else list(args)
+        self._toolchain = toolchain
+        self._cwd = cwd or os.getcwd()
+        self._stderr_file = None if stderr in (None, subprocess.PIPE) else stderr
+        self.stdin = _Stdin() if stdin == subprocess.PIPE else None
+        self.stdout = _Output(self, "_stdout") if stdout == subprocess.PIPE else None
+        self.stderr = _Output(self, "_stderr") if stderr == subprocess.PIPE else None
+        self.returncode = None
+        self._stdout = self._stderr = None
+
+    def wait(self, timeout=None):  # pylint: disable=unused-argument
+        """Run the tool and return its exit code."""
+        if self.returncode is not None:
+            return self.returncode
+        if self.stdin is not None:
+            self.stdin.close()
+        stdin = self.stdin.value if self.stdin is not None else b""
+        try:
+            stdout = self._toolchain.run(self.args, stdin, self._cwd)
+            stderr = b""
+            self.returncode = 0
+        except ToolError as err:
+            stdout, stderr = b"", err.stderr
+            self.returncode = err.returncode
+        self._stdout, self._stderr = BytesIO(stdout), BytesIO(stderr)
+        if self._stderr_file is not None:
+            self._stderr_file.write(stderr)
+        return self.returncode
+
+    def communicate(self, timeout=None):
+        """Run the tool and return its output."""
+        self.wait(timeout)
+        return self._stdout.read(), self._stderr.read()
+
+    def __enter__(self):
+        """Enter context."""
+        return self
+
+    def __exit__(self, *_):
+        """Exit context."""
+        self.wait()
+
+
+@contextmanager
+def fake_toolchain(recordings_dir=RECORDINGS_DIR, record=False):
+    """
+    Replace external tools started by innoconv with a :class:`FakeToolchain`.
+
+    :param recordings_dir: Folder for recorded tool outputs
+    :type recordings_dir: str
+    :param record: Run the real tools and record their outputs
+    :type record: bool
+
+    :rtype: FakeToolchain
+    """
+    toolchain = FakeToolchain(recordings_dir, record)
+    popen = partial(FakePopen, toolchain=toolchain)
+    with ExitStack() as stack:
+        for module_name in PATCH_MODULES:
+            module = import_module(module_name)
+            for name in POPEN_NAMES:
+                if hasattr(module, name):
+                    stack.enter_context(patch.object(module, name, popen))
+                    break
+        yield toolchain
+
+
+@click.command(help="Run innoconv with a fake pandoc and TeX toolchain.")
+@click.option(
+    "--recordings",
+    type=click.Path(file_okay=False, writable=True, resolve_path=True),
+    default=RECORDINGS_DIR,
+    show_default=True,
+    help="Folder for recorded tool outputs.",
+)
+@click.option("--record", is_flag=True, help="Record outputs of the real tools.")
+@click.argument("innoconv_args", nargs=-1, type=click.UNPROCESSED)
+def cli(recordings, record, innoconv_args):
+    """Run innoconv using fake tools."""
+    with fake_toolchain(recordings, record) as toolchain:
+        try:
+            innoconv_cli.main(args=list(innoconv_args), prog_name="innoconv")
+        finally:
+            stats = ", ".join(f"{num} {key}" for key, num in toolchain.stats.items())
+            click.echo(f"Tool outputs: {stats}", err=True)
+
+
+if __name__ == "__main__":
+    cli()  # pylint: disable=no-value-for-parameter
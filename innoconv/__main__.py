@@ -2,4 +2,4 @@
 
 from innoconv.cli import cli
 
-cli()  # pylint: disable=E1120
+cli()  # pylint: disable=E1120,E1125
@@ -1,5 +1,7 @@
 """Command line interface for the innoConv document converter."""
 
+from functools import partial
+import json
 import logging
 import os
 import sys
@@ -13,8 +15,18 @@ from innoconv.constants import (
     DEFAULT_OUTPUT_DIR_BASE,
     EXIT_CODES,
     LOG_FORMAT,
+    TIMINGS_TOP_N,
 )
+from innoconv.depgraph import DependencyGraph, get_changed_files
 from innoconv.ext import EXTENSIONS
+from innoconv.instrumentation import add_recorder, record_event, remove_recorder
+from innoconv.instrumentation.events import EventStream
+from innoconv.instrumentation.memory import MemoryReport
+from innoconv.instrumentation.metrics import Metrics
+from innoconv.instrumentation.profiler import COLLAPSED_SUFFIX, Profiler
+from innoconv.instrumentation.resources import ResourceUsage
+from innoconv.instrumentation.timings import Timings
+from innoconv.instrumentation.trace import Trace
 from innoconv.manifest import Manifest
 from innoconv.metadata import __author__, __description__, __url__, __version__
 from innoconv.runner import InnoconvRunner
@@ -37,6 +49,10 @@ warranty, not even for merchantability or fitness for a particular purpose.
 """
 
 
+def _parse_languages(_, __, value):
+    return value.split(",") if value else None
+
+
 def _parse_extensions(_, __, value):
     extensions = value.split(",")
     for ext in extensions:
@@ -50,13 +66,15 @@ class CustomEpilogCommand(click.Command):
 
     def format_epilog(self, _, formatter):
         """Format epilog while preserving newlines."""
-        if self.epilog:
+        # epilog is created on demand as it imports all extensions
+        epilog = self.epilog() if callable(self.epilog) else self.epilog
+        if epilog:
             formatter.write_paragraph()
-            for line in self.epilog.split("\n"):
+            for line in epilog.split("\n"):
                 formatter.write_text(line)
 
 
-@click.command(cls=CustomEpilogCommand, help=__description__, epilog=_get_epilog())
+@click.command(cls=CustomEpilogCommand, help=__description__, epilog=_get_epilog)
 @click.argument(
     "source_dir",
     type=click.Path(exists=True, file_okay=False, resolve_path=True),
@@ -85,37 +103,365 @@ class CustomEpilogCommand(click.Command):
     help="Force overwriting of output.",
     default=False,
 )
+@click.option(
+    "--plan",
+    is_flag=True,
+    help="Print which outputs would be rebuilt and exit (dry run).",
+    default=False,
+)
+@click.option(
+    "--only",
+    help=(
+        "Convert only this section and its subsections (e.g. chapter-1/section-2), "
+        "other sections are taken from the previous build."
+    ),
+    metavar="SECTION",
+)
+@click.option(
+    "--languages",
+    help=(
+        "Convert only these languages (comma-separated), "
+        "others are taken from the previous build."
+    ),
+    metavar="LANGS",
+    callback=_parse_languages,
+)
+@click.option(
+    "--since",
+    help=(
+        "Consider only source files that changed since git revision REV "
+        "(e.g. the commit of the previous build) instead of checking "
+        "modification times."
+    ),
+    metavar="REV",
+)
+@click.option(
+    "--full",
+    is_flag=True,
+    help=(
+        "Convert everything, ignoring the previous build in the output directory "
+        "(its dependency graph is replaced)."
+    ),
+    default=False,
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Continue an interrupted build from its checkpoint journal.",
+    default=False,
+)
+@click.option(
+    "-k",
+    "--keep-going",
+    is_flag=True,
+    help="Continue after errors and report all of them at the end.",
+    default=False,
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Read pandoc output incrementally to save memory (requires ijson).",
+    default=False,
+)
+@click.option(
+    "--timings",
+    is_flag=True,
+    help="Print the slowest files and extension events.",
+    default=False,
+)
+@click.option(
+    "--timings-file",
+    help="Write timings of all files and extension events as JSON.",
+    type=click.Path(dir_okay=False, writable=True, resolve_path=True),
+)
+@click.option(
+    "--resource-usage",
+    is_flag=True,
+    help="Print CPU time and memory usage of external tools (pandoc, LaTeX).",
+    default=False,
+)
+@click.option(
+    "--memory-report",
+    is_flag=True,
+    help="Print memory usage of runner phases and extensions (slow).",
+    default=False,
+)
+@click.option(
+    "--metrics-file",
+    help="Write build metrics in Prometheus text format (node exporter).",
+    type=click.Path(dir_okay=False, writable=True, resolve_path=True),
+)
+@click.option(
+    "--events",
+    help=(
+        "Write build events to stderr (or --events-fd to keep them apart from "
+        "log messages)."
+    ),
+    type=click.Choice(["ndjson"]),
+)
+@click.option(
+    "--events-fd",
+    help="Write build events to this file descriptor.",
+    type=click.IntRange(min=0),
+    metavar="FD",
+)
+@click.option(
+    "--trace",
+    help="Write a timeline of the conversion in Chrome trace event format.",
+    type=click.Path(dir_okay=False, writable=True, resolve_path=True),
+)
+@click.option(
+    "--profile",
+    help=(
+        "Profile the conversion and write pstats data to FILE and collapsed "
+        f"stacks to FILE{COLLAPSED_SUFFIX}."
+    ),
+    type=click.Path(dir_okay=False, writable=True, resolve_path=True),
+)
+@click.option(
+    "--profile-phase",
+    help=(
+        "Profile a single runner phase or extension event only "
+        "(e.g. post_process_file)."
+    ),
+    metavar="PHASE",
+)
 @click.option("-v", "--verbose", is_flag=True, help="Print verbose messages.")
 @click.version_option(__version__)
-def cli(verbose, force, extensions, output_dir, source_dir):
+def cli(  # pylint: disable=too-many-arguments,too-many-locals
+    *,
+    verbose,
+    stream,
+    plan,
+    only,
+    languages,
+    since,
+    full,
+    resume,
+    keep_going,
+    force,
+    extensions,
+    output_dir,
+    source_dir,
+    **instrumentation,
+):
     """Instantiate and start an InnoconvRunner."""
     log_level = logging.INFO if verbose else logging.WARNING
     coloredlogs.install(level=log_level, fmt=LOG_FORMAT)
 
     # check output directory
-    if os.path.exists(output_dir) and not force:
+    if os.path.exists(output_dir) and not force and not plan and not resume:
         msg = f"Output directory {output_dir} already exists. To overwrite use --force."
         raise click.FileError(output_dir, msg)
 
-    # read course manifest
+    manifest = _read_manifest(source_dir)
+
+    # dependency graph of the previous build
+    depgraph = _load_depgraph(
+        source_dir,
+        output_dir,
+        since=since,
+        resume=resume,
+        full=full,
+        partial_build=bool(only or languages),
+    )
+
+    if plan:
+        _print_plan(source_dir, output_dir, manifest, extensions, depgraph)
+
+    recorders = _get_recorders(**instrumentation)
+    for recorder, _ in recorders:
+        add_recorder(recorder)
+
+    # start runner
+    exit_code = EXIT_CODES["RUNNER_ERROR"]
     try:
-        manifest = Manifest.from_directory(source_dir)
+        runner = InnoconvRunner(
+            source_dir,
+            output_dir,
+            manifest,
+            extensions,
+            stream=stream,
+            depgraph=depgraph,
+            languages=languages,
+            only=only,
+            keep_going=keep_going,
+        )
+        runner.run()
+    except (RuntimeError, ValueError) as error:
+        logging.critical("Something went wrong: %s", error)
+        record_event("error", message=str(error))
+    except BaseException as error:
+        # unexpected errors and interruptions are passed on after reporting
+        record_event("error", message=repr(error))
+        raise
+    else:
+        logging.info("Build finished!")
+        exit_code = EXIT_CODES["SUCCESS"]
+    finally:
+        # failed builds are reported as well
+        status = "success" if exit_code == EXIT_CODES["SUCCESS"] else "failed"
+        record_event("build_finished", status=status, exit_code=exit_code)
+        for recorder, report in recorders:
+            remove_recorder(recorder)
+            report()
+    sys.exit(exit_code)
+
+
+def _read_manifest(source_dir):
+    """Read course manifest (exits on failure)."""
+    try:
+        return Manifest.from_directory(source_dir)
     except yaml.YAMLError:
         logging.critical("Could not parse manifest file!")
-        sys.exit(EXIT_CODES["MANIFEST_ERROR"])
     except FileNotFoundError:
         logging.critical("Could not find manifest file in source directory!")
-        sys.exit(EXIT_CODES["MANIFEST_ERROR"])
     except RuntimeError as exc:
         logging.critical(exc)
-        sys.exit(EXIT_CODES["MANIFEST_ERROR"])
+    sys.exit(EXIT_CODES["MANIFEST_ERROR"])
 
-    # start runner
+
+def _load_depgraph(
+    source_dir, output_dir, *, since=None, resume=False, full=False, partial_build=False
+):
+    """Load dependency graph of the previous build (unless building everything)."""
+    if full:
+        for option, used in (
+            ("--since", since),
+            ("--resume", resume),
+            ("--only/--languages", partial_build),
+        ):
+            if used:
+                raise click.BadOptionUsage(
+                    "--full", f"Can't be combined with {option}."
+                )
+        logging.info("Ignoring previous build, converting everything.")
+        return DependencyGraph(source_dir, output_dir)
+    changed_files = None
+    if since:
+        try:
+            changed_files = get_changed_files(source_dir, since)
+        except RuntimeError as exc:
+            raise click.BadOptionUsage("--since", str(exc)) from exc
+        logging.info("%d source files changed since %s", len(changed_files), since)
+    return DependencyGraph.load(source_dir, output_dir, changed_files, resume)
+
+
+def _print_plan(source_dir, output_dir, manifest, extensions, depgraph):
+    """Print outputs that need to be rebuilt and exit."""
     try:
-        runner = InnoconvRunner(source_dir, output_dir, manifest, extensions)
-        runner.run()
+        runner = InnoconvRunner(
+            source_dir, output_dir, manifest, extensions, depgraph=depgraph
+        )
+        planned = runner.plan()
     except RuntimeError as error:
         logging.critical("Something went wrong: %s", error)
         sys.exit(EXIT_CODES["RUNNER_ERROR"])
-    logging.info("Build finished!")
+    if not depgraph.has_previous:
+        click.echo("No previous build found, everything needs to be built.")
+    elif not planned:
+        click.echo("Output is up to date.")
+    else:
+        click.echo(f"{len(planned)} outputs need to be rebuilt or removed:")
+        max_length = len(max(planned, key=len))
+        for output, reason in sorted(planned.items()):
+            click.echo(f" {output:<{max_length}} ({reason})")
     sys.exit(EXIT_CODES["SUCCESS"])
+
+
+def _get_recorders(**options):
+    """Create recorders and their report functions from CLI options."""
+    recorders = []
+    for get_recorder in (
+        _get_timings,
+        _get_resource_usage,
+        _get_memory_report,
+        _get_metrics,
+        _get_event_stream,
+        _get_trace,
+        _get_profiler,
+    ):
+        recorder = get_recorder(**options)
+        if recorder:
+            recorders.append(recorder)
+    return recorders
+
+
+def _get_timings(timings, timings_file, **_):
+    if not timings and not timings_file:
+        return None
+    recorder = Timings()
+    return recorder, partial(_report_timings, recorder, timings, timings_file)
+
+
+def _get_resource_usage(resource_usage, **_):
+    if not resource_usage:
+        return None
+    try:
+        recorder = ResourceUsage()
+    except RuntimeError as exc:
+        raise click.BadOptionUsage("--resource-usage", str(exc)) from exc
+    return recorder, partial(_echo_report, recorder)
+
+
+def _get_memory_report(memory_report, **_):
+    if not memory_report:
+        return None
+    recorder = MemoryReport(TIMINGS_TOP_N)
+    return recorder, partial(_report_memory, recorder)
+
+
+def _get_metrics(metrics_file, **_):
+    if not metrics_file:
+        return None
+    recorder = Metrics()
+    return recorder, partial(recorder.write, metrics_file)
+
+
+def _get_event_stream(events, events_fd, **_):
+    if events_fd is not None and not events:
+        raise click.BadOptionUsage("--events-fd", "Requires --events.")
+    if not events:
+        return None
+    if events_fd is None:
+        # stdout is used for reports
+        out_file = sys.stderr
+    else:
+        try:
+            out_file = os.fdopen(events_fd, "w", encoding="utf-8", closefd=False)
+        except OSError as exc:
+            raise click.BadOptionUsage("--events-fd", str(exc)) from exc
+    return EventStream(out_file), out_file.flush
+
+
+def _get_trace(trace, **_):
+    if not trace:
+        return None
+    recorder = Trace()
+    return recorder, partial(recorder.write, trace)
+
+
+def _get_profiler(profile, profile_phase, **_):
+    if profile_phase and not profile:
+        raise click.BadOptionUsage("--profile-phase", "Requires --profile.")
+    if not profile:
+        return None
+    recorder = Profiler(profile_phase)
+    return recorder, partial(recorder.write, profile)
+
+
+def _report_memory(recorder):
+    recorder.stop()
+    click.echo(recorder.report())
+
+
+def _echo_report(recorder):
+    click.echo(recorder.report(TIMINGS_TOP_N))
+
+
+def _report_timings(timings_recorder, timings, timings_file):
+    if timings:
+        _echo_report(timings_recorder)
+    if timings_file:
+        with open(timings_file, "w", encoding="utf-8") as out_file:
+            json.dump(timings_recorder.to_json(), out_file, indent=2)
@@ -2,7 +2,6 @@
 
 import os
 
-
 #: Allowed section types
 ALLOWED_SECTION_TYPES = ("exercises", "test")
 
@@ -44,5 +43,17 @@ PAGES_FOLDER = "_pages"
 #: Prefix for footer fragment files
 FOOTER_FRAGMENT_PREFIX = "_footer"
 
+#: Folder in the output directory for build state (e.g. dependency graph)
+BUILD_STATE_FOLDER = ".innoconv"
+
+#: Dependency graph filename
+DEPGRAPH_FILENAME = "depgraph.json"
+
+#: Checkpoint journal filename
+JOURNAL_FILENAME = "journal.ndjson"
+
+#: Number of rows in timing and resource usage summary tables
+TIMINGS_TOP_N = 10
+
 #: CLI exit codes
 EXIT_CODES = {"SUCCESS": 0, "MANIFEST_ERROR": 10, "RUNNER_ERROR": 11}
@@ -0,0 +1,549 @@
+"""
+Dependency graph for incremental builds.
+
+Every build records which output files were built from which inputs. Inputs
+are either source files or named values (e.g. the list of sections or the
+TikZ preamble). Content hashes of all inputs are stored along with the
+graph in :file:`.innoconv/depgraph.json` in the output directory.
+
+On the next build the previous graph tells which outputs are still up to date.
+An output is invalidated if
+
+* the output file is missing,
+* one of its source files changed, was removed or was added or
+* one of its values changed.
+
+Source files can be recorded as inputs even if they don't exist (e.g. a file
+that would take precedence over another one). The output is invalidated once
+they are added.
+
+Hashing source files is cheap for unchanged files: if size and modification
+time match the previous build, the stored hash is reused.
+
+Modification times are useless for builds from a fresh checkout (e.g. in CI).
+Instead the source files that changed since a git revision can be passed (see
+:func:`get_changed_files`). All other files are considered unchanged and keep
+their stored hash.
+
+Outputs can carry additional data, e.g. what extensions collected while
+converting a file. It's stored with the graph and available in the next build
+(see :meth:`DependencyGraph.get_data`).
+
+The graph is discarded as a whole if the innoconv version or the format
+version changed.
+
+While building, every recorded output is appended to a checkpoint journal
+(:file:`.innoconv/journal.ndjson`, see :meth:`DependencyGraph.start_journal`).
+It's removed once the graph is saved. If a build is interrupted, the journal is
+merged into the previous graph when resuming, so completed outputs are not
+built again.
+"""
+
+from hashlib import sha256
+import json
+import logging
+import os
+from os.path import isabs, join, relpath
+from subprocess import PIPE, run
+
+from innoconv.constants import (
+    BUILD_STATE_FOLDER,
+    DEPGRAPH_FILENAME,
+    ENCODING,
+    JOURNAL_FILENAME,
+)
+from innoconv.instrumentation import span
+from innoconv.metadata import __version__
+
+#: Format version of the stored graph
+DEPGRAPH_VERSION = 3
+
+#: Buffer size for hashing files
+HASH_BUFFER_SIZE = 2**16
+
+#: Command that lists files changed since a revision (relative to the working dir)
+GIT_DIFF_CMD = ["git", "diff", "--name-only", "--relative", "--no-renames", "-z"]
+
+#: Command that lists untracked files (relative to the working dir)
+GIT_UNTRACKED_CMD = ["git", "ls-files", "--others", "--exclude-standard", "-z"]
+
+
+def hash_value(value):
+    """
+    Return a hash of a value that can be serialized as JSON.
+
+    :param value: Value
+    :type value: object
+
+    :rtype: str
+    """
+    data = json.dumps(value, sort_keys=True, default=str)
+    return sha256(data.encode()).hexdigest()
+
+
+def hash_file(path):
+    """
+    Return a hash of the file content.
+
+    :param path: File path
+    :type path: str
+
+    :rtype: str
+    """
+    digest = sha256()
+    with open(path, "rb") as in_file:
+        for chunk in iter(lambda: in_file.read(HASH_BUFFER_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _run_git(cmd, source_dir):
+    """Run a git command and return the NUL-separated paths it outputs."""
+    with span("subprocess", "git", source_dir):
+        try:
+            proc = run(cmd, cwd=source_dir, stdout=PIPE, stderr=PIPE, check=False)
+        except FileNotFoundError as exc:
+            raise RuntimeError("Could not find git executable!") from exc
+    if proc.returncode != 0:
+        msg = (
+            f"git process returned exit code ({proc.returncode}). "
+            f"This is the git output:\n{proc.stderr.decode(ENCODING)}"
+        )
+        raise RuntimeError(msg)
+    return {path for path in proc.stdout.decode(ENCODING).split("\0") if path}
+
+
+def get_changed_files(source_dir, rev):
+    """
+    Return source files that changed since a git revision.
+
+    Uncommitted changes, removed and untracked files are included.
+
+    :param source_dir: Content source directory (inside a git repository)
+    :type source_dir: str
+    :param rev: Git revision (e.g. the commit of the previous build)
+    :type rev: str
+
+    :rtype: set[str]
+    :returns: Paths relative to the source directory
+
+    :raises RuntimeError: if git fails (e.g. for an unknown revision)
+    """
+    changed = _run_git(GIT_DIFF_CMD + [rev, "--"], source_dir)
+    return changed | _run_git(GIT_UNTRACKED_CMD, source_dir)
+
+
+def _empty_graph():
+    return {"files": {}, "values": {}, "outputs": {}, "data": {}}
+
+
+def _is_current(data):
+    """Check if stored build state was written by this version."""
+    return isinstance(data, dict) and (
+        data.get("version"),
+        data.get("innoconv_version"),
+    ) == (DEPGRAPH_VERSION, __version__)
+
+
+def _read_journal(path):
+    """Return values and records of a checkpoint journal (or ``None``)."""
+    try:
+        with open(path, encoding=ENCODING) as in_file:
+            lines = in_file.read().split("\n")
+        header = json.loads(lines[0])
+    except (OSError, ValueError):
+        return None
+    if not _is_current(header):
+        return None
+    records = []
+    for line in lines[1:]:
+        try:
+            records.append(json.loads(line))
+        except ValueError:
+            # last line is incomplete if the build was interrupted while writing
+            break
+    return header["values"], records
+
+
+def _merge_journal(previous, values, records):
+    """Merge journal records of an interrupted build into the previous graph."""
+    journal_files = {}
+    for record in records:
+        journal_files.update(record["files"])
+    changed = {
+        name
+        for name in set(values) | set(previous["values"])
+        if values.get(name) != previous["values"].get(name)
+    }
+    changed.update(
+        path
+        for path, entry in journal_files.items()
+        if entry["hash"] != previous["files"].get(path, {}).get("hash")
+    )
+    # outputs of the previous build that depend on changed inputs are dropped
+    outputs = {
+        output: entry
+        for output, entry in previous["outputs"].items()
+        if not changed.intersection(entry["inputs"] + entry["values"])
+    }
+    data = {key: value for key, value in previous["data"].items() if key in outputs}
+    for record in records:
+        outputs[record["output"]] = record["entry"]
+        data.pop(record["output"], None)
+        if record["data"] is not None:
+            data[record["output"]] = record["data"]
+    return {
+        "files": {**previous["files"], **journal_files},
+        "values": values,
+        "outputs": outputs,
+        "data": data,
+    }
+
+
+class DependencyGraph:  # pylint: disable=too-many-instance-attributes
+    """
+    Record dependencies of output files and check them against a previous build.
+
+    Outputs are referred to by paths relative to the output directory, source
+    files by paths relative to the source directory. Absolute paths are
+    accepted as well.
+
+    :param source_dir: Content source directory
+    :type source_dir: str
+    :param output_dir: Output directory
+    :type output_dir: str
+    :param previous: Graph of the previous build (as stored by :meth:`save`)
+    :type previous: dict
+    :param changed_files: Source files known to have changed since the previous
+                          build (all others are considered unchanged), by
+                          default modification times are checked
+    :type changed_files: set[str]
+    """
+
+    def __init__(self, source_dir, output_dir, previous=None, changed_files=None):
+        """Initialize DependencyGraph."""
+        self._source_dir = source_dir
+        self._output_dir = output_dir
+        self._changed_files = changed_files
+        self._previous = previous or _empty_graph()
+        self._files = {}
+        self._values = {}
+        self._outputs = {}
+        self._data = {}
+        self._journal_path = None
+        self._resumed = False
+
+    @classmethod
+    def load(cls, source_dir, output_dir, changed_files=None, resume=False):
+        """
+        Load graph of the previous build from the output directory.
+
+        A missing, unreadable or outdated graph is ignored.
+
+        :param source_dir: Content source directory
+        :type source_dir: str
+        :param output_dir: Output directory
+        :type output_dir: str
+        :param changed_files: Source files that changed since the previous
+                              build (see :func:`get_changed_files`)
+        :type changed_files: set[str]
+        :param resume: Merge the checkpoint journal of an interrupted build
+        :type resume: bool
+
+        :rtype: DependencyGraph
+        """
+        folder = join(output_dir, BUILD_STATE_FOLDER)
+        try:
+            with open(join(folder, DEPGRAPH_FILENAME), encoding="utf-8") as in_file:
+                previous = json.load(in_file)
+        except (OSError, ValueError):
+            previous = None
+        if not _is_current(previous):
+            previous = None
+        journal = None
+        if resume:
+            journal = _read_journal(join(folder, JOURNAL_FILENAME))
+            if journal is None:
+                logging.info("No checkpoint journal found, nothing to resume.")
+            else:
+                logging.info("Resuming from %d checkpoints.", len(journal[1]))
+                previous = _merge_journal(previous or _empty_graph(), *journal)
+        graph = cls(source_dir, output_dir, previous, changed_files)
+        graph._resumed = journal is not None  # pylint: disable=protected-access
+        return graph
+
+    @property
+    def has_previous(self):
+        """Return if a graph of a previous build exists."""
+        return bool(self._previous["outputs"])
+
+    @property
+    def is_resumed(self):
+        """
+        Return if an interrupted build is resumed.
+
+        Outputs that were not recorded before the interruption are unknown, so
+        the build can't be skipped.
+        """
+        return self._resumed
+
+    def _source_path(self, path):
+        return relpath(path, self._source_dir) if isabs(path) else path
+
+    def _output_path(self, path):
+        return relpath(path, self._output_dir) if isabs(path) else path
+
+    def hash_file(self, path):
+        """
+        Return hash of a source file (or ``None`` if it doesn't exist).
+
+        :param path: Source file path
+        :type path: str
+
+        :rtype: str
+        """
+        path = self._source_path(path)
+        try:
+            return self._files[path]["hash"]
+        except KeyError:
+            pass
+        full_path = join(self._source_dir, path)
+        try:
+            stat = os.stat(full_path)
+        except FileNotFoundError:
+            return None
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        prev = self._previous["files"].get(path, {})
+        if self._changed_files is not None:
+            unchanged = "hash" in prev and path not in self._changed_files
+        else:
+            unchanged = all(prev.get(key) == value for key, value in entry.items())
+        if unchanged:
+            entry["hash"] = prev["hash"]
+        else:
+            entry["hash"] = hash_file(full_path)
+        self._files[path] = entry
+        return entry["hash"]
+
+    def set_value(self, name, value):
+        """
+        Set a build-wide value that outputs can depend on.
+
+        :param name: Value name
+        :type name: str
+        :param value: Value (serializable as JSON)
+        :type value: object
+        """
+        self._values[name] = hash_value(value)
+
+    def _get_entry(self, inputs, values):
+        return {
+            "inputs": sorted(self._source_path(path) for path in inputs),
+            "values": sorted(values),
+        }
+
+    def record(self, output, inputs=(), values=(), data=None):
+        """
+        Record dependencies of an output file.
+
+        :param output: Output file path
+        :type output: str
+        :param inputs: Source files the output was built from (files that
+                       don't exist are recorded as absent)
+        :type inputs: list[str]
+        :param values: Names of build-wide values the output depends on (see
+                       :meth:`set_value`)
+        :type values: list[str]
+        :param data: Additional data stored with the output (serializable as
+                     JSON)
+        :type data: object
+        """
+        output = self._output_path(output)
+        entry = self._get_entry(inputs, values)
+        self._outputs[output] = entry
+        if data is not None:
+            self._data[output] = data
+        if self._journal_path is not None:
+            files = {
+                path: self._files[path]
+                for path in entry["inputs"]
+                if self.hash_file(path) is not None
+            }
+            record = {"output": output, "entry": entry, "data": data, "files": files}
+            self._write_journal(record, "a")
+
+    def start_journal(self):
+        """
+        Start writing a checkpoint journal.
+
+        From now on every recorded output is appended to the journal. Values
+        need to be set before (see :meth:`set_value`).
+        """
+        folder = join(self._output_dir, BUILD_STATE_FOLDER)
+        os.makedirs(folder, exist_ok=True)
+        self._journal_path = join(folder, JOURNAL_FILENAME)
+        header = {
+            "version": DEPGRAPH_VERSION,
+            "innoconv_version": __version__,
+            "values": self._values,
+        }
+        self._write_journal(header, "w")
+
+    def _write_journal(self, data, mode):
+        with open(self._journal_path, mode, encoding="utf-8") as out_file:
+            out_file.write(f"{json.dumps(data)}\n")
+
+    def get_data(self, output):
+        """
+        Return data stored with an output in the previous build.
+
+        :param output: Output file path
+        :type output: str
+
+        :rtype: object
+        """
+        return self._previous["data"].get(self._output_path(output))
+
+    def check(self, output, inputs=None, values=None):
+        """
+        Check if an output file of the previous build is still up to date.
+
+        :param output: Output file path
+        :type output: str
+        :param inputs: Source files the output is built from (defaults to the
+                       inputs of the previous build)
+        :type inputs: list[str]
+        :param values: Names of build-wide values the output depends on
+                       (defaults to the values of the previous build)
+        :type values: list[str]
+
+        :returns: Reason why the output needs to be rebuilt or ``None`` if it
+                  is up to date
+        :rtype: str
+        """
+        output = self._output_path(output)
+        try:
+            prev = self._previous["outputs"][output]
+        except KeyError:
+            return "new"
+        entry = self._get_entry(
+            prev["inputs"] if inputs is None else inputs,
+            prev["values"] if values is None else values,
+        )
+        if entry != prev:
+            return "dependencies changed"
+        reason = self._check_inputs(entry)
+        if reason is None and not os.path.exists(join(self._output_dir, output)):
+            reason = "output missing"
+        return reason
+
+    def _check_inputs(self, entry):
+        for path in entry["inputs"]:
+            file_hash = self.hash_file(path)
+            prev_hash = self._previous["files"].get(path, {}).get("hash")
+            if file_hash == prev_hash:
+                continue
+            if file_hash is None:
+                return f"removed: {path}"
+            if prev_hash is None:
+                return f"added: {path}"
+            return f"changed: {path}"
+        for name in entry["values"]:
+            if self._values.get(name) != self._previous["values"].get(name):
+                return f"changed: {name}"
+        return None
+
+    def is_up_to_date(self, output, inputs=(), values=()):
+        """
+        Check if an output file is up to date (see :meth:`check`).
+
+        :rtype: bool
+        """
+        return self.check(output, inputs, values) is None
+
+    def plan(self, outputs):
+        """
+        Plan a build.
+
+        :param outputs: Outputs that are known before the build, mapped to
+                        their inputs and values (e.g. converted content files)
+        :type outputs: dict(str, (list[str], list[str]))
+
+        :returns: Outputs that need to be rebuilt or removed mapped to the
+                  reason, outputs of the previous build that are not in
+                  ``outputs`` are checked against their previous dependencies
+        :rtype: dict(str, str)
+        """
+        outputs = {self._output_path(path): deps for path, deps in outputs.items()}
+        planned = {}
+        for output, (inputs, values) in outputs.items():
+            reason = self.check(output, inputs, values)
+            if reason:
+                planned[output] = reason
+        for output in self._previous["outputs"]:
+            if output not in outputs:
+                reason = self.check(output)
+                if reason:
+                    planned[output] = reason
+        return planned
+
+    def remove_stale_outputs(self):
+        """
+        Remove output files of the previous build that weren't built again.
+
+        Folders that are empty afterwards are removed as well.
+
+        :returns: Removed output paths
+        :rtype: list[str]
+        """
+        removed = []
+        for output in self._previous["outputs"]:
+            if output not in self._outputs:
+                path = join(self._output_dir, output)
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    continue
+                removed.append(output)
+                self._remove_empty_folders(os.path.dirname(path))
+        return removed
+
+    def _remove_empty_folders(self, folder):
+        """Remove a folder and its parents as long as they're empty."""
+        while relpath(folder, self._output_dir) != ".":
+            try:
+                os.rmdir(folder)
+            except OSError:  # not empty
+                return
+            folder = os.path.dirname(folder)
+
+    def to_json(self):
+        """Return graph as JSON-serializable dict."""
+        files = set()
+        for entry in self._outputs.values():
+            files.update(entry["inputs"])
+        return {
+            "version": DEPGRAPH_VERSION,
+            "innoconv_version": __version__,
+            "files": {
+                path: self._files[path]
+                for path in sorted(files)
+                if self.hash_file(path) is not None
+            },
+            "values": self._values,
+            "outputs": self._outputs,
+            "data": self._data,
+        }
+
+    def save(self):
+        """Write graph to the output directory."""
+        folder = join(self._output_dir, BUILD_STATE_FOLDER)
+        os.makedirs(folder, exist_ok=True)
+        path = join(folder, DEPGRAPH_FILENAME)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as out_file:
+            json.dump(self.to_json(), out_file)
+        os.replace(tmp_path, path)
+        if self._journal_path is not None:
+            os.remove(self._journal_path)
+            self._journal_path = None
@@ -9,23 +9,65 @@ Extensions interface with
 :class:`InnoconvRunner <innoconv.runner.InnoconvRunner>` through a set of
 methods defined in
 :class:`AbstractExtension <innoconv.ext.abstract.AbstractExtension>`.
+
+Extensions are registered by name in :data:`EXTENSION_PATHS`. They are only
+imported when they are enabled.
 """
 
-from innoconv.ext.copy_static import CopyStatic
-from innoconv.ext.generate_toc import GenerateToc
-from innoconv.ext.index_terms import IndexTerms
-from innoconv.ext.join_strings import JoinStrings
-from innoconv.ext.number_cards import NumberCards
-from innoconv.ext.tikz2svg import Tikz2Svg
-from innoconv.ext.write_manifest import WriteManifest
-
-#: List of available extensions
-EXTENSIONS = {
-    "copy_static": CopyStatic,
-    "generate_toc": GenerateToc,
-    "index_terms": IndexTerms,
-    "join_strings": JoinStrings,
-    "number_cards": NumberCards,
-    "tikz2svg": Tikz2Svg,
-    "write_manifest": WriteManifest,
+from collections.abc import Mapping
+from importlib import import_module
+
+#: Extension names mapped to import paths of extension classes
+EXTENSION_PATHS = {
+    "copy_static": "innoconv.ext.copy_static.CopyStatic",
+    "generate_toc": "innoconv.ext.generate_toc.GenerateToc",
+    "index_terms": "innoconv.ext.index_terms.IndexTerms",
+    "join_strings": "innoconv.ext.join_strings.JoinStrings",
+    "number_cards": "innoconv.ext.number_cards.NumberCards",
+    "tikz2svg": "innoconv.ext.tikz2svg.Tikz2Svg",
+    "write_manifest": "innoconv.ext.write_manifest.WriteManifest",
 }
+
+
+class ExtensionRegistry(Mapping):
+    """
+    Read-only mapping of extension names to extension classes.
+
+    Extension modules (and their dependencies) are imported on first lookup, so
+    only enabled extensions are loaded.
+
+    :param paths: Extension names mapped to import paths
+    :type paths: dict(str, str)
+    """
+
+    def __init__(self, paths):
+        """Initialize ExtensionRegistry."""
+        self._paths = paths
+        self._classes = {}
+
+    def __getitem__(self, name):
+        """
+        Import and return extension class.
+
+        :raises KeyError: if there's no extension with that name
+        :raises ImportError: if the extension module can't be imported
+        """
+        try:
+            return self._classes[name]
+        except KeyError:
+            module_name, class_name = self._paths[name].rsplit(".", 1)
+        ext_class = getattr(import_module(module_name), class_name)
+        self._classes[name] = ext_class
+        return ext_class
+
+    def __iter__(self):
+        """Iterate over extension names."""
+        return iter(self._paths)
+
+    def __len__(self):
+        """Return number of extensions."""
+        return len(self._paths)
+
+
+#: Available extensions
+EXTENSIONS = ExtensionRegistry(EXTENSION_PATHS)
@@ -5,6 +5,8 @@ The AbstractExtension is not instantiated directly but serves as super-class to
 all extensions.
 """
 
+from innoconv.traverse_ast import ElementIndex
+
 
 class AbstractExtension:
     """
@@ -17,22 +19,33 @@ class AbstractExtension:
     Extension classes should have a :py:attr:`_helptext` attribute. It's used
     to display a brief summary.
 
+    Extensions that work in streaming mode (see :meth:`post_process_block`)
+    need to set :py:attr:`_supports_streaming` to ``True``.
+
     :param manifest: Content manifest.
     :type manifest: innoconv.manifest.Manifest
     """
 
     _helptext = ""
+    _supports_streaming = False
 
     def __init__(self, manifest):
         """Initialize variables."""
         self._extensions = []
         self._manifest = manifest
+        self._element_index = None
+        self._error_handler = None
 
     @classmethod
     def helptext(cls):
         """Return a brief summary of what the extension is doing."""
         return cls._helptext
 
+    @classmethod
+    def supports_streaming(cls):
+        """Return if the extension can be used in streaming mode."""
+        return cls._supports_streaming
+
     def extension_list(self, extensions):
         """
         Receive list of active extension instances.
@@ -42,6 +55,74 @@ class AbstractExtension:
         """
         self._extensions = extensions
 
+    def element_index(self, index):
+        """
+        Receive element index of the file that is about to be post-processed.
+
+        The index is shared between all extensions. It's passed right before
+        :meth:`post_process_file`.
+
+        :param index: Index of the AST elements by type
+        :type index: innoconv.traverse_ast.ElementIndex
+        """
+        self._element_index = index
+
+    def _get_element_index(self, ast):
+        """Return shared element index for the AST (or create a new one)."""
+        if self._element_index is None or self._element_index.ast is not ast:
+            self._element_index = ElementIndex(ast)
+        return self._element_index
+
+    def element_hooks(self):
+        """
+        Return callbacks that are called on elements while parsing pandoc output.
+
+        Hooks run inside the JSON decoder, so extensions that only need to
+        inspect or annotate elements of certain types don't need a separate
+        traversal of the AST. Elements are visited bottom-up (children before
+        their parent). Hooks for a file are called after
+        :meth:`pre_process_file` and before :meth:`post_process_file`.
+
+        Meta data elements (e.g. the title) are visited as well.
+
+        :rtype: dict(str, function(dict))
+        :returns: Element type (or
+                  :data:`ANY_ELEMENT <innoconv.utils.ANY_ELEMENT>` for all
+                  types) mapped to a callback that receives the element
+        """
+        return {}
+
+    def error_handler(self, handler):
+        """
+        Receive a function that collects errors (keep-going mode only).
+
+        Errors that only affect a single item (e.g. an image) are passed to
+        :meth:`_handle_error`. The extension continues with the next item.
+
+        :param handler: Function that receives the exception
+        :type handler: function(Exception)
+        """
+        self._error_handler = handler
+
+    def _handle_error(self, error):
+        """Pass error to the error handler (or raise it if there is none)."""
+        if self._error_handler is None:
+            raise error
+        self._error_handler(error)
+
+    def dependency_graph(self, graph):
+        """
+        Receive the dependency graph of the build (incremental builds only).
+
+        It's passed before :meth:`start`. Extensions record the outputs they
+        write and can skip outputs that are still up to date. Build-wide
+        values that outputs depend on need to be set here, so they are
+        considered when planning a build.
+
+        :param graph: Dependency graph
+        :type graph: innoconv.depgraph.DependencyGraph
+        """
+
     def start(self, output_dir, source_dir):
         """
         Conversion is about to start.
@@ -68,6 +149,21 @@ class AbstractExtension:
         :type path: str
         """
 
+    def post_process_block(self, block, content_type):
+        """
+        Top-level block of a file was parsed (streaming mode only).
+
+        In streaming mode blocks are passed one-by-one and written to the
+        output file right afterwards. The block can be modified.
+        :meth:`post_process_file` is called after the last block with an empty
+        AST.
+
+        :param block: Top-level block as parsed by pandoc.
+        :type block: dict
+        :param content_type: Content type ('section', 'page' or 'fragment')
+        :type content_type: str
+        """
+
     def post_process_file(
         self, ast, title, content_type, section_type=None, short_title=None
     ):
@@ -86,6 +182,60 @@ class AbstractExtension:
         :type section_type: str
         """
 
+    def get_contribution(self):
+        """
+        Return what the extension collected from the current file.
+
+        Called after :meth:`post_process_file` in incremental builds (see
+        :meth:`dependency_graph`). The returned data is cached. If the file
+        isn't converted again in a later build, it is passed to
+        :meth:`replay_contribution` instead, so manifest fields and collected
+        files stay complete.
+
+        :rtype: object
+        :returns: Data that can be serialized as JSON (or ``None``)
+        """
+        return None
+
+    def get_inputs(self):
+        """
+        Return source files the current file depends on besides itself.
+
+        Called after :meth:`post_process_file` in incremental builds. The
+        converted file is rebuilt if one of them changes, is removed or, if
+        it didn't exist, is added.
+
+        :rtype: list[str]
+        :returns: Source file paths (absolute or relative to the source
+                  directory)
+        """
+        return []
+
+    def is_contribution_valid(self, contribution):  # pylint: disable=unused-argument
+        """
+        Check if a cached contribution can be replayed for the current file.
+
+        Called after :meth:`pre_process_file` for files that are up to date.
+        Extensions that depend on previous files (e.g. for numbering) return
+        ``False`` if that state changed. The file is converted again then.
+
+        :param contribution: Data returned by :meth:`get_contribution`
+        :type contribution: object
+
+        :rtype: bool
+        """
+        return True
+
+    def replay_contribution(self, contribution):
+        """
+        Replay the cached contribution of a file that isn't converted again.
+
+        Called instead of :meth:`post_process_file`.
+
+        :param contribution: Data returned by :meth:`get_contribution`
+        :type contribution: object
+        """
+
     def post_conversion(self, language):
         """
         Conversion of a single language folder finished.
@@ -49,17 +49,19 @@ happen inside the section ``chapter01`` in the English language version.
 import logging
 import os
 import os.path
+from os.path import getsize, join, relpath
 import shutil
 from urllib import parse
 
 from innoconv.constants import LOGO_EXTENSIONS, STATIC_FOLDER
 from innoconv.ext.abstract import AbstractExtension
+from innoconv.instrumentation import is_active, record_event, span
 from innoconv.traverse_ast import TraverseAst
 
 VIDEO_CLASS = "video-static"
 
 
-class CopyStatic(AbstractExtension):
+class CopyStatic(AbstractExtension):  # pylint: disable=too-many-instance-attributes
     """
     Copy static files to the output folder.
 
@@ -68,6 +70,7 @@ class CopyStatic(AbstractExtension):
     """
 
     _helptext = "Copy static files to the output folder."
+    _supports_streaming = True
 
     def __init__(self, *args, **kwargs):
         """Initialize variables."""
@@ -76,8 +79,11 @@ class CopyStatic(AbstractExtension):
         self._output_dir = None
         self._current_language = None
         self._to_copy = set()
+        self._file_static = []
+        self._file_inputs = []
         self._current_path = None
         self._logo_filename = None
+        self._depgraph = None
 
     # content parsing
 
@@ -89,6 +95,8 @@ class CopyStatic(AbstractExtension):
                 link_element["c"][2][0] = self._add_static_from_section(link)
             except ValueError:
                 pass
+            except RuntimeError as error:
+                self._handle_error(error)
 
     def _process_image(self, image_element):
         link = image_element["c"][2][0]
@@ -96,6 +104,8 @@ class CopyStatic(AbstractExtension):
             image_element["c"][2][0] = self._add_static_from_section(link)
         except ValueError:
             pass
+        except RuntimeError as error:
+            self._handle_error(error)
 
     def _add_static_from_section(self, orig_path):
         # skip remote resource
@@ -112,8 +122,8 @@ class CopyStatic(AbstractExtension):
                 section_path = f"{section_path.strip('/')}/"
         return self._add_static(ref_path, section_path)
 
-    def _add_static(self, ref_path, section_path=""):
-        """Remember paths to copy and rewrite URL."""
+    def _get_candidates(self, ref_path, section_path):
+        """Return source, destination and URL of localized and common version."""
 
         def _get_src_file_path(root_dir, _path, _sec_path, lang=""):
             return os.path.join(root_dir, lang, STATIC_FOLDER, _sec_path, _path)
@@ -123,35 +133,74 @@ class CopyStatic(AbstractExtension):
                 lang = f"_{lang}"
             return os.path.join(root_dir, STATIC_FOLDER, lang, _sec_path, _path)
 
-        # localized version
-        src = _get_src_file_path(
-            self._source_dir, ref_path, section_path, self._current_language
-        )
-        dst = _get_dest_file_path(
-            self._output_dir, ref_path, section_path, self._current_language
+        lang = self._current_language
+        return (
+            (
+                _get_src_file_path(self._source_dir, ref_path, section_path, lang),
+                _get_dest_file_path(self._output_dir, ref_path, section_path, lang),
+                f"_{lang}/{section_path}{ref_path}",
+            ),
+            (
+                _get_src_file_path(self._source_dir, ref_path, section_path),
+                _get_dest_file_path(self._output_dir, ref_path, section_path),
+                f"{section_path}{ref_path}",
+            ),
         )
-        rewritten = f"_{self._current_language}/{section_path}{ref_path}"
-        if not os.path.isfile(src):
-            # common version
-            src = _get_src_file_path(self._source_dir, ref_path, section_path)
-            dst = _get_dest_file_path(self._output_dir, ref_path, section_path)
-            rewritten = f"{section_path}{ref_path}"
-            if not os.path.isfile(src):
-                raise RuntimeError(f"Missing static file {ref_path}")
 
+    def _resolve(self, ref_path, section_path):
+        """Return source, destination and URL of a static file (or ``None``)."""
+        for src, dst, rewritten in self._get_candidates(ref_path, section_path):
+            if os.path.isfile(src):
+                return src, dst, rewritten
+        return None
+
+    def _add_static(self, ref_path, section_path=""):
+        """Remember paths to copy and rewrite URL."""
+        # the localized version takes precedence (even if it's added later)
+        candidates = self._get_candidates(ref_path, section_path)
+        self._file_inputs.extend(src for src, _, _ in candidates)
+        resolved = self._resolve(ref_path, section_path)
+        if resolved is None:
+            raise RuntimeError(f"Missing static file {ref_path}")
+        src, dst, rewritten = resolved
         self._to_copy.add((src, dst))
+        self._file_static.append((ref_path, section_path, src, dst))
         return rewritten
 
     # file copying
     def _copy_files(self):
         logging.info("%d files found.", len(self._to_copy))
         for src, dst in self._to_copy:
+            if not os.path.isfile(src):
+                # cached reference of a file that was removed meanwhile
+                rel_src = relpath(src, self._source_dir)
+                self._handle_error(RuntimeError(f"Missing static file {rel_src}"))
+                continue
+            if self._is_up_to_date(src, dst):
+                self._record(src, dst)
+                logging.info(" %s is up to date", dst)
+                if is_active():
+                    record_event("static_skipped", src=src, dst=dst, bytes=getsize(dst))
+                continue
             # create folders as needed
             folder = os.path.dirname(dst)
             if not os.path.lexists(folder):
                 os.makedirs(folder)
             logging.info(" %s -> %s", src, dst)
-            shutil.copyfile(src, dst)
+            with span("io", "copy", src):
+                shutil.copyfile(src, dst)
+            self._record(src, dst)
+            if is_active():
+                record_event("static_copied", src=src, dst=dst, bytes=getsize(dst))
+
+    def _record(self, src, dst):
+        """Record a copied file in the dependency graph (once it's done)."""
+        if self._depgraph is not None:
+            self._depgraph.record(dst, (src,))
+
+    def _is_up_to_date(self, src, dst):
+        """Check if a file was already copied by a previous run."""
+        return self._depgraph is not None and self._depgraph.is_up_to_date(dst, (src,))
 
     def _add_logo(self):
         for ext in LOGO_EXTENSIONS:
@@ -174,6 +223,10 @@ class CopyStatic(AbstractExtension):
 
     # extension events
 
+    def dependency_graph(self, graph):
+        """Remember dependency graph."""
+        self._depgraph = graph
+
     def start(self, output_dir, source_dir):
         """Remember directories."""
         self._output_dir = output_dir
@@ -186,12 +239,56 @@ class CopyStatic(AbstractExtension):
     def pre_process_file(self, path):
         """Remember file path."""
         self._current_path = path
+        self._file_static = []
+        self._file_inputs = []
+
+    def post_process_block(self, block, content_type):
+        """Find all static files in block."""
+        TraverseAst(self.process_element).traverse([block])
 
     def post_process_file(
         self, ast, title, content_type, section_type=None, short_title=None
     ):
         """Find all static files in AST."""
-        TraverseAst(self.process_element).traverse(ast)
+        index = self._get_element_index(ast)
+        for elem, _ in index.find("Image"):
+            self._process_image(elem)
+        for elem, _ in index.find("Link", VIDEO_CLASS):
+            self._process_link(elem)
+
+    def get_contribution(self):
+        """Return static files referenced in the file (relative paths)."""
+        return [
+            (
+                ref_path,
+                section_path,
+                relpath(src, self._source_dir),
+                relpath(dst, self._output_dir),
+            )
+            for ref_path, section_path, src, dst in self._file_static
+        ]
+
+    def is_contribution_valid(self, contribution):
+        """Check if referenced static files still resolve to the same files."""
+        for ref_path, section_path, src, dst in contribution or ():
+            resolved = self._resolve(ref_path, section_path)
+            if resolved is None or resolved[:2] != (
+                join(self._source_dir, src),
+                join(self._output_dir, dst),
+            ):
+                return False
+        return True
+
+    def get_inputs(self):
+        """Return localized and common version of referenced static files."""
+        return self._file_inputs
+
+    def replay_contribution(self, contribution):
+        """Add cached static files of the file."""
+        for _, _, src, dst in contribution or ():
+            self._to_copy.add(
+                (join(self._source_dir, src), join(self._output_dir, dst))
+            )
 
     def finish(self):
         """Copy static files to the output folder."""
@@ -14,6 +14,7 @@ class GenerateToc(AbstractExtension):
     """Generate a TOC from content sections."""
 
     _helptext = "Generate a table of contents."
+    _supports_streaming = True
 
     def __init__(self, *args, **kwargs):
         """Initialize variables."""
@@ -22,6 +23,7 @@ class GenerateToc(AbstractExtension):
         self._current_path = None
         self._language = None
         self._toc = []
+        self._section = None
 
     def _add_to_toc(self, title, short_title, section_type):
         path_components = self._splitall(self._current_path)
@@ -86,14 +88,25 @@ class GenerateToc(AbstractExtension):
     def pre_process_file(self, path):
         """Remember current path."""
         self._current_path = path
+        self._section = None
 
     def post_process_file(
         self, _, title, content_type, section_type=None, short_title=None
     ):
         """Add this section file to the TOC."""
         if content_type == "section":
+            self._section = (title, short_title, section_type)
             self._add_to_toc(title, short_title, section_type)
 
+    def get_contribution(self):
+        """Return title and type of the section."""
+        return self._section
+
+    def replay_contribution(self, contribution):
+        """Add cached section to the TOC."""
+        if contribution is not None:
+            self._add_to_toc(*contribution)
+
     def manifest_fields(self):
         """Add `toc` field to manifest."""
         return {"toc": self._toc}
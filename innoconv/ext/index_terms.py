@@ -7,6 +7,12 @@ In order to achieve this a list of index terms is provided in the
 the whole documents themselves. Also for every occurence of an index term in
 the text an ID is attached.
 
+Index term spans are collected while the pandoc output is parsed (see
+:meth:`element_hooks <innoconv.ext.abstract.AbstractExtension.element_hooks>`),
+so no additional traversal of the AST is needed. Spans in meta data (e.g. the
+title) are ignored and nested spans are numbered outer first, like in document
+order.
+
 This extension modifies the AST.
 
 .. note::
@@ -17,17 +23,40 @@ This extension modifies the AST.
 from slugify import slugify
 
 from innoconv.ext.abstract import AbstractExtension
-from innoconv.traverse_ast import TraverseAst
 
 INDEX_ATTRIBUTE = "data-index-term"
 
 INDEX_ID_TEMPLATE = "index-term-{}-{}"
 
+#: Meta data types that may contain spans
+META_TYPES = ("MetaInlines", "MetaBlocks")
+
+
+def _get_index_term(elem):
+    """Return index term of a span (or ``None``)."""
+    for key, value in elem["c"][0][2]:
+        if key == INDEX_ATTRIBUTE:
+            return value
+    return None
+
+
+def _count_index_terms(value):
+    """Count index term spans in a (partial) AST."""
+    if isinstance(value, list):
+        return sum(_count_index_terms(item) for item in value)
+    if not isinstance(value, dict):
+        return 0
+    count = _count_index_terms(value.get("c"))
+    if value.get("t") == "Span" and _get_index_term(value) is not None:
+        count += 1
+    return count
+
 
 class IndexTerms(AbstractExtension):
     """Scan the documents for index terms."""
 
     _helptext = "Scan the documents for index terms and write them to the manifest."
+    _supports_streaming = True
 
     def __init__(self, *args, **kwargs):
         """Initialize variables."""
@@ -36,6 +65,8 @@ class IndexTerms(AbstractExtension):
         self._language = None
         self._index_terms = {}
         self._page_occurences = None
+        self._spans = []
+        self._file_terms = []
 
     def _handle_index_term(self, elem, index_term):
         index_term_slug = slugify(index_term)
@@ -48,8 +79,11 @@ class IndexTerms(AbstractExtension):
         self._page_occurences[index_term_slug] = number
         occurence_id = INDEX_ID_TEMPLATE.format(index_term_slug, number)
         elem["c"][0][0] = occurence_id
+        self._add_index_term(index_term, index_term_slug, number)
 
-        # add to manifest field
+    def _add_index_term(self, index_term, index_term_slug, number):
+        """Add index term occurence to manifest field."""
+        self._file_terms.append((index_term, index_term_slug, number))
         entry = [
             self._current_section_name,
             f"{index_term_slug}-{number}",
@@ -62,12 +96,29 @@ class IndexTerms(AbstractExtension):
                 [entry],
             ]
 
-    def process_element(self, elem, _):
-        """Respond to AST element."""
-        if elem["t"] == "Span":
-            attrs = dict(elem["c"][0][2])
-            if INDEX_ATTRIBUTE in attrs.keys():
-                self._handle_index_term(elem, attrs["data-index-term"])
+    def process_element(self, elem):
+        """Remember index term span element."""
+        index_term = _get_index_term(elem)
+        if index_term is None:
+            return
+        # children are hooked first, so nested spans were collected already
+        position = len(self._spans)
+        if self._spans:
+            position -= _count_index_terms(elem["c"][1])
+        self._spans.insert(position, (elem, index_term))
+
+    def _drop_meta_spans(self, elem):
+        """Forget spans found in meta data."""
+        if self._spans:
+            count = _count_index_terms(elem["c"])
+            if count:
+                del self._spans[-count:]
+
+    def element_hooks(self):
+        """Collect spans while the AST is parsed."""
+        hooks = {"Span": self.process_element}
+        hooks.update(dict.fromkeys(META_TYPES, self._drop_meta_spans))
+        return hooks
 
     def pre_conversion(self, language):
         """Remember current conversion language."""
@@ -78,13 +129,33 @@ class IndexTerms(AbstractExtension):
         """Remember current path."""
         self._current_section_name = path[3:]  # strip language
         self._page_occurences = {}
+        self._spans = []
+        self._file_terms = []
+
+    def _handle_spans(self, content_type):
+        if content_type == "section":
+            for elem, index_term in self._spans:
+                self._handle_index_term(elem, index_term)
+        self._spans = []
+
+    def post_process_block(self, block, content_type):
+        """Assign IDs to index terms found in the block."""
+        self._handle_spans(content_type)
 
     def post_process_file(
         self, ast, title, content_type, section_type=None, short_title=None
     ):
-        """Scan the AST."""
-        if content_type == "section":
-            TraverseAst(self.process_element).traverse(ast)
+        """Assign IDs to index terms found in the AST."""
+        self._handle_spans(content_type)
+
+    def get_contribution(self):
+        """Return index terms found in the file."""
+        return self._file_terms
+
+    def replay_contribution(self, contribution):
+        """Add cached index terms of the file."""
+        for index_term in contribution or ():
+            self._add_index_term(*index_term)
 
     def manifest_fields(self):
         """Add `index_terms` field to manifest."""
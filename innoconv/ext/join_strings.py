@@ -5,6 +5,9 @@ The motivation behind this extension is to make the AST more readable and also
 to save space by compressing the representation. The actual appearance in a
 viewer remains identical.
 
+Merging happens while the pandoc output is parsed (see
+:meth:`element_hooks <innoconv.ext.abstract.AbstractExtension.element_hooks>`).
+
 This extension modifies the AST.
 
 =======
@@ -16,6 +19,7 @@ Example
 """
 
 from innoconv.ext.abstract import AbstractExtension
+from innoconv.utils import ANY_ELEMENT
 
 #: Type that represents a string
 STR_TYPE = "Str"
@@ -23,42 +27,49 @@ STR_TYPE = "Str"
 #: Content types that are merged
 TYPES_TO_MERGE = (STR_TYPE, "Space", "SoftBreak")
 
+#: Prefix of meta data types (left untouched)
+META_TYPE_PREFIX = "Meta"
+
 
 class JoinStrings(AbstractExtension):
     """Merge consecutive strings and spaces in the AST."""
 
     _helptext = "Merge sequences of strings and spaces in the AST."
-
-    def __init__(self, *args, **kwargs):
-        """Initialize variables."""
-        super().__init__(*args, **kwargs)
-        self.previous_element = None  # the element we merge to
+    _supports_streaming = True
 
     # content parsing
 
-    def _process_ast_element(self, ast_element):
+    def _process_element(self, elem):
         """
-        Process a single element in the AST.
+        Merge strings in all lists below an element.
 
-        Descend further down if possible.
+        Child elements have already been processed by the time their parent is
+        decoded, so only lists that are directly owned by the element need to be
+        looked at.
         """
-        self.previous_element = None  # Stop merging on new element
-        if isinstance(ast_element, list):
-            self._process_ast_array(ast_element)
+        if elem["t"].startswith(META_TYPE_PREFIX):
             return
         try:
-            for key in ast_element:
-                self._process_ast_element(ast_element[key])
-        except TypeError:
-            pass
+            content = elem["c"]
+        except KeyError:
+            return
+        self._process_value(content)
+
+    def _process_value(self, value):
+        if isinstance(value, list):
+            self._process_ast_array(value)
+        elif isinstance(value, dict) and "t" not in value:
+            # untyped objects (e.g. citations) are not hooked themselves
+            for item in value.values():
+                self._process_value(item)
 
     def _process_ast_array(self, ast_array):
         """
-        Iterate over elements in AST.
+        Merge mergeable content in a list.
 
-        The first instance of mergeable content is stored in
-        self.previous_element. Every subsequent instance of mergeable content
-        gets added to the first instance and finally removed.
+        The first instance of mergeable content is kept. Every subsequent
+        instance of mergeable content gets added to the first instance and is
+        dropped when the list is rebuilt.
         """
 
         def is_string_or_space(content_element):
@@ -68,43 +79,46 @@ class JoinStrings(AbstractExtension):
             except (TypeError, KeyError):  # could be an invalid dictionary
                 return False
 
-        self.previous_element = None
-        to_delete = set()
-        for pos, ast_element in enumerate(ast_array):
+        previous_element = None  # the element we merge to
+        merged = []
+        for ast_element in ast_array:
             if is_string_or_space(ast_element):
-                if self.previous_element is None:
-                    self._prepare_previous_element(ast_element)
+                if previous_element is None:
+                    previous_element = self._prepare_previous_element(ast_element)
+                    merged.append(previous_element)
                 else:
-                    self._merge_to_previous_element(ast_element)
-                    to_delete.add(pos)
+                    self._merge_to_previous_element(previous_element, ast_element)
             else:
-                self._process_ast_element(ast_element)
-        removed_items = 0  # remember number of deleted items to adjust index
-        for index in to_delete:
-            del ast_array[index - removed_items]
-            removed_items += 1
-        # Necessary for when we finish an element list and go back to a list
-        # that has been processed already which contained it.
-        self.previous_element = None
-
-    def _prepare_previous_element(self, content_element):
-        """Normalize self.previous_element to always be a Str."""
-        self.previous_element = content_element
-        if self.previous_element["t"] != STR_TYPE:
-            self.previous_element["t"] = STR_TYPE
-            self.previous_element["c"] = " "
-
-    def _merge_to_previous_element(self, content_element):
+                previous_element = None  # Stop merging on new element
+                self._process_value(ast_element)
+                merged.append(ast_element)
+        if len(merged) != len(ast_array):
+            ast_array[:] = merged
+
+    @staticmethod
+    def _prepare_previous_element(content_element):
+        """Normalize element to always be a Str."""
+        if content_element["t"] != STR_TYPE:
+            content_element["t"] = STR_TYPE
+            content_element["c"] = " "
+        return content_element
+
+    @staticmethod
+    def _merge_to_previous_element(previous_element, content_element):
         if content_element["t"] == STR_TYPE:
-            self.previous_element["c"] += content_element["c"]
+            previous_element["c"] += content_element["c"]
         else:
-            if not self.previous_element["c"].endswith(" "):
-                self.previous_element["c"] += " "
+            if not previous_element["c"].endswith(" "):
+                previous_element["c"] += " "
 
     # extension events
 
+    def element_hooks(self):
+        """Merge strings while the AST is parsed."""
+        return {ANY_ELEMENT: self._process_element}
+
     def post_process_file(
         self, ast, title, content_type, section_type=None, short_title=None
     ):
-        """Process AST in-place."""
-        self._process_ast_element(ast)
+        """Process top-level list (it's not owned by any element)."""
+        self._process_value(ast)
@@ -13,6 +13,11 @@ Furthermore this extension faciliates the course-wide tracking of exercise
 progress. For each exercise, the total achievable points and number of questions
 are stored. A viewer application can easily display total points per section
 without having to scan all documents for exercises.
+
+Card numbers depend on the cards of previous sections. In incremental builds
+the cards of an unchanged section are replayed from the cache only if the
+numbering at the start of the section is the same as before. Otherwise the
+section is converted again.
 """
 
 import logging
@@ -28,6 +33,7 @@ class NumberCards(AbstractExtension):
     """Scan the documents for cards."""
 
     _helptext = "Number all cards and add a cards field to the manifest."
+    _supports_streaming = True
 
     def __init__(self, *args, **kwargs):
         """Initialize variables."""
@@ -36,16 +42,16 @@ class NumberCards(AbstractExtension):
             "card": 0,
             "section": 0,
             "subsection": 0,
+            "card_count": 0,
+            "exercise_points": 0,
+            "question_count": 0,
         }
         self._cards = {}
         self._language = None
         self._parts = None
+        self._section_started = False
+        self._section_cards = None
         self._done = False
-        self._counters = {
-            "card_count": 0,
-            "exercise_points": 0,
-            "question_count": 0,
-        }
 
     def _add_card(self, card_type, elem):
         self._counters["card"] += 1
@@ -77,7 +83,18 @@ class NumberCards(AbstractExtension):
             )
         else:
             card = (card_id, number, card_type)
+        self._register_card(card)
+
+        # Set ID
+        if not elem["c"][0][0]:
+            elem["c"][0][0] = card_id
+
+        # Attach number as attribute
+        elem["c"][0][2].append(("data-number", number))
 
+    def _register_card(self, card):
+        section_id = "/".join(self._parts)
+        self._section_cards["cards"].append(card)
         if self._done:
             # Ensure this language doesn't have extra cards
             if section_id not in self._cards:
@@ -86,8 +103,8 @@ class NumberCards(AbstractExtension):
                 logging.warning(
                     "Section %s has extra card %s (%s) for language %s",
                     section_id,
-                    number,
-                    card_type,
+                    card[1],
+                    card[2],
                     self._language,
                 )
             self._counters["card_count"] += 1
@@ -97,12 +114,20 @@ class NumberCards(AbstractExtension):
             except KeyError:
                 self._cards[section_id] = [card]
 
-        # Set ID
-        if not elem["c"][0][0]:
-            elem["c"][0][0] = card_id
-
-        # Attach number as attribute
-        elem["c"][0][2].append(("data-number", number))
+    def _check_card_count(self):
+        # Ensure this language doesn't have less cards in section
+        if self._done:
+            section_id = "/".join(self._parts)
+            try:
+                expected_len = len(self._cards[section_id])
+            except KeyError:
+                expected_len = 0
+            if expected_len > self._counters["card_count"]:
+                logging.warning(
+                    "Section %s has too few cards for language %s",
+                    section_id,
+                    self._language,
+                )
 
     def _scan_questions(self, elem, _):
         if elem["t"] == "Span" and "question" in elem["c"][0][1]:
@@ -120,13 +145,27 @@ class NumberCards(AbstractExtension):
     def process_element(self, elem, _):
         """Respond to AST element."""
         if elem["t"] == "Div":
-            classes = elem["c"][0][1]
-            for card_class in CARD_CLASSES:
-                if card_class in classes:
-                    self._add_card(card_class, elem)
-                    if card_class == "exercise":
-                        raise IgnoreSubtreeError
-                    break
+            card_class = self._process_div(elem)
+            if card_class == "exercise":
+                raise IgnoreSubtreeError
+
+    def _process_div(self, elem):
+        classes = elem["c"][0][1]
+        for card_class in CARD_CLASSES:
+            if card_class in classes:
+                self._add_card(card_class, elem)
+                return card_class
+        return None
+
+    @staticmethod
+    def _in_exercise(elem, index):
+        """Check if element is nested inside an exercise."""
+        parent = index.get_parent(elem)
+        while parent is not None:
+            if parent["t"] == "Div" and "exercise" in parent["c"][0][1]:
+                return True
+            parent = index.get_parent(parent)
+        return False
 
     def pre_conversion(self, language):
         """Remember current conversion language."""
@@ -141,38 +180,66 @@ class NumberCards(AbstractExtension):
     def pre_process_file(self, path):
         """Remember current path."""
         self._parts = Path(path).parts[1:]  # strip language folder
+        self._section_started = False
+        self._section_cards = None
+
+    def _start_section(self):
+        """Update counters once per section file."""
+        if self._section_started:
+            return
+        self._section_started = True
+        self._counters["card_count"] = 0
+        section_level = len(self._parts)
+        if section_level == 1:
+            self._counters["section"] += 1
+            self._counters["subsection"] = 0
+            self._counters["card"] = 0
+        elif section_level == 2:
+            self._counters["subsection"] += 1
+            self._counters["card"] = 0
+        self._section_cards = {"start": self._get_numbering(), "cards": []}
+
+    def _get_numbering(self):
+        return [self._counters[key] for key in ("section", "subsection", "card")]
+
+    def post_process_block(self, block, content_type):
+        """Scan a single block."""
+        if content_type == "section" and self._parts:
+            self._start_section()
+            TraverseAst(self.process_element).traverse([block])
 
     def post_process_file(
         self, ast, title, content_type, section_type=None, short_title=None
     ):
         """Scan the AST."""
-        if content_type == "section":
-            self._counters["card_count"] = 0
-            section_level = len(self._parts)
-            if section_level > 0:
-                if section_level == 1:
-                    self._counters["section"] += 1
-                    self._counters["subsection"] = 0
-                    self._counters["card"] = 0
-                elif section_level == 2:
-                    self._counters["subsection"] += 1
-                    self._counters["card"] = 0
-
-                TraverseAst(self.process_element).traverse(ast)
-
-                # Ensure this language doesn't have less cards in section
-                if self._done:
-                    section_id = "/".join(self._parts)
-                    try:
-                        expected_len = len(self._cards[section_id])
-                    except KeyError:
-                        expected_len = 0
-                    if expected_len > self._counters["card_count"]:
-                        logging.warning(
-                            "Section %s has too few cards for language %s",
-                            section_id,
-                            self._language,
-                        )
+        if content_type == "section" and self._parts:
+            self._start_section()
+            index = self._get_element_index(ast)
+            for elem, _ in index.find("Div"):
+                if not self._in_exercise(elem, index):
+                    self._process_div(elem)
+            self._check_card_count()
+
+    def get_contribution(self):
+        """Return numbering at the start of the section and its cards."""
+        return self._section_cards
+
+    def is_contribution_valid(self, contribution):
+        """Check if numbering at the start of the section is unchanged."""
+        if contribution is None:
+            return True
+        self._start_section()
+        return self._get_numbering() == contribution["start"]
+
+    def replay_contribution(self, contribution):
+        """Add cached cards of the section."""
+        if contribution is None:
+            return
+        self._start_section()
+        for card in contribution["cards"]:
+            self._counters["card"] += 1
+            self._register_card(tuple(card))
+        self._check_card_count()
 
     def manifest_fields(self):
         """Add ``cards`` field to manifest."""
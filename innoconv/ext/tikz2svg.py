@@ -40,19 +40,20 @@ to the following.
 
 """
 
-
 from hashlib import md5
 from logging import critical, info
 from os import makedirs
 from os.path import join
-from subprocess import PIPE, Popen
+from subprocess import PIPE
 from tempfile import TemporaryDirectory
 
 from scour import scour
 
 from innoconv.constants import ENCODING, STATIC_FOLDER
 from innoconv.ext.abstract import AbstractExtension
-from innoconv.traverse_ast import TraverseAst
+from innoconv.instrumentation import record_event, span
+from innoconv.instrumentation.resources import MeasuredPopen
+from innoconv.traverse_ast import AstEditor, Edit, ElementIndex
 
 TEX_FILE_TEMPLATE = r"""
 \documentclass{{standalone}}
@@ -73,22 +74,28 @@ TIKZ_FOLDER = "_tikz"
 TIKZ_FILENAME = "tikz_{}"
 TIKZ_IMG_TAG_ALT = "TikZ Image"
 
+#: Build-wide values rendered images depend on
+TIKZ_VALUES = ("tikz_preamble",)
+
 
 class Tikz2Svg(AbstractExtension):
     r"""Convert and insert Ti\ *k*\Z images."""
 
     _helptext = "Convert TikZ code to SVG files."
+    _supports_streaming = True
 
     def __init__(self, *args, **kwargs):
         """Initialize variables."""
         super().__init__(*args, **kwargs)
         self._output_dir = None
         self._tikz_images = {}
+        self._file_images = {}
+        self._depgraph = None
 
     @staticmethod
     def _run(cmd, cwd, cmd_input=None):
-        with Popen(
-            cmd, shell=True, stdin=PIPE, stdout=PIPE, stderr=PIPE, cwd=cwd
+        with span("subprocess", cmd.split()[0], cmd=cmd) as current, MeasuredPopen(
+            cmd, shell=True, stdin=PIPE, stdout=PIPE, stderr=PIPE, cwd=cwd, span=current
         ) as pipe:
             if pipe.stdin is None or pipe.stdout is None or pipe.stderr is None:
                 raise RuntimeError("Failed to open pipe!")
@@ -131,20 +138,24 @@ class Tikz2Svg(AbstractExtension):
         return opts
 
     def _tikz_found(self, element, caption=None):
-        """Remember TikZ code and replace with image."""
+        """Remember TikZ code and return image element."""
         code = element["c"][1].strip()
         tikz_hash = md5(code.encode()).hexdigest()
         self._tikz_images[tikz_hash] = code
+        self._file_images[tikz_hash] = code
         filename = f"{Tikz2Svg._get_tikz_name(tikz_hash)}.svg"
-        element["t"] = "Image"
-        element["c"] = [
-            ["", [], []],
-            caption or [],
-            [join(TIKZ_FOLDER, filename), TIKZ_IMG_TAG_ALT],
-        ]
         info("Found TikZ image %s", filename)
-
-    def _parse_tikz(self, elem, parent):
+        return {
+            "t": "Image",
+            "c": [
+                ["", [], []],
+                caption or [],
+                [join(TIKZ_FOLDER, filename), TIKZ_IMG_TAG_ALT],
+            ],
+        }
+
+    def _parse_tikz(self, elem, parent, editor):
+        caption = None
         try:
             if (
                 parent
@@ -152,19 +163,29 @@ class Tikz2Svg(AbstractExtension):
                 and "figure" in parent["c"][0][1]
                 and parent["c"][1][0]["t"] == "Para"
             ):
-                caption = parent["c"][1].pop(0)["c"]
-                self._tikz_found(elem, caption=caption)
-                return
+                caption_para = parent["c"][1][0]
+                editor.edit(caption_para, parent, Edit.delete())
+                caption = caption_para["c"]
         except KeyError:
             pass
-        self._tikz_found(elem)
+        image = self._tikz_found(elem, caption=caption)
+        editor.edit(elem, parent, Edit.replace(image))
 
-    def _get_texdoc(self, tikz_code):
-        """Generate tex document from TikZ code."""
+    def _process_ast(self, ast, index):
+        editor = AstEditor(ast, index)
+        for elem, parent in index.find("CodeBlock", "tikz"):
+            self._parse_tikz(elem, parent, editor)
+        editor.apply()
+
+    def _get_preamble(self):
         try:
-            preamble = self._manifest.tikz_preamble
+            return self._manifest.tikz_preamble
         except AttributeError:
-            preamble = ""
+            return ""
+
+    def _get_texdoc(self, tikz_code):
+        """Generate tex document from TikZ code."""
+        preamble = self._get_preamble()
         # as this template is used with .format() we need to escape
         # curly brackets
         preamble.replace("{", "{{")
@@ -205,26 +226,44 @@ class Tikz2Svg(AbstractExtension):
         with open(svg_filename, "w", encoding=ENCODING) as svg_file:
             svg_file.write(svg_code)
 
-    def process_element(self, elem, parent):
-        """Respond to AST element."""
-        try:
-            if elem["t"] == "CodeBlock" and "tikz" in elem["c"][0][1]:
-                self._parse_tikz(elem, parent)
-        except (TypeError, KeyError):
-            pass
-
     # extension events
 
+    def dependency_graph(self, graph):
+        """Remember dependency graph and set TikZ preamble as build value."""
+        self._depgraph = graph
+        graph.set_value("tikz_preamble", self._get_preamble())
+
     def start(self, output_dir, source_dir):
         """Initialize the list of images to be converted."""
         self._tikz_images = {}
         self._output_dir = output_dir
 
+    def pre_process_file(self, path):
+        """Reset images found in the current file."""
+        self._file_images = {}
+
+    def post_process_block(self, block, content_type):
+        """Find TikZ images in block and replace with image tags."""
+        ast = [block]
+        self._process_ast(ast, ElementIndex(ast))
+        if ast[0] is not block:
+            # block itself was replaced but it's referenced by the runner
+            block.clear()
+            block.update(ast[0])
+
     def post_process_file(
         self, ast, title, content_type, section_type=None, short_title=None
     ):
         """Find TikZ images in AST and replace with image tags."""
-        TraverseAst(self.process_element).traverse(ast)
+        self._process_ast(ast, self._get_element_index(ast))
+
+    def get_contribution(self):
+        """Return TikZ images found in the file."""
+        return self._file_images
+
+    def replay_contribution(self, contribution):
+        """Add cached TikZ images of the file."""
+        self._tikz_images.update(contribution or {})
 
     def finish(self):
         """Render images and copy SVG files to the static folder."""
@@ -233,4 +272,22 @@ class Tikz2Svg(AbstractExtension):
             return
 
         for tikz_hash, tikz_code in self._tikz_images.items():
-            self._render_svg(tikz_hash, tikz_code)
+            filename = f"{Tikz2Svg._get_tikz_name(tikz_hash)}.svg"
+            output = join(STATIC_FOLDER, TIKZ_FOLDER, filename)
+            if self._depgraph is not None and self._depgraph.is_up_to_date(
+                output, values=TIKZ_VALUES
+            ):
+                self._depgraph.record(output, values=TIKZ_VALUES)
+                info("TikZ image %s is up to date.", filename)
+                record_event("tikz_cache_hit", tikz_hash=tikz_hash)
+                continue
+            try:
+                with span("tikz", "render", tikz_hash=tikz_hash):
+                    self._render_svg(tikz_hash, tikz_code)
+            except RuntimeError as error:
+                self._handle_error(RuntimeError(f"TikZ image {filename}: {error}"))
+                continue
+            # recorded when done (pending renders are resumed after interruption)
+            if self._depgraph is not None:
+                self._depgraph.record(output, values=TIKZ_VALUES)
+            record_event("tikz_rendered", tikz_hash=tikz_hash)
@@ -4,6 +4,8 @@ Extension that writes a :file:`manifest.json` to the output folder.
 Every course needs a :class:`Manifest <innoconv.manifest.Manifest>`.
 Additionally to the fields from the source manifest it can include a table of
 contents and a glossary.
+
+The file is left untouched if its content didn't change.
 """
 
 import json
@@ -14,23 +16,27 @@ from camel_converter import to_camel
 
 from innoconv.constants import MANIFEST_BASENAME
 from innoconv.ext.abstract import AbstractExtension
+from innoconv.instrumentation import record_event, span
 from innoconv.manifest import Manifest
+from innoconv.utils import write_if_changed
+
+#: Build-wide values the manifest depends on
+MANIFEST_VALUES = ("extensions", "manifest", "sources")
 
 
 class WriteManifest(AbstractExtension):
     """Write a manifest file when conversion is done."""
 
     _helptext = f"Write a {MANIFEST_BASENAME}.json file."
+    _supports_streaming = True
 
     def __init__(self, *args, **kwargs):
         """Initialize variables."""
         super().__init__(*args, **kwargs)
         self._output_dir = None
+        self._depgraph = None
 
-    def _write_manifest(self):
-        if self._output_dir is None:
-            raise ValueError("output directory is None!")
-
+    def _get_manifest_dict(self):
         manifest_dict = {}
         for field in Manifest.required_fields:
             manifest_dict[to_camel(field)] = getattr(self._manifest, field)
@@ -46,15 +52,38 @@ class WriteManifest(AbstractExtension):
                 manifest_dict.update(ext.manifest_fields())
             except AttributeError:
                 pass
+        return manifest_dict
+
+    def _write_manifest(self):
+        if self._output_dir is None:
+            raise ValueError("output directory is None!")
+
+        manifest_dict = self._get_manifest_dict()
         # write file
         filename = f"{MANIFEST_BASENAME}.json"
         filepath = join(self._output_dir, filename)
-        with open(filepath, "w", encoding="utf-8") as out_file:
-            json.dump(manifest_dict, out_file)
-        logging.info("Wrote manifest %s", filepath)
+        with span("io", "write_manifest"):
+            changed, output_bytes = write_if_changed(
+                filepath, lambda out_file: json.dump(manifest_dict, out_file)
+            )
+        if changed:
+            logging.info("Wrote manifest %s", filepath)
+        else:
+            logging.info("Manifest %s is unchanged", filepath)
+        if self._depgraph is not None:
+            self._depgraph.record(filename, values=MANIFEST_VALUES)
+        record_event(
+            "manifest_written" if changed else "manifest_unchanged",
+            output=filepath,
+            bytes=output_bytes,
+        )
 
     # extension events
 
+    def dependency_graph(self, graph):
+        """Remember dependency graph."""
+        self._depgraph = graph
+
     def start(self, output_dir, _):
         """Remember output directory."""
         self._output_dir = output_dir
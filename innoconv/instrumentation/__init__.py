@@ -0,0 +1,235 @@
+"""
+Instrumentation of the conversion process.
+
+Interesting parts of the conversion (runner phases, extension events, external
+tools) are wrapped in *spans* using :func:`span`. Things that happen at a
+point in time (a file was written, a static file was copied) are reported using
+:func:`record_event`. Short calls that happen very often (e.g. element hooks)
+are timed using a :class:`CallTimer` and reported as a single span. Recorders
+that were registered using
+:func:`add_recorder` are notified about spans and events. Without registered
+recorders both come at (almost) no cost.
+
+Recorders inherit from
+:class:`AbstractRecorder <innoconv.instrumentation.abstract.AbstractRecorder>`.
+"""
+
+from contextlib import contextmanager
+from time import perf_counter, process_time
+
+_RECORDERS = []
+
+
+class Span:  # pylint: disable=too-many-instance-attributes
+    """
+    A timed part of the conversion process.
+
+    :param category: Category (e.g. ``"extension"`` or ``"pandoc"``)
+    :type category: str
+    :param name: Name (e.g. ``"copy_static.post_process_file"``)
+    :type name: str
+    :param path: Source file that is processed (if any)
+    :type path: str
+    :param args: Additional information (e.g. the language)
+    :type args: dict
+    """
+
+    __slots__ = (
+        "category",
+        "name",
+        "path",
+        "args",
+        "start",
+        "wall",
+        "cpu",
+        "_cpu_start",
+    )
+
+    def __init__(self, category, name, path=None, args=None):
+        """Initialize Span."""
+        self.category = category
+        self.name = name
+        self.path = path
+        self.args = args or {}
+        self.start = None
+        self.wall = None
+        self.cpu = None
+        self._cpu_start = None
+
+    def begin(self):
+        """Start the clocks."""
+        self.start = perf_counter()
+        self._cpu_start = process_time()
+
+    def end(self):
+        """Stop the clocks and calculate wall and CPU time."""
+        self.wall = perf_counter() - self.start
+        self.cpu = process_time() - self._cpu_start
+
+
+def add_recorder(recorder):
+    """Register a recorder."""
+    _RECORDERS.append(recorder)
+
+
+def remove_recorder(recorder):
+    """Unregister a recorder."""
+    _RECORDERS.remove(recorder)
+
+
+def is_active():
+    """Return if there are registered recorders."""
+    return bool(_RECORDERS)
+
+
+@contextmanager
+def span(category, name, path=None, **args):
+    """
+    Measure a part of the conversion process.
+
+    Used as a context manager, it yields the :class:`Span` (or ``None`` if
+    no recorders are registered).
+
+    :param category: Category (e.g. ``"extension"`` or ``"pandoc"``)
+    :type category: str
+    :param name: Name (e.g. ``"copy_static.post_process_file"``)
+    :type name: str
+    :param path: Source file that is processed (if any)
+    :type path: str
+    :param args: Additional information (e.g. the language)
+    """
+    if not _RECORDERS:
+        yield None
+        return
+    recorders = list(_RECORDERS)
+    current = Span(category, name, path, args)
+    for recorder in recorders:
+        recorder.span_started(current)
+    current.begin()
+    try:
+        yield current
+    finally:
+        current.end()
+        for recorder in reversed(recorders):
+            recorder.span_finished(current)
+
+
+def record_span(category, name, path=None, wall=0.0, cpu=0.0, *, start=None, **args):
+    """
+    Report a span that was measured elsewhere (e.g. summed over many calls).
+
+    Recorders are notified right away. The span starts at ``start`` if given,
+    otherwise it is placed to end now.
+
+    :param category: Category
+    :type category: str
+    :param name: Name
+    :type name: str
+    :param path: Source file that is processed (if any)
+    :type path: str
+    :param wall: Wall time in seconds
+    :type wall: float
+    :param cpu: CPU time in seconds
+    :type cpu: float
+    :param start: Start time (:func:`time.perf_counter`)
+    :type start: float
+    :param args: Additional information
+    """
+    if not _RECORDERS:
+        return
+    recorders = list(_RECORDERS)
+    current = Span(category, name, path, args)
+    for recorder in recorders:
+        recorder.span_started(current)
+    current.start = perf_counter() - wall if start is None else start
+    current.wall = wall
+    current.cpu = cpu
+    for recorder in reversed(recorders):
+        recorder.span_finished(current)
+
+
+class CallTimer:
+    """
+    Sum up wall and CPU time of many short calls.
+
+    Wrapping every call in a :func:`span` would cost more than the calls
+    themselves. Instead the time is summed up and reported as a single span
+    using :meth:`report`. The span starts with the first call, so it doesn't
+    extend past the calls (e.g. beyond the pandoc process while streaming).
+
+    :param category: Category of the reported span
+    :type category: str
+    :param name: Name of the reported span
+    :type name: str
+    """
+
+    __slots__ = ("category", "name", "calls", "start", "wall", "cpu")
+
+    def __init__(self, category, name):
+        """Initialize CallTimer."""
+        self.category = category
+        self.name = name
+        self.calls = 0
+        self.start = None
+        self.wall = 0.0
+        self.cpu = 0.0
+
+    def wrap(self, func):
+        """
+        Return a function that calls ``func`` and adds up its time.
+
+        :param func: Function to time
+        :type func: function
+
+        :rtype: function
+        """
+
+        def timed(*args):
+            start, cpu_start = perf_counter(), process_time()
+            try:
+                return func(*args)
+            finally:
+                if not self.calls:
+                    self.start = start
+                self.wall += perf_counter() - start
+                self.cpu += process_time() - cpu_start
+                self.calls += 1
+
+        return timed
+
+    def report(self, path=None):
+        """
+        Report the summed up time as a span (if there were calls) and reset.
+
+        :param path: Source file that was processed (if any)
+        :type path: str
+        """
+        if self.calls:
+            record_span(
+                self.category,
+                self.name,
+                path,
+                self.wall,
+                self.cpu,
+                start=self.start,
+                calls=self.calls,
+            )
+        self.calls = 0
+        self.start = None
+        self.wall = 0.0
+        self.cpu = 0.0
+
+
+def record_event(name, **data):
+    """
+    Report that something happened (e.g. a file was written).
+
+    Code that needs to do extra work to collect event data should check
+    :func:`is_active` first.
+
+    :param name: Event name (e.g. ``"file_written"``)
+    :type name: str
+    :param data: Event data (JSON-serializable values)
+    """
+    for recorder in list(_RECORDERS):
+        recorder.event_recorded(name, data)
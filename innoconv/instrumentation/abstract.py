@@ -0,0 +1,42 @@
+"""
+Base class for all recorders.
+
+The AbstractRecorder is not instantiated directly but serves as super-class to
+all recorders.
+"""
+
+
+class AbstractRecorder:
+    """
+    Abstract class for recorders.
+
+    Recorders collect data about :class:`spans <innoconv.instrumentation.Span>`
+    and :func:`events <innoconv.instrumentation.record_event>` during the
+    conversion and report it afterwards.
+    """
+
+    def span_started(self, span):
+        """
+        Handle a span that is about to start.
+
+        :param span: Span
+        :type span: innoconv.instrumentation.Span
+        """
+
+    def span_finished(self, span):
+        """
+        Handle a finished span. Wall and CPU time are available.
+
+        :param span: Span
+        :type span: innoconv.instrumentation.Span
+        """
+
+    def event_recorded(self, name, data):
+        """
+        Handle an event.
+
+        :param name: Event name
+        :type name: str
+        :param data: Event data
+        :type data: dict
+        """
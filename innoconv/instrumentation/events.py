@@ -0,0 +1,95 @@
+"""
+Stream build events as newline-delimited JSON (NDJSON).
+
+Every lifecycle event is written as a single JSON object on its own line and
+flushed immediately, so supervisors can show progress and detect stalls
+without parsing log messages. Every object has an ``event`` key and a ``time``
+key (Unix time).
+
+======
+Events
+======
+
+====================== ========================================================
+``phase_started``      Runner phase started (``phase``, ``language``)
+``phase_finished``     Runner phase finished (``phase``, ``language``,
+                       ``duration``)
+``file_started``       Conversion of a content file started (``path``)
+``file_finished``      Content file was converted (``path``, ``duration``,
+                       ``output``, ``bytes``, ``changed``)
+``file_skipped``       Content file was up to date (``path``, ``output``)
+``tikz_cache_hit``     TikZ image is up to date (``tikz_hash``)
+``tikz_rendered``      TikZ image was rendered (``tikz_hash``)
+``static_copied``      Static file was copied (``src``, ``dst``, ``bytes``)
+``static_skipped``     Static file was up to date (``src``, ``dst``, ``bytes``)
+``manifest_written``   Manifest was written (``output``, ``bytes``)
+``manifest_unchanged`` Manifest content didn't change (``output``, ``bytes``)
+``error``              Build failed (``message``) or an error was collected in
+                       keep-going mode (``message``, ``path``)
+``build_finished``     Build finished, also if it failed (``status``:
+                       ``success`` or ``failed``, ``exit_code``)
+====================== ========================================================
+
+=======
+Example
+=======
+
+.. code-block:: none
+
+  {"event": "file_started", "time": 1700000000.1, "path": "en/content.md"}
+  {"event": "file_finished", "time": 1700000000.4, "path": "en/content.md", ...}
+"""
+
+import json
+import time
+
+from innoconv.instrumentation.abstract import AbstractRecorder
+
+
+class EventStream(AbstractRecorder):
+    """
+    Write build events as NDJSON.
+
+    :param out_file: Writable text stream
+    """
+
+    def __init__(self, out_file):
+        """Initialize EventStream."""
+        self._out_file = out_file
+        self._written = {}
+
+    def _emit(self, event, **data):
+        line = json.dumps({"event": event, "time": time.time(), **data})
+        self._out_file.write(f"{line}\n")
+        self._out_file.flush()
+
+    def span_started(self, span):
+        """Emit start of phases and files."""
+        if span.category == "runner" and span.name != "run":
+            self._emit("phase_started", phase=span.name, **span.args)
+        elif span.category == "file":
+            self._emit("file_started", path=span.path)
+
+    def span_finished(self, span):
+        """Emit end of phases and files."""
+        if span.category == "runner" and span.name != "run":
+            self._emit(
+                "phase_finished", phase=span.name, duration=span.wall, **span.args
+            )
+        elif span.category == "file":
+            written = self._written.pop(span.path, {})
+            self._emit(
+                "file_finished",
+                path=span.path,
+                duration=span.wall,
+                output=written.get("output"),
+                bytes=written.get("bytes"),
+                changed=written.get("changed"),
+            )
+
+    def event_recorded(self, name, data):
+        """Emit events (output of files is reported on ``file_finished``)."""
+        if name in ("file_written", "file_unchanged"):
+            self._written[data["path"]] = {**data, "changed": name == "file_written"}
+        else:
+            self._emit(name, **data)
@@ -0,0 +1,161 @@
+"""
+Report memory usage of runner phases and extensions using :mod:`tracemalloc`.
+
+Tracing starts when the recorder is created and stops when
+:meth:`MemoryReport.stop` is called.
+
+* **Runner phases**: A snapshot is taken when a phase starts and compared to
+  the state at its end. The phase's net allocation, its peak and the sites that
+  grew the most are reported.
+* **Extension events**: Net allocation (memory allocated during the event that
+  was not freed afterwards) and peak are measured for every call and summed up
+  per extension. This shows how much memory is retained by extension state.
+* **Finish**: The top allocation sites are taken from a snapshot when the
+  ``finish`` phase starts, i.e. after all files were converted.
+
+Tracing slows down the conversion considerably. Peaks are reported per phase
+and event with Python 3.9 or newer, otherwise the overall peak is shown.
+"""
+
+from os.path import dirname, join
+import tracemalloc
+
+from innoconv.instrumentation.abstract import AbstractRecorder
+
+#: Number of frames stored per allocation
+TRACEMALLOC_FRAMES = 1
+
+#: Allocations in these files are ignored (including all recorders)
+IGNORED_FILES = (
+    join(dirname(__file__), "*"),
+    tracemalloc.__file__,
+    "<frozen importlib._bootstrap>",
+    "<unknown>",
+)
+
+
+def _format_size(size, sign=False):
+    return f"{size / 2**20:{'+' if sign else ''}9.1f} MiB"
+
+
+def _take_snapshot():
+    snapshot = tracemalloc.take_snapshot()
+    return snapshot.filter_traces(
+        [tracemalloc.Filter(False, filename) for filename in IGNORED_FILES]
+    )
+
+
+class MemoryReport(AbstractRecorder):
+    """
+    Collect memory usage of runner phases and extension events.
+
+    :param top_n: Number of allocation sites to keep per phase
+    :type top_n: int
+    """
+
+    def __init__(self, top_n):
+        """Initialize MemoryReport and start tracing."""
+        self._top_n = top_n
+        self._tracing = not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self._open = {}
+        self._phases = []
+        self._extensions = {}
+        self._finish_stats = []
+
+    def _reset_peak(self):
+        """Start measuring a new peak (keeping the peak of enclosing spans)."""
+        if hasattr(tracemalloc, "reset_peak"):
+            peak = tracemalloc.get_traced_memory()[1]
+            for measurement in self._open.values():
+                measurement[1] = max(measurement[1], peak)
+            tracemalloc.reset_peak()
+
+    def _start(self, span, snapshot=None):
+        self._reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        self._open[id(span)] = [current, current, snapshot]
+
+    def _stop(self, span):
+        start, peak, snapshot = self._open.pop(id(span))
+        current, current_peak = tracemalloc.get_traced_memory()
+        return current - start, max(peak, current_peak), snapshot
+
+    def span_started(self, span):
+        """Start measuring runner phases and extension events."""
+        if not tracemalloc.is_tracing():
+            return
+        if span.category == "runner" and span.name != "run":
+            snapshot = _take_snapshot()
+            if span.name == "finish":
+                self._finish_stats = snapshot.statistics("lineno")[: self._top_n]
+            self._start(span, snapshot)
+        elif span.category == "extension":
+            self._start(span)
+
+    def span_finished(self, span):
+        """Record memory usage of runner phases and extension events."""
+        if id(span) in self._open:
+            net, peak, snapshot = self._stop(span)
+            if span.category == "runner":
+                label = span.name
+                if "language" in span.args:
+                    label = f"{label} [{span.args['language']}]"
+                stats = _take_snapshot().compare_to(snapshot, "lineno")
+                self._phases.append((label, net, peak, stats[: self._top_n]))
+            else:
+                ext_name = span.name.split(".", 1)[0]
+                calls, total, max_peak = self._extensions.get(ext_name, (0, 0, 0))
+                self._extensions[ext_name] = (
+                    calls + 1,
+                    total + net,
+                    max(max_peak, peak),
+                )
+
+    def stop(self):
+        """Stop tracing (if it was started by this recorder)."""
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def per_extension(self):
+        """
+        Return memory retained per extension, sorted by net allocation.
+
+        :rtype: list of (str, int, int, int)
+        :returns: (extension, calls, net allocation in bytes, peak in bytes)
+        """
+        usage = [(name, *values) for name, values in self._extensions.items()]
+        return sorted(usage, key=lambda item: item[2], reverse=True)
+
+    def report(self):
+        """
+        Create a report of phases, extensions and top allocation sites.
+
+        :rtype: str
+        """
+        lines = ["Memory by runner phase (net / peak):"]
+        for label, net, peak, _ in self._phases:
+            lines.append(f"  {_format_size(net, True)} {_format_size(peak)}  {label}")
+        lines.append("")
+        lines.append("Memory retained by extensions (calls, net / peak):")
+        for name, calls, net, peak in self.per_extension():
+            lines.append(
+                f"  {calls:5d} {_format_size(net, True)} {_format_size(peak)}  {name}"
+            )
+        lines.append("")
+        lines.append("Top allocation sites at finish (size, blocks):")
+        for stat in self._finish_stats:
+            lines.append(
+                f"  {_format_size(stat.size)} {stat.count:9d}  {stat.traceback}"
+            )
+        for label, _, _, stats in self._phases:
+            lines.append("")
+            lines.append(f"Top growing allocation sites in {label} (size, blocks):")
+            for stat in stats:
+                lines.append(
+                    f"  {_format_size(stat.size_diff, True)} "
+                    f"{stat.count_diff:+9d}  {stat.traceback}"
+                )
+        return "\n".join(lines)
@@ -0,0 +1,148 @@
+"""
+Write build metrics in Prometheus text exposition format.
+
+The output file is meant for the textfile collector of the
+`node exporter <https://github.com/prometheus/node_exporter>`_. It is written
+atomically, so a scrape never sees a partially written file.
+
+=======
+Metrics
+=======
+
+.. code-block:: none
+
+  innoconv_build_duration_seconds          Duration of the whole build
+  innoconv_phase_duration_seconds{phase}   Duration per runner phase
+  innoconv_files_converted_total           Converted content files
+  innoconv_files_skipped_total             Up-to-date content files
+  innoconv_tool_calls_total{tool}          External tool invocations (pandoc…)
+  innoconv_tikz_cache_hits_total           TikZ images that were up to date
+  innoconv_tikz_cache_misses_total         Rendered TikZ images
+  innoconv_static_bytes_copied_total       Bytes of copied static files
+  innoconv_static_bytes_skipped_total      Bytes of up-to-date static files
+  innoconv_output_bytes_total              Bytes of written JSON output
+  innoconv_outputs_written_total           Written JSON output files
+  innoconv_outputs_unchanged_total         JSON output files left untouched
+  innoconv_exit_code                       Exit code of the build
+  innoconv_last_run_timestamp_seconds      End of the build (Unix time)
+"""
+
+import os
+import time
+
+from innoconv.instrumentation.abstract import AbstractRecorder
+
+#: Prefix for all metric names
+METRIC_PREFIX = "innoconv_"
+
+#: Metric name, type and help text
+METRICS = (
+    ("build_duration_seconds", "gauge", "Duration of the whole build."),
+    ("phase_duration_seconds", "gauge", "Duration of runner phases."),
+    ("files_converted_total", "counter", "Number of converted content files."),
+    ("files_skipped_total", "counter", "Number of up-to-date content files."),
+    ("tool_calls_total", "counter", "Number of external tool invocations."),
+    ("tikz_cache_hits_total", "counter", "TikZ images that were up to date."),
+    ("tikz_cache_misses_total", "counter", "TikZ images that were rendered."),
+    ("static_bytes_copied_total", "counter", "Bytes of copied static files."),
+    ("static_bytes_skipped_total", "counter", "Bytes of up-to-date static files."),
+    ("output_bytes_total", "counter", "Bytes of written JSON output."),
+    ("outputs_written_total", "counter", "Number of written JSON output files."),
+    ("outputs_unchanged_total", "counter", "JSON output files that didn't change."),
+    ("exit_code", "gauge", "Exit code of the build."),
+    ("last_run_timestamp_seconds", "gauge", "End of the build (Unix time)."),
+)
+
+#: Events that are counted (event name mapped to metric name and data key)
+COUNTED_EVENTS = {
+    "file_written": (
+        ("files_converted_total", None),
+        ("output_bytes_total", "bytes"),
+        ("outputs_written_total", None),
+    ),
+    "file_unchanged": (
+        ("files_converted_total", None),
+        ("outputs_unchanged_total", None),
+    ),
+    "file_skipped": (("files_skipped_total", None), ("outputs_unchanged_total", None)),
+    "manifest_written": (
+        ("output_bytes_total", "bytes"),
+        ("outputs_written_total", None),
+    ),
+    "manifest_unchanged": (("outputs_unchanged_total", None),),
+    "tikz_cache_hit": (("tikz_cache_hits_total", None),),
+    "tikz_rendered": (("tikz_cache_misses_total", None),),
+    "static_copied": (("static_bytes_copied_total", "bytes"),),
+    "static_skipped": (("static_bytes_skipped_total", "bytes"),),
+}
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class Metrics(AbstractRecorder):
+    """Collect build metrics."""
+
+    def __init__(self):
+        """Initialize Metrics."""
+        self._values = {name: {(): 0} for name, _, _ in METRICS}
+        self._values["phase_duration_seconds"] = {}
+        self._values["tool_calls_total"] = {}
+        self._values["exit_code"] = {}
+        self._values["last_run_timestamp_seconds"] = {}
+
+    def _add(self, name, value, labels=()):
+        values = self._values[name]
+        values[labels] = values.get(labels, 0) + value
+
+    def span_finished(self, span):
+        """Record phase durations and tool invocations."""
+        if span.category == "runner":
+            if span.name == "run":
+                self._add("build_duration_seconds", span.wall)
+            else:
+                self._add("phase_duration_seconds", span.wall, (("phase", span.name),))
+        elif span.category == "subprocess":
+            self._add("tool_calls_total", 1, (("tool", span.name),))
+
+    def event_recorded(self, name, data):
+        """Count files, bytes, TikZ images and record the exit code."""
+        for metric, key in COUNTED_EVENTS.get(name, ()):
+            self._add(metric, 1 if key is None else data[key])
+        if name == "build_finished":
+            self._values["exit_code"] = {(): data["exit_code"]}
+            self._values["last_run_timestamp_seconds"] = {(): time.time()}
+
+    def to_text(self):
+        """
+        Return metrics in Prometheus text exposition format.
+
+        :rtype: str
+        """
+        lines = []
+        for name, metric_type, helptext in METRICS:
+            full_name = f"{METRIC_PREFIX}{name}"
+            lines.append(f"# HELP {full_name} {helptext}")
+            lines.append(f"# TYPE {full_name} {metric_type}")
+            for labels, value in sorted(self._values[name].items()):
+                lines.append(f"{full_name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, filepath):
+        """
+        Write metrics file atomically.
+
+        :param filepath: Output file
+        :type filepath: str
+        """
+        tmp_filepath = f"{filepath}.{os.getpid()}.tmp"
+        with open(tmp_filepath, "w", encoding="utf-8") as out_file:
+            out_file.write(self.to_text())
+        os.replace(tmp_filepath, filepath)
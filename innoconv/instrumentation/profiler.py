@@ -0,0 +1,160 @@
+"""
+Profile the conversion using :mod:`cProfile`.
+
+By default the whole run is profiled. Profiling can be limited to a phase,
+i.e. a runner phase (like ``convert``) or an extension event (like
+``post_process_file``). This way the Python hot paths of extensions can be
+looked at separately from waiting for pandoc.
+
+Results are written in two formats:
+
+* :mod:`pstats` data (e.g. for ``python -m pstats`` or
+  `SnakeViz <https://jiffyclub.github.io/snakeviz/>`_)
+* Collapsed stacks (one ``frame;frame;frame microseconds`` line per stack)
+  for flame graph tools like
+  `flamegraph.pl <https://github.com/brendangregg/FlameGraph>`_ or
+  `speedscope <https://www.speedscope.app/>`_
+
+cProfile records caller/callee pairs only, not complete stacks. Collapsed
+stacks are reconstructed from these pairs by distributing the time of a
+function proportionally to its callers, so they are an approximation.
+"""
+
+import cProfile
+from os.path import basename
+
+from innoconv.instrumentation.abstract import AbstractRecorder
+
+#: Suffix of the collapsed stacks file (appended to the pstats filename)
+COLLAPSED_SUFFIX = ".collapsed"
+
+#: Stacks deeper than this are cut off in collapsed stacks
+MAX_STACK_DEPTH = 128
+
+#: Stacks with less self time (in seconds) are omitted in collapsed stacks
+MIN_STACK_TIME = 1e-6
+
+
+def _get_label(func):
+    filename, line, name = func
+    if filename == "~":  # built-in function
+        return name
+    return f"{name} ({basename(filename)}:{line})"
+
+
+def _get_call_graph(stats):
+    """
+    Return callees per function and stack roots.
+
+    Roots are functions that were (at least partly) called from outside the
+    profiled code, along with the share of their time spent in those calls.
+    """
+    callees = {func: {} for func in stats}
+    roots = []
+    for func, (_, _, _, total_time, callers) in stats.items():
+        called_time = 0
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[func] = edge
+            if caller in stats:
+                called_time += edge[3]
+        if not callers:
+            roots.append((func, 1.0))
+        elif total_time and total_time - called_time >= MIN_STACK_TIME:
+            roots.append((func, (total_time - called_time) / total_time))
+    return callees, roots
+
+
+def _walk_stacks(stats, callees, stack, fraction, lines):
+    """Add collapsed stacks of a function and (recursively) its callees."""
+    func = stack[-1]
+    self_time = stats[func][2] * fraction
+    if self_time >= MIN_STACK_TIME:
+        frames = ";".join(_get_label(f) for f in stack)
+        lines.append(f"{frames} {round(self_time * 1e6)}")
+    if len(stack) >= MAX_STACK_DEPTH:
+        return
+    for callee, edge in callees.get(func, {}).items():
+        total_time = stats[callee][3]
+        if callee in stack or not total_time:
+            continue
+        # share of the callee's time that was caused by this call path
+        share = fraction * edge[3] / total_time
+        if total_time * share >= MIN_STACK_TIME:
+            _walk_stacks(stats, callees, stack + [callee], share, lines)
+
+
+class Profiler(AbstractRecorder):
+    """
+    Profile the whole run or a single phase.
+
+    :param phase: Runner phase or extension event to profile (``None`` profiles
+                  the whole run)
+    :type phase: str
+    """
+
+    def __init__(self, phase=None):
+        """Initialize Profiler."""
+        self._phase = phase
+        self._profile = cProfile.Profile()
+        self._depth = 0
+
+    def _matches(self, span):
+        if self._phase is None:
+            return span.category == "runner" and span.name == "run"
+        if span.category == "runner":
+            return span.name == self._phase
+        if span.category == "extension":
+            return span.name.rsplit(".", 1)[-1] == self._phase
+        return False
+
+    def span_started(self, span):
+        """Start profiling when entering the phase."""
+        if self._matches(span):
+            if not self._depth:
+                self._profile.enable()
+            self._depth += 1
+
+    def span_finished(self, span):
+        """Stop profiling when leaving the phase."""
+        if self._matches(span):
+            self._depth -= 1
+            if not self._depth:
+                self._profile.disable()
+
+    def get_stats(self):
+        """
+        Return raw profiling data (see :meth:`pstats.Stats.stats`).
+
+        :rtype: dict
+        """
+        self._profile.create_stats()
+        return self._profile.stats  # pylint: disable=no-member
+
+    def collapsed_stacks(self):
+        """
+        Return collapsed stacks.
+
+        :rtype: list of str
+        :returns: Lines of the form ``frame;frame;frame microseconds``
+        """
+        stats = self.get_stats()
+        callees, roots = _get_call_graph(stats)
+        lines = []
+        for root, fraction in roots:
+            _walk_stacks(stats, callees, [root], fraction, lines)
+        return lines
+
+    def write(self, filepath):
+        """
+        Write pstats data and collapsed stacks.
+
+        Collapsed stacks are written to a file with the suffix
+        :data:`COLLAPSED_SUFFIX`.
+
+        :param filepath: pstats output file
+        :type filepath: str
+        """
+        self._profile.dump_stats(filepath)
+        with open(f"{filepath}{COLLAPSED_SUFFIX}", "w", encoding="utf-8") as out_file:
+            for line in self.collapsed_stacks():
+                out_file.write(f"{line}\n")
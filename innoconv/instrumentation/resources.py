@@ -0,0 +1,213 @@
+"""
+Record resource usage of external tools (pandoc, pdflatex, pdf2svg).
+
+Most of the build time and memory goes to child processes which are invisible
+to Python-level profiling. For every subprocess span wall time, user and
+system CPU time and maximum resident set size are recorded. Usage is
+aggregated per tool and per source file.
+
+Tools are started using :class:`MeasuredPopen`, which reaps the child using
+:func:`os.wait4`. So CPU times and maximum RSS are those of exactly this
+invocation. Note that Linux accounts the memory of the forked innoconv process
+to the child, so the maximum RSS of a tool is at least the RSS innoconv had
+when starting it.
+
+For other subprocess spans, CPU times are taken from :func:`resource.getrusage`
+for terminated children before and after a tool ran (assuming that tools run
+one at a time). The operating system only reports the largest child for
+``ru_maxrss`` then, so the recorded maximum RSS is the peak of all tools so far.
+
+Only available on Unix-like systems.
+"""
+
+import os
+from subprocess import Popen
+import sys
+
+from innoconv.instrumentation.abstract import AbstractRecorder
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+#: Label for tools that ran outside of a file conversion
+NO_FILE = "(no file)"
+
+
+def _to_bytes(max_rss):
+    # Linux reports kilobytes, macOS bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def _get_max_rss():
+    """Return maximum RSS of all terminated children in bytes."""
+    return _to_bytes(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+class MeasuredPopen(Popen):
+    """
+    :class:`subprocess.Popen` that measures resource usage of the child.
+
+    The child is reaped using :func:`os.wait4`. User and system CPU time and
+    maximum RSS are stored as ``usage`` in the arguments of the span.
+
+    :param span: Subprocess span (or ``None`` if instrumentation is inactive)
+    :type span: innoconv.instrumentation.Span
+    """
+
+    def __init__(self, *args, span=None, **kwargs):
+        """Initialize MeasuredPopen."""
+        self._span = span
+        super().__init__(*args, **kwargs)
+
+    def _try_wait(self, wait_flags):
+        """Wait for the child like Popen does (POSIX), but using os.wait4."""
+        if self._span is None or not hasattr(os, "wait4"):
+            return super()._try_wait(wait_flags)  # pylint: disable=no-member
+        try:
+            pid, status, usage = os.wait4(self.pid, wait_flags)
+        except ChildProcessError:
+            return self.pid, 0
+        if pid == self.pid:
+            self._span.args["usage"] = {
+                "user": usage.ru_utime,
+                "system": usage.ru_stime,
+                "max_rss": _to_bytes(usage.ru_maxrss),
+            }
+        return pid, status
+
+
+class Usage:
+    """
+    Accumulated resource usage.
+
+    :param calls: Number of invocations
+    :param wall: Wall time in seconds
+    :param user: User CPU time in seconds
+    :param system: System CPU time in seconds
+    :param max_rss: Maximum resident set size in bytes
+    """
+
+    __slots__ = ("calls", "wall", "user", "system", "max_rss")
+
+    def __init__(self, calls=0, wall=0.0, user=0.0, system=0.0, max_rss=0):
+        """Initialize Usage."""
+        self.calls = calls
+        self.wall = wall
+        self.user = user
+        self.system = system
+        self.max_rss = max_rss
+
+    def add(self, other):
+        """Add usage of another invocation."""
+        self.calls += other.calls
+        self.wall += other.wall
+        self.user += other.user
+        self.system += other.system
+        self.max_rss = max(self.max_rss, other.max_rss)
+
+    def to_json(self):
+        """Convert to JSON-serializable dict."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _format_usage(label, usage):
+    return (
+        f"  {usage.calls:5d} {usage.wall:8.3f}s {usage.user:8.3f}s "
+        f"{usage.system:8.3f}s {usage.max_rss / 2**20:8.1f} MiB  {label}"
+    )
+
+
+class ResourceUsage(AbstractRecorder):
+    """
+    Collect resource usage of external tools.
+
+    :raises RuntimeError: if resource usage is not available on this platform
+    """
+
+    def __init__(self):
+        """Initialize ResourceUsage."""
+        if resource is None:
+            raise RuntimeError("Resource usage is not available on this platform.")
+        self._current_file = None
+        self._started = {}
+        self._records = []
+
+    def span_started(self, span):
+        """Remember CPU times before a tool runs."""
+        if span.category == "file":
+            self._current_file = span.path
+        elif span.category == "subprocess":
+            usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            self._started[id(span)] = (usage.ru_utime, usage.ru_stime)
+
+    def span_finished(self, span):
+        """Record resource usage of a tool."""
+        if span.category == "file":
+            self._current_file = None
+        elif span.category == "subprocess":
+            user_start, system_start = self._started.pop(id(span))
+            try:
+                # measured by MeasuredPopen
+                record = Usage(calls=1, wall=span.wall, **span.args["usage"])
+            except KeyError:
+                usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+                record = Usage(
+                    calls=1,
+                    wall=span.wall,
+                    user=usage.ru_utime - user_start,
+                    system=usage.ru_stime - system_start,
+                    max_rss=_get_max_rss(),
+                )
+            self._records.append((span.name, self._current_file or NO_FILE, record))
+
+    def _aggregate(self, key):
+        totals = {}
+        for record in self._records:
+            totals.setdefault(record[key], Usage()).add(record[2])
+        return sorted(totals.items(), key=lambda item: item[1].wall, reverse=True)
+
+    def per_tool(self):
+        """
+        Return usage per tool, sorted by wall time.
+
+        :rtype: list of (str, Usage)
+        """
+        return self._aggregate(0)
+
+    def per_file(self):
+        """
+        Return usage per source file, sorted by wall time.
+
+        :rtype: list of (str, Usage)
+        """
+        return self._aggregate(1)
+
+    def report(self, top_n):
+        """
+        Create a summary table per tool and of the most expensive files.
+
+        :param top_n: Number of files
+        :type top_n: int
+
+        :rtype: str
+        """
+        header = "(calls, wall / user / system, max RSS)"
+        lines = [f"External tools {header}:"]
+        lines += [_format_usage(tool, usage) for tool, usage in self.per_tool()]
+        lines.append("")
+        lines.append(f"Most expensive files {header}:")
+        lines += [_format_usage(path, usage) for path, usage in self.per_file()[:top_n]]
+        return "\n".join(lines)
+
+    def to_json(self):
+        """
+        Return usage of every invocation.
+
+        :rtype: list of dict
+        """
+        return [
+            {"tool": tool, "path": path, **usage.to_json()}
+            for tool, path, usage in self._records
+        ]
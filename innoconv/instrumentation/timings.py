@@ -0,0 +1,143 @@
+"""
+Record wall and CPU time of files, extension events, pandoc and external tools.
+
+Timings are collected for every extension event (per extension, event and
+file), every pandoc run and every external tool. Element hooks that run while
+pandoc output is decoded are summed up per extension and file
+(``extension.element_hooks``). A summary of the slowest files and extension
+events and of the time spent in pandoc and tools can be printed using
+:meth:`Timings.report`, all records are available as JSON using
+:meth:`Timings.to_json`.
+
+The ``pandoc + decoding`` row covers running pandoc and decoding its output
+(including element hooks). In streaming mode processing and writing blocks is
+included as well. CPU time is that of innoconv (not of the tools).
+
+=======
+Example
+=======
+
+.. code-block:: none
+
+  Slowest files (wall / CPU):
+      2.104s    1.882s  en/01-intro/content.md
+      0.931s    0.702s  en/02-basics/content.md
+
+  Slowest extension events (calls, wall / CPU):
+     48    1.203s    1.201s  tikz2svg.post_process_file
+     48    0.412s    0.410s  copy_static.post_process_file
+
+  Pandoc and external tools (calls, wall / CPU):
+     48    3.310s    0.512s  pandoc + decoding
+     48    2.790s    0.002s  pandoc
+      6    1.871s    0.001s  pdflatex
+"""
+
+from innoconv.instrumentation.abstract import AbstractRecorder
+
+#: Span categories that are recorded
+RECORDED_CATEGORIES = ("extension", "file", "pandoc", "subprocess")
+
+
+class Timings(AbstractRecorder):
+    """Collect timings of files, extension events, pandoc runs and tools."""
+
+    def __init__(self):
+        """Initialize Timings."""
+        self._records = []
+
+    def span_finished(self, span):
+        """Record timing of a span."""
+        if span.category in RECORDED_CATEGORIES:
+            # spans of element hooks stand for many calls
+            calls = span.args.get("calls", 1)
+            self._records.append(
+                (span.category, span.name, span.path, span.wall, span.cpu, calls)
+            )
+
+    def _aggregate(self, category, key):
+        totals = {}
+        for record in self._records:
+            if record[0] != category:
+                continue
+            calls, wall, cpu = totals.get(record[key], (0, 0.0, 0.0))
+            totals[record[key]] = (
+                calls + record[5],
+                wall + record[3],
+                cpu + record[4],
+            )
+        return sorted(totals.items(), key=lambda item: item[1][1], reverse=True)
+
+    def slowest_files(self, top_n):
+        """
+        Return the slowest files.
+
+        :param top_n: Number of files
+        :type top_n: int
+
+        :rtype: list of (str, float, float)
+        :returns: (path, wall time, CPU time)
+        """
+        totals = self._aggregate("file", 2)[:top_n]
+        return [(path, wall, cpu) for path, (_, wall, cpu) in totals]
+
+    def slowest_events(self, top_n):
+        """
+        Return the slowest extension events (summed over all files).
+
+        :param top_n: Number of events
+        :type top_n: int
+
+        :rtype: list of (str, int, float, float)
+        :returns: (``extension.event``, calls, wall time, CPU time)
+        """
+        totals = self._aggregate("extension", 1)[:top_n]
+        return [(name, calls, wall, cpu) for name, (calls, wall, cpu) in totals]
+
+    def tool_times(self):
+        """
+        Return time spent in pandoc and external tools.
+
+        :rtype: list of (str, int, float, float)
+        :returns: (name, calls, wall time, CPU time of innoconv), running pandoc
+                  and decoding its output is reported as ``pandoc + decoding``
+        """
+        totals = [
+            ("pandoc + decoding", *values) for _, values in self._aggregate("pandoc", 0)
+        ]
+        totals += [
+            (name, calls, wall, cpu)
+            for name, (calls, wall, cpu) in self._aggregate("subprocess", 1)
+        ]
+        return totals
+
+    def report(self, top_n):
+        """
+        Create summary tables of the slowest files, extension events and tools.
+
+        :param top_n: Number of rows per table
+        :type top_n: int
+
+        :rtype: str
+        """
+        lines = ["Slowest files (wall / CPU):"]
+        for path, wall, cpu in self.slowest_files(top_n):
+            lines.append(f"  {wall:8.3f}s {cpu:8.3f}s  {path}")
+        lines.append("")
+        lines.append("Slowest extension events (calls, wall / CPU):")
+        for name, calls, wall, cpu in self.slowest_events(top_n):
+            lines.append(f"  {calls:5d} {wall:8.3f}s {cpu:8.3f}s  {name}")
+        lines.append("")
+        lines.append("Pandoc and external tools (calls, wall / CPU):")
+        for name, calls, wall, cpu in self.tool_times():
+            lines.append(f"  {calls:5d} {wall:8.3f}s {cpu:8.3f}s  {name}")
+        return "\n".join(lines)
+
+    def to_json(self):
+        """
+        Return all records.
+
+        :rtype: list of dict
+        """
+        keys = ("category", "name", "path", "wall", "cpu", "calls")
+        return [dict(zip(keys, record)) for record in self._records]
@@ -0,0 +1,95 @@
+"""
+Record a timeline of the conversion in Chrome trace event format.
+
+Every span (runner phases, files, extension events, external tools, file
+copies) becomes a complete event (``"ph": "X"``) on the track of the thread
+that ran it. The resulting JSON file can be opened in
+`Perfetto <https://ui.perfetto.dev/>`_ or ``chrome://tracing``.
+
+See the `Trace Event Format
+<https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU>`_
+specification for details.
+"""
+
+import json
+import os
+import threading
+from time import perf_counter
+
+from innoconv.instrumentation.abstract import AbstractRecorder
+
+
+class Trace(AbstractRecorder):
+    """Collect spans as Chrome trace events."""
+
+    def __init__(self):
+        """Initialize Trace."""
+        self._origin = perf_counter()
+        self._pid = os.getpid()
+        self._events = []
+        self._threads = {}
+
+    def _get_tid(self):
+        """Map threads to small track numbers."""
+        thread = threading.current_thread()
+        try:
+            return self._threads[thread.ident][0]
+        except KeyError:
+            tid = len(self._threads) + 1
+            self._threads[thread.ident] = (tid, thread.name)
+            return tid
+
+    def span_finished(self, span):
+        """Record span as complete event."""
+        args = dict(span.args)
+        if span.path is not None:
+            args["path"] = span.path
+        args["cpu_ms"] = round(span.cpu * 1e3, 3)
+        self._events.append(
+            {
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round((span.start - self._origin) * 1e6, 3),
+                "dur": round(span.wall * 1e6, 3),
+                "pid": self._pid,
+                "tid": self._get_tid(),
+                "args": args,
+            }
+        )
+
+    def to_json(self):
+        """
+        Return trace in JSON object format.
+
+        :rtype: dict
+        """
+        metadata = [
+            {
+                "name": "process_name",
+                "ph": "M",
+                "pid": self._pid,
+                "args": {"name": "innoconv"},
+            }
+        ]
+        for tid, name in self._threads.values():
+            metadata.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": self._pid,
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+            )
+        return {"traceEvents": metadata + self._events, "displayTimeUnit": "ms"}
+
+    def write(self, filepath):
+        """
+        Write trace to a JSON file.
+
+        :param filepath: Output file
+        :type filepath: str
+        """
+        with open(filepath, "w", encoding="utf-8") as out_file:
+            json.dump(self.to_json(), out_file)
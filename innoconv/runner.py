@@ -5,15 +5,47 @@ It traverses the source directory recursively and finds all content files.
 These are converted one-by-one to JSON. Under the hood is uses
 `Pandoc <https://pandoc.org/>`_.
 
+Before any file is converted, the directory structure of all languages, pages
+and footer fragments is checked (see :meth:`InnoconvRunner.check_structure`).
+All problems are reported at once.
+
 It receives a list of extensions that are instantiated and notified upon
 certain events. The events are documented in
 :class:`AbstractExtension <innoconv.ext.abstract.AbstractExtension>`.
+
+If a :class:`DependencyGraph <innoconv.depgraph.DependencyGraph>` is passed,
+the build is planned first and skipped altogether if all outputs are up to
+date. Otherwise only content files that changed are converted. For all other
+files the cached contributions of extensions are replayed (see
+:meth:`AbstractExtension.get_contribution
+<innoconv.ext.abstract.AbstractExtension.get_contribution>`). Outputs of the
+previous build that weren't built again are removed.
+
+While building, a checkpoint journal is written (see
+:meth:`DependencyGraph.start_journal
+<innoconv.depgraph.DependencyGraph.start_journal>`). An interrupted build can be
+resumed by loading the dependency graph with ``resume=True``. Completed files
+are replayed like up-to-date files, so extensions end up in the same state.
+
+Partial builds convert only a subset of sections or languages. All other
+files replay the contributions cached by the previous build, so the manifest
+contains the whole course. The stored dependency graph is kept as it is.
+
+In keep-going mode, errors of single files, TikZ images and static files
+are collected and the build continues. Files with errors are neither written
+nor recorded in the dependency graph. Extensions are not notified about
+files that failed to convert (apart from ``pre_process_file``). All errors
+are reported when the build finished.
+
+Output files whose content didn't change are left untouched (see
+:func:`innoconv.utils.write_if_changed`), so they keep their modification
+time.
 """
 
 import json
 import logging
 from os import makedirs, walk
-from os.path import abspath, dirname, exists, isdir, join, relpath
+from os.path import abspath, dirname, exists, isabs, isdir, join, relpath, sep
 import pathlib
 
 from innoconv.constants import (
@@ -22,10 +54,15 @@ from innoconv.constants import (
     PAGES_FOLDER,
 )
 from innoconv.ext import EXTENSIONS
-from innoconv.utils import to_ast
+from innoconv.instrumentation import CallTimer, is_active, record_event, span
+from innoconv.traverse_ast import ElementIndex
+from innoconv.utils import stream_ast, to_ast, write_if_changed
+
+#: Build-wide values converted content files depend on
+CONTENT_VALUES = ("extensions",)
 
 
-class InnoconvRunner:
+class InnoconvRunner:  # pylint: disable=too-many-instance-attributes
     """
     Convert content files in a directory tree.
 
@@ -40,35 +77,253 @@ class InnoconvRunner:
 
     :param extensions: List of extension names to use.
     :type extensions: list[str]
+
+    :param stream: Read pandoc output incrementally and write top-level blocks
+                   one-by-one (see :func:`innoconv.utils.stream_ast`).
+    :type stream: bool
+
+    :param depgraph: Dependency graph for incremental builds.
+    :type depgraph: innoconv.depgraph.DependencyGraph
+
+    :param languages: Convert these languages only (partial build).
+    :type languages: list[str]
+
+    :param only: Convert this section and its subsections only (partial build),
+                 e.g. ``chapter-1/section-2``.
+    :type only: str
+
+    :param keep_going: Collect errors and continue with the remaining files.
+    :type keep_going: bool
     """
 
-    def __init__(self, source_dir, output_dir, manifest, extensions):
+    def __init__(  # pylint: disable=too-many-arguments
+        self,
+        source_dir,
+        output_dir,
+        manifest,
+        extensions,
+        *,
+        stream=False,
+        depgraph=None,
+        languages=None,
+        only=None,
+        keep_going=False,
+    ):
         """Initialize InnoconvRunner."""
         self._source_dir = source_dir
         self._output_dir = output_dir
         self._manifest = manifest
+        self._stream = stream
+        self._depgraph = depgraph
+        self._languages = languages
+        self._only = only.strip("/") if only else None
+        self._keep_going = keep_going
+        self._errors = []
+        self._check_selection()
         self._extensions = []
+        self._extension_names = []
+        self._current_file = None
+        self._element_hooks = {}
+        self._timed_element_hooks = {}
+        self._hook_timers = []
         self._load_extensions(extensions)
-        self._sections = []
+        if keep_going:
+            self._notify_extensions("error_handler", self._handle_error)
+        self._output_counts = {"written": 0, "unchanged": 0}
+
+    @property
+    def _is_partial(self):
+        return self._languages is not None or self._only is not None
+
+    def _check_selection(self):
+        if not self._is_partial:
+            return
+        if self._depgraph is None:
+            raise RuntimeError("Partial builds require a dependency graph!")
+        for language in self._languages or ():
+            if language not in self._manifest.languages:
+                raise RuntimeError(f"Language {language} not found in manifest!")
+        if self._only is not None:
+            for language in self._languages or self._manifest.languages:
+                if not isdir(join(self._source_dir, language, self._only)):
+                    raise RuntimeError(f"Section {language}/{self._only} not found!")
 
     def run(self):
         """Start the conversion by iterating over language folders."""
-        self._notify_extensions("start", self._output_dir, self._source_dir)
+        with span("runner", "run"):
+            self._preflight()
+            if self._depgraph is not None and not self._needs_build():
+                logging.info("Output is up to date.")
+                return
+            if self._depgraph is not None and not self._is_partial:
+                self._depgraph.start_journal()
+
+            self._notify_phase("start", self._output_dir, self._source_dir)
+
+            for language in self._manifest.languages:
+                self._notify_phase("pre_conversion", language, language=language)
+                with span("runner", "convert", language=language):
+                    self._convert_language_folder(language)
+                self._notify_phase("post_conversion", language, language=language)
+
+            self._notify_phase("finish")
+            logging.info(
+                "%d files written, %d unchanged",
+                self._output_counts["written"],
+                self._output_counts["unchanged"],
+            )
 
-        for i, language in enumerate(self._manifest.languages):
-            self._notify_extensions("pre_conversion", language)
-            self._convert_language_folder(language, i)
-            self._notify_extensions("post_conversion", language)
+            # a partial build leaves the previous build state intact
+            if self._depgraph is not None and not self._is_partial:
+                for output in self._depgraph.remove_stale_outputs():
+                    logging.info("Removed %s", output)
+                self._depgraph.save()
+
+            if self._errors:
+                details = "\n".join(
+                    f" - {path}: {message}" if path else f" - {message}"
+                    for path, message in self._errors
+                )
+                raise RuntimeError(f"Found {len(self._errors)} errors:\n{details}")
+
+    @property
+    def errors(self):
+        """
+        Errors that were collected in keep-going mode.
+
+        :rtype: list[tuple(str, str)]
+        :returns: Source path (or ``None`` if not caused by a file) and message
+        """
+        return self._errors
+
+    def _handle_error(self, error):
+        """Collect an error of the current file in keep-going mode (or raise it)."""
+        if not self._keep_going:
+            raise error
+        logging.error("%s: %s", self._current_file or "Error", error)
+        self._errors.append((self._current_file, str(error)))
+        record_event("error", message=str(error), path=self._current_file)
+
+    def plan(self):
+        """
+        Plan an incremental build without converting anything.
+
+        :returns: Output paths that need to be rebuilt (or removed) mapped to
+                  the reason
+        :rtype: dict(str, str)
+        """
+        if self._depgraph is None:
+            raise RuntimeError("Planning a build requires a dependency graph!")
+        self._preflight()
+        return self._plan()
+
+    def _plan(self):
+        outputs, sources = {}, []
+        for filepath, filepath_out in self._content_files():
+            inputs = self._get_inputs(filepath, filepath_out)
+            outputs[filepath_out] = (inputs, CONTENT_VALUES)
+            sources.append(relpath(filepath, self._source_dir))
+        self._depgraph.set_value("extensions", self._extension_names)
+        self._depgraph.set_value("manifest", vars(self._manifest))
+        self._depgraph.set_value(
+            "sources", {path: self._depgraph.hash_file(path) for path in sources}
+        )
+        self._notify_extensions("dependency_graph", self._depgraph)
+        return self._depgraph.plan(outputs)
+
+    def check_structure(self):
+        """
+        Check the content structure without converting anything.
+
+        Sections need a content file and need to be identical for all
+        languages. Every page needs a content file in all languages. Missing
+        footer fragments are logged as warnings.
+
+        :rtype: list[str]
+        :returns: All problems that were found
+        """
+        problems = []
+        sections = {}
+        for language in self._manifest.languages:
+            path = abspath(join(self._source_dir, language))
+            if not isdir(path):
+                problems.append(f"Directory {path} does not exist")
+                continue
+            sections[language] = []
+            for root, has_content in self._walk_sections(path):
+                if not has_content:
+                    problems.append(f"Found section without content file: {root}")
+                sections[language].append(relpath(root, path))
+            for page in self._get_pages():
+                filepath = self._get_page_paths(page, language)[0]
+                if not exists(filepath):
+                    problems.append(f"Page {page['id']} is missing: {filepath}")
+            for part in ("a", "b"):
+                filepath = self._get_footer_paths(language, part)[0]
+                if not exists(filepath):
+                    logging.warning("Footer fragment %s does not exist.", filepath)
+        problems.extend(self._compare_sections(sections))
+        return problems
+
+    @staticmethod
+    def _compare_sections(sections):
+        """Yield sections that are not present in all languages."""
+        all_sections = set()
+        for names in sections.values():
+            all_sections.update(names)
+        for language, names in sections.items():
+            for name in sorted(all_sections.difference(names)):
+                yield (
+                    "Inconsistent directory structure: "
+                    f"Section {name} is missing in language {language}."
+                )
 
-        self._notify_extensions("finish")
+    def _preflight(self):
+        """Raise a RuntimeError listing all structure problems."""
+        with span("runner", "preflight"):
+            problems = self.check_structure()
+        if problems:
+            details = "\n".join(f" - {problem}" for problem in problems)
+            raise RuntimeError(f"Found {len(problems)} problems:\n{details}")
+
+    def _needs_build(self):
+        planned = self._plan()
+        for output, reason in sorted(planned.items()):
+            logging.info("Rebuilding %s (%s)", output, reason)
+        return (
+            bool(planned)
+            or not self._depgraph.has_previous
+            or self._depgraph.is_resumed
+        )
 
-    def _convert_language_folder(self, language, lang_num):
+    def _content_files(self):
+        """Yield source and output path of all content files."""
+        for language in self._manifest.languages:
+            for filepath in self._section_files(language):
+                yield filepath, self._get_section_paths(filepath)[1]
+            for page in self._get_pages():
+                filepath, _, filepath_out = self._get_page_paths(page, language)
+                yield filepath, filepath_out
+            for part in ("a", "b"):
+                filepath, _, filepath_out = self._get_footer_paths(language, part)
+                if exists(filepath):
+                    yield filepath, filepath_out
+
+    def _section_files(self, language):
+        """Yield content files of all sections of a language folder in order."""
         path = abspath(join(self._source_dir, language))
 
         if not isdir(path):
             raise RuntimeError(f"Error: Directory {path} does not exist")
 
-        section_num = 0
+        for root, has_content in self._walk_sections(path):
+            if not has_content:
+                raise RuntimeError(f"Found section without content file: {root}")
+            yield join(root, f"{CONTENT_BASENAME}.md")
+
+    @staticmethod
+    def _walk_sections(path):
+        """Yield section folders in order and if they have a content file."""
         for root, dirs, files in walk(path):
             rel_path = relpath(root, path)
 
@@ -80,72 +335,50 @@ class InnoconvRunner:
             # note: all dirs manipulation must happen in-place!
             dirs.sort()  # sort section names
 
-            # process section
-            content_filename = f"{CONTENT_BASENAME}.md"
-            if content_filename in files:
-                filepath = join(root, content_filename)
-                self._process_section(filepath, lang_num, section_num)
-                section_num += 1
-            else:
-                raise RuntimeError(f"Found section without content file: {root}")
+            yield root, f"{CONTENT_BASENAME}.md" in files
 
-        if section_num != len(self._sections):
-            msg = (
-                "Inconsistent directory structure: "
-                f"Language {language} is missing sections."
-            )
-            raise RuntimeError(msg)
-
-        # process pages
+    def _get_pages(self):
         try:
-            pages = self._manifest.pages
+            return self._manifest.pages
         except AttributeError:
-            pages = []
-        for page in pages:
-            self._process_page(page, language)
+            return []
 
-        # process footer fragments
-        self._process_footer_fragments(language)
+    def _get_section_paths(self, filepath):
+        rel_path = dirname(relpath(filepath, self._source_dir))
+        output_filename = f"{CONTENT_BASENAME}.json"
+        return rel_path, join(self._output_dir, rel_path, output_filename)
 
-    def _process_section(self, filepath, lang_num, section_num):
+    def _get_page_paths(self, page, language):
+        input_filename = f"{page['id']}.md"
+        filepath = join(self._source_dir, language, PAGES_FOLDER, input_filename)
         rel_path = dirname(relpath(filepath, self._source_dir))
-        section_name = rel_path[3:]  # strip language
-        if lang_num == 0:
-            # record sections for first language
-            self._sections.append(section_name)
-        else:
-            # ensure sections are identical for all languages
-            try:
-                if self._sections[section_num] != section_name:
-                    msg = (
-                        "Inconsistent directory structure: "
-                        f"Section {rel_path} differs."
-                    )
-                    raise RuntimeError(msg)
-            except IndexError as err:
-                msg = (
-                    "Inconsistent directory structure: "
-                    f"Extra section {rel_path} present."
-                )
-                raise RuntimeError(msg) from err
+        output_filename = f"{page['id']}.json"
+        return filepath, rel_path, join(self._output_dir, rel_path, output_filename)
 
-        # full filepath
-        output_filename = f"{CONTENT_BASENAME}.json"
-        filepath_out = join(self._output_dir, rel_path, output_filename)
+    def _get_footer_paths(self, language, part):
+        input_filename = f"{FOOTER_FRAGMENT_PREFIX}_{part}.md"
+        filepath = join(self._source_dir, language, input_filename)
+        rel_path = dirname(relpath(filepath, self._source_dir))
+        output_filename = f"{FOOTER_FRAGMENT_PREFIX}{part.upper()}.json"
+        return filepath, rel_path, join(self._output_dir, rel_path, output_filename)
 
-        # convert file using pandoc
-        self._notify_extensions("pre_process_file", rel_path)
-        ast, title, short_title, section_type = to_ast(filepath)
-        self._notify_extensions(
-            "post_process_file", ast, title, "section", section_type, short_title
-        )
+    def _convert_language_folder(self, language):
+        # structure was checked before (see check_structure)
+        for filepath in self._section_files(language):
+            self._process_section(filepath)
 
-        # write file content
-        makedirs(dirname(filepath_out), exist_ok=True)
-        with open(filepath_out, "w", encoding="utf-8") as out_file:
-            json.dump(ast, out_file)
-        logging.info("Wrote %s", filepath_out)
+        # process pages
+        for page in self._get_pages():
+            self._process_page(page, language)
 
+        # process footer fragments
+        self._process_footer_fragments(language)
+
+    def _process_section(self, filepath):
+        rel_path, filepath_out = self._get_section_paths(filepath)
+
+        # convert file using pandoc
+        title, _ = self._convert_file(filepath, rel_path, filepath_out, "section")
         return title
 
     def _process_page(self, page, language):
@@ -162,61 +395,265 @@ class InnoconvRunner:
         except KeyError:
             page["title"] = {}
 
-        input_filename = f"{page['id']}.md"
-        filepath = join(self._source_dir, language, PAGES_FOLDER, input_filename)
-        rel_path = dirname(relpath(filepath, self._source_dir))
-
         # convert
-        self._notify_extensions("pre_process_file", rel_path)
-        ast, title, short_title, _ = to_ast(filepath)
-        self._notify_extensions("post_process_file", ast, title, "page", None)
+        filepath, rel_path, filepath_out = self._get_page_paths(page, language)
+        title, short_title = self._convert_file(
+            filepath, rel_path, filepath_out, "page"
+        )
         try:
             page["short_title"][language] = short_title
         except KeyError:
             page["short_title"] = {language: short_title}
         page["title"][language] = title
 
-        # write json output
-        output_filename = f"{page['id']}.json"
-        filepath_out = join(self._output_dir, rel_path, output_filename)
-        makedirs(dirname(filepath_out), exist_ok=True)
-        with open(filepath_out, "w", encoding="utf-8") as out_file:
-            json.dump(ast, out_file)
-        logging.info("Wrote %s", filepath_out)
-
     def _process_footer_fragments(self, language):
         for part in ("a", "b"):
-            input_filename = f"{FOOTER_FRAGMENT_PREFIX}_{part}.md"
-            filepath = join(self._source_dir, language, input_filename)
-            rel_path = dirname(relpath(filepath, self._source_dir))
+            filepath, rel_path, filepath_out = self._get_footer_paths(language, part)
             if not exists(filepath):
-                logging.warning("Footer fragment %s does not exist.", filepath)
-                continue
+                continue  # reported by check_structure
 
             # convert
-            self._notify_extensions("pre_process_file", rel_path)
-            ast, title, _, _ = to_ast(filepath, ignore_missing_title=True)
-            self._notify_extensions("post_process_file", ast, title, "fragment", None)
-
-            # write json output
-            output_filename = f"{FOOTER_FRAGMENT_PREFIX}{part.upper()}.json"
-            filepath_out = join(self._output_dir, rel_path, output_filename)
-            makedirs(dirname(filepath_out), exist_ok=True)
-            with open(filepath_out, "w", encoding="utf-8") as out_file:
-                json.dump(ast, out_file)
+            self._convert_file(filepath, rel_path, filepath_out, "fragment")
+
+    def _convert_file(self, filepath, rel_path, filepath_out, content_type):
+        """Convert a single file, notify extensions and write JSON output."""
+        self._current_file = relpath(filepath, self._source_dir)
+        try:
+            with span("file", self._current_file, self._current_file):
+                self._notify_extensions("pre_process_file", rel_path)
+                if not self._is_selected(rel_path, content_type):
+                    cached = self._get_previous_file(filepath_out)
+                    logging.info("%s is not selected", filepath_out)
+                    return self._replay_file(filepath, filepath_out, cached)
+                cached = self._get_cached_file(filepath, filepath_out)
+                if cached is not None:
+                    logging.info("%s is up to date", filepath_out)
+                    return self._replay_file(filepath, filepath_out, cached)
+                return self._convert_file_content(filepath, filepath_out, content_type)
+        finally:
+            self._current_file = None
+
+    def _is_selected(self, rel_path, content_type):
+        """Check if a file is part of a partial build."""
+        language, _, section = rel_path.replace(sep, "/").partition("/")
+        if self._languages is not None and language not in self._languages:
+            return False
+        if self._only is None:
+            return True
+        return content_type == "section" and (
+            section == self._only or section.startswith(f"{self._only}/")
+        )
+
+    def _get_previous_file(self, filepath_out):
+        """Return cached data of a file that isn't part of a partial build."""
+        cached = self._depgraph.get_data(filepath_out)
+        if cached is None:
+            msg = (
+                f"{relpath(filepath_out, self._output_dir)} was not built before. "
+                "Partial builds require a previous build in the output directory."
+            )
+            raise RuntimeError(msg)
+        return cached
+
+    def _get_cached_file(self, filepath, filepath_out):
+        """Return cached data of a file that doesn't need to be converted."""
+        if self._depgraph is None:
+            return None
+        cached = self._depgraph.get_data(filepath_out)
+        if cached is None or not self._depgraph.is_up_to_date(
+            filepath_out, (filepath, *cached["inputs"]), CONTENT_VALUES
+        ):
+            return None
+        for ext_name, ext in zip(self._extension_names, self._extensions):
+            contribution = cached["extensions"].get(ext_name)
+            if not ext.is_contribution_valid(contribution):
+                return None
+        return cached
+
+    def _replay_file(self, filepath, filepath_out, cached):
+        """Replay cached extension contributions of an up-to-date file."""
+        for ext_name, ext in zip(self._extension_names, self._extensions):
+            contribution = cached["extensions"].get(ext_name)
+            self._notify_extension(ext_name, ext, "replay_contribution", contribution)
+        inputs = (filepath, *cached["inputs"])
+        self._depgraph.record(filepath_out, inputs, CONTENT_VALUES, cached)
+        self._output_counts["unchanged"] += 1
+        record_event("file_skipped", path=self._current_file, output=filepath_out)
+        return cached["title"], cached["short_title"]
+
+    def _get_inputs(self, filepath, filepath_out):
+        """Return inputs of a content file (including those of extensions)."""
+        cached = self._depgraph.get_data(filepath_out)
+        return (filepath, *(cached["inputs"] if cached else ()))
+
+    def _get_extension_inputs(self):
+        """Collect source files extensions added as inputs of the current file."""
+        inputs = set()
+        for ext_name, ext in zip(self._extension_names, self._extensions):
+            for path in self._notify_extension(ext_name, ext, "get_inputs"):
+                inputs.add(relpath(path, self._source_dir) if isabs(path) else path)
+        return sorted(inputs)
+
+    def _get_contributions(self):
+        """Collect what extensions learned from the current file."""
+        contributions = {}
+        for ext_name, ext in zip(self._extension_names, self._extensions):
+            contributions[ext_name] = self._notify_extension(
+                ext_name, ext, "get_contribution"
+            )
+        return contributions
+
+    def _convert_file_content(self, filepath, filepath_out, content_type):
+        num_errors = len(self._errors)
+        try:
+            ast, title, short_title, section_type, written = self._read_file(
+                filepath, filepath_out, content_type
+            )
+        except (RuntimeError, ValueError) as error:
+            self._handle_error(error)
+            # extensions don't see the file, it's converted again by the next build
+            return "", ""
+
+        if content_type == "section":
+            args = (ast, title, content_type, section_type, short_title)
+        else:
+            args = (ast, title, content_type, None)
+        self._notify_extensions("element_index", ElementIndex(ast))
+        self._notify_extensions("post_process_file", *args)
+
+        # files with errors are converted again by the next build
+        if len(self._errors) > num_errors:
+            return title, short_title
+
+        # write json output
+        if written is None:
+            written = self._write_ast(ast, filepath_out)
+        self._record_output(filepath, filepath_out, title, short_title, written)
+
+        return title, short_title
+
+    def _read_file(self, filepath, filepath_out, content_type):
+        """Convert a file using pandoc (and write it in streaming mode)."""
+        # in streaming mode this includes processing and writing blocks
+        with span("pandoc", "pandoc", self._current_file):
+            try:
+                if self._stream:
+                    return self._stream_file(filepath, filepath_out, content_type)
+                ast, title, short_title, section_type = to_ast(
+                    filepath,
+                    ignore_missing_title=content_type == "fragment",
+                    element_hooks=self._get_element_hooks(),
+                )
+                # output is written after post-processing
+                return ast, title, short_title, section_type, None
+            finally:
+                for timer in self._hook_timers:
+                    timer.report(self._current_file)
+
+    def _stream_file(self, filepath, filepath_out, content_type):
+        """Convert a file and process and write blocks one-by-one."""
+        makedirs(dirname(filepath_out), exist_ok=True)
+        with stream_ast(
+            filepath,
+            ignore_missing_title=content_type == "fragment",
+            element_hooks=self._get_element_hooks(),
+        ) as converted:
+            blocks, title, short_title, section_type = converted
+            written = write_if_changed(
+                filepath_out,
+                lambda out_file: self._write_blocks(blocks, out_file, content_type),
+            )
+        # blocks were already processed and written
+        return [], title, short_title, section_type, written
+
+    def _get_element_hooks(self):
+        """Return element hooks (timed per extension if instrumentation is on)."""
+        return self._timed_element_hooks if is_active() else self._element_hooks
+
+    def _record_output(self, filepath, filepath_out, title, short_title, written):
+        """Log, count and record a converted file."""
+        changed, output_bytes = written
+        if changed:
             logging.info("Wrote %s", filepath_out)
+            self._output_counts["written"] += 1
+        else:
+            logging.info("%s is unchanged", filepath_out)
+            self._output_counts["unchanged"] += 1
+        if self._depgraph is not None:
+            cached = {
+                "title": title,
+                "short_title": short_title,
+                "inputs": self._get_extension_inputs(),
+                "extensions": self._get_contributions(),
+            }
+            inputs = (filepath, *cached["inputs"])
+            self._depgraph.record(filepath_out, inputs, CONTENT_VALUES, cached)
+        record_event(
+            "file_written" if changed else "file_unchanged",
+            path=self._current_file,
+            output=filepath_out,
+            bytes=output_bytes,
+        )
+
+    @staticmethod
+    def _write_ast(ast, filepath_out):
+        """Write AST as JSON unless unchanged (see :func:`write_if_changed`)."""
+        makedirs(dirname(filepath_out), exist_ok=True)
+        return write_if_changed(filepath_out, lambda out_file: json.dump(ast, out_file))
+
+    def _write_blocks(self, blocks, out_file, content_type):
+        """Process and write blocks one-by-one as JSON array."""
+        out_file.write("[")
+        for num, block in enumerate(blocks):
+            self._notify_extensions("post_process_block", block, content_type)
+            if num:
+                out_file.write(", ")
+            json.dump(block, out_file)
+        out_file.write("]")
+        return out_file.tell()
+
+    def _notify_phase(self, event_name, *args, **span_args):
+        """Notify extensions about a runner phase (measured as a whole)."""
+        with span("runner", event_name, **span_args):
+            self._notify_extensions(event_name, *args)
+
+    def _notify_extension(self, ext_name, ext, event_name, *args):
+        """Notify a single extension and return the result."""
+        func = getattr(ext, event_name)
+        if not is_active():
+            return func(*args)
+        with span("extension", f"{ext_name}.{event_name}", self._current_file):
+            return func(*args)
 
     def _notify_extensions(self, event_name, *args, **kwargs):
-        for ext in self._extensions:
+        if not is_active():
+            for ext in self._extensions:
+                func = getattr(ext, event_name)
+                func(*args, **kwargs)
+            return
+        for ext_name, ext in zip(self._extension_names, self._extensions):
             func = getattr(ext, event_name)
-            func(*args, **kwargs)
+            with span("extension", f"{ext_name}.{event_name}", self._current_file):
+                func(*args, **kwargs)
 
     def _load_extensions(self, extensions):
         # load extensions
         for ext_name in extensions:
             try:
                 self._extensions.append(EXTENSIONS[ext_name](self._manifest))
+                self._extension_names.append(ext_name)
             except (ImportError, KeyError) as exc:
                 raise RuntimeError(f"Extension {ext_name} not found!") from exc
+            if self._stream and not EXTENSIONS[ext_name].supports_streaming():
+                msg = f"Extension {ext_name} does not support streaming mode!"
+                raise RuntimeError(msg)
         # pass extension list to extenions
         self._notify_extensions("extension_list", self._extensions)
+        # collect element hooks that are run while parsing pandoc output
+        for ext_name, ext in zip(self._extension_names, self._extensions):
+            timer = CallTimer("extension", f"{ext_name}.element_hooks")
+            for elem_type, hook in ext.element_hooks().items():
+                self._element_hooks.setdefault(elem_type, []).append(hook)
+                timed_hooks = self._timed_element_hooks.setdefault(elem_type, [])
+                timed_hooks.append(timer.wrap(hook))
+            self._hook_timers.append(timer)
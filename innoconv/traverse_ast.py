@@ -1,4 +1,4 @@
-"""This module helps with traversing an AST."""
+"""This module helps with traversing and querying an AST."""
 
 import logging
 
@@ -133,3 +133,369 @@ class TraverseAst:
                 self._process_children(elem)
             except IgnoreSubtreeError:
                 pass
+
+
+class Edit:
+    """
+    Deferred modification of an element in a list.
+
+    Edits are not applied immediately but collected and applied in a single
+    rebuild of the list (see :func:`apply_edits`). Use one of the
+    constructors :meth:`replace`, :meth:`delete`, :meth:`insert_before` or
+    :meth:`insert_after`.
+    """
+
+    __slots__ = ("before", "replacement", "after")
+
+    def __init__(self, before=(), replacement=None, after=()):
+        """Initialize Edit."""
+        self.before = list(before)
+        self.replacement = None if replacement is None else list(replacement)
+        self.after = list(after)
+
+    @classmethod
+    def replace(cls, *elements):
+        """Replace element with zero or more elements."""
+        return cls(replacement=elements)
+
+    @classmethod
+    def delete(cls):
+        """Delete element."""
+        return cls(replacement=())
+
+    @classmethod
+    def insert_before(cls, *elements):
+        """Insert elements before the element."""
+        return cls(before=elements)
+
+    @classmethod
+    def insert_after(cls, *elements):
+        """Insert elements after the element."""
+        return cls(after=elements)
+
+    def merge(self, other):
+        """Combine with another edit of the same element (other wins)."""
+        replacement = self.replacement
+        if other.replacement is not None:
+            replacement = other.replacement
+        return Edit(self.before + other.before, replacement, self.after + other.after)
+
+
+def apply_edits(ast, edits):
+    """
+    Apply edits to a list in one linear rebuild.
+
+    :param ast: List that contains the edited elements.
+    :type ast: list
+    :param edits: Edits keyed by element ID (:func:`id`)
+    :type edits: dict(int, Edit)
+    """
+    result = []
+    for elem in ast:
+        edit = edits.get(id(elem))
+        if edit is None:
+            result.append(elem)
+            continue
+        result.extend(edit.before)
+        result.extend([elem] if edit.replacement is None else edit.replacement)
+        result.extend(edit.after)
+    ast[:] = result
+
+
+class RewriteAst(TraverseAst):
+    """
+    Traverse an AST and apply edits returned by a callback.
+
+    The callback may return an :class:`Edit` for the current element (or
+    ``None``). Edits are applied once all elements of the containing list were
+    visited, so the list is never modified while it's traversed. Replaced or
+    deleted elements are not descended into and inserted elements are not
+    visited.
+
+    :param func: Callback for handling an element. Receives element and the
+                 parent as parameters.
+    :type func: function(dict, dict) -> Edit
+    """
+
+    def _under_c(self, elem):
+        content = elem["c"]
+        if isinstance(content, list):
+            self.traverse(content, elem)
+        else:
+            # content is a single element that can't be edited in a list
+            wrapped = [content]
+            self.traverse(wrapped, elem)
+            elem["c"] = wrapped[0] if len(wrapped) == 1 else wrapped
+
+    def traverse(self, ast, parent=None):
+        """
+        Traverse an AST calling a function on each element and apply edits.
+
+        :param ast: Abstract syntax tree to traverse.
+        :type ast: list
+
+        :param parent: Parent of current subtree.
+        :type parent: dict
+        """
+        if not isinstance(ast, list):
+            return
+        edits = {}
+        for elem in ast:
+            try:
+                edit = self._func(elem, parent)
+                if edit is not None:
+                    edits[id(elem)] = edit
+                    if edit.replacement is not None:
+                        continue
+                self._process_children(elem)
+            except IgnoreSubtreeError:
+                pass
+        if edits:
+            apply_edits(ast, edits)
+
+
+class ElementIndex:
+    """
+    Index of AST elements by type.
+
+    Extensions that only care about a few element types can query the index
+    instead of traversing the whole AST. The index is built lazily on the first
+    query using :class:`TraverseAst`, so parents are the same as reported
+    there.
+
+    Extensions that change the AST structure need to keep the index up to date
+    using :meth:`add`, :meth:`remove` and :meth:`update`.
+
+    :param ast: Abstract syntax tree to index.
+    :type ast: list
+    """
+
+    #: Position of the attributes in the content of elements that have classes
+    attr_positions = {
+        "Code": 0,
+        "CodeBlock": 0,
+        "Div": 0,
+        "Header": 1,
+        "Image": 0,
+        "Link": 0,
+        "Span": 0,
+        "Table": 0,
+    }
+
+    def __init__(self, ast):
+        """Initialize ElementIndex."""
+        self.ast = ast
+        self._by_type = None
+        self._parents = None
+
+    def _build(self):
+        self._by_type = {}
+        self._parents = {}
+        TraverseAst(self._add_element).traverse(self.ast)
+
+    def _add_element(self, elem, parent):
+        try:
+            elem_type = elem["t"]
+        except (KeyError, TypeError):
+            return
+        self._by_type.setdefault(elem_type, []).append((elem, parent))
+        self._parents[id(elem)] = parent
+
+    def _get_classes(self, elem):
+        try:
+            return elem["c"][self.attr_positions[elem["t"]]][1]
+        except (KeyError, IndexError, TypeError):
+            return []
+
+    def find(self, elem_type, elem_class=None):
+        """
+        Find elements by type (and class).
+
+        Elements are returned in document order, except for elements that were
+        added using :meth:`add` after the index was built. These come last (in
+        the order they were added).
+
+        :param elem_type: Element type (e.g. ``"Div"``)
+        :type elem_type: str
+        :param elem_class: Only return elements that have this class
+        :type elem_class: str
+
+        :rtype: list of (dict, dict)
+        :returns: List of (element, parent) pairs
+        """
+        if self._by_type is None:
+            self._build()
+        entries = self._by_type.get(elem_type, [])
+        if elem_class is None:
+            return list(entries)
+        return [entry for entry in entries if elem_class in self._get_classes(entry[0])]
+
+    def get_parent(self, elem):
+        """
+        Return parent of an indexed element.
+
+        :raises KeyError: if element is not indexed
+        """
+        if self._by_type is None:
+            self._build()
+        return self._parents[id(elem)]
+
+    def add(self, elem, parent):
+        """
+        Add an element (and its sub-tree) that was inserted into the AST.
+
+        The element is appended to the query results, regardless of its
+        position in the document.
+        """
+        if self._by_type is not None:
+            TraverseAst(self._add_element).traverse([elem], parent)
+
+    def remove(self, elem):
+        """Remove an element (and its sub-tree) that was removed from the AST."""
+        if self._by_type is None:
+            return
+        removed = []
+        TraverseAst(lambda sub_elem, _: removed.append(sub_elem)).traverse([elem])
+        self._discard(removed)
+
+    def update(self, elem, old_type):
+        """
+        Re-index an element that was modified in-place.
+
+        :param elem: Modified element
+        :type elem: dict
+        :param old_type: Element type before modification
+        :type old_type: str
+        """
+        if self._by_type is None:
+            return
+        parent = self._parents[id(elem)]
+        self._discard([elem], (old_type, elem["t"]))
+        self.add(elem, parent)
+
+    def invalidate(self):
+        """Drop the index. It's rebuilt on the next query."""
+        self._by_type = None
+        self._parents = None
+
+    def _discard(self, elems, elem_types=None):
+        ids = {id(elem) for elem in elems}
+        if elem_types is None:
+            elem_types = {elem.get("t") for elem in elems if isinstance(elem, dict)}
+        for elem_type in elem_types:
+            try:
+                entries = self._by_type[elem_type]
+            except KeyError:
+                continue
+            entries[:] = [entry for entry in entries if id(entry[0]) not in ids]
+        for elem_id in ids:
+            self._parents.pop(elem_id, None)
+
+
+class AstEditor:
+    """
+    Collect edits of arbitrary elements and apply them in one go.
+
+    This is meant for extensions that find elements using an
+    :class:`ElementIndex` instead of a traversal. The list containing an
+    element is looked up in its parent. The content of every parent is searched
+    only once (for all of its edited children) and every affected list is
+    rebuilt only once.
+
+    :param ast: Abstract syntax tree that is edited.
+    :type ast: list
+
+    :param index: Element index that is kept up to date (optional).
+    :type index: ElementIndex
+    """
+
+    def __init__(self, ast, index=None):
+        """Initialize AstEditor."""
+        self._ast = ast
+        self._index = index
+        self._edits = {}
+        self._wrapped = {}  # single element content wrapped in a list
+
+    def edit(self, elem, parent, edit):
+        """
+        Schedule an edit.
+
+        :param elem: Element to edit
+        :type elem: dict
+        :param parent: Parent of the element (``None`` for top-level elements)
+        :type parent: dict
+        :param edit: Edit
+        :type edit: Edit
+        """
+        try:
+            _, _, prev_edit = self._edits[id(elem)]
+            edit = prev_edit.merge(edit)
+        except KeyError:
+            pass
+        self._edits[id(elem)] = (elem, parent, edit)
+
+    def apply(self):
+        """
+        Apply all scheduled edits.
+
+        :raises ValueError: if an element is not found in its parent
+        """
+        by_parent = {}
+        for elem, parent, edit in self._edits.values():
+            by_parent.setdefault(id(parent), (parent, []))[1].append((elem, edit))
+        by_list = {}
+        for parent, elem_edits in by_parent.values():
+            containers = self._get_containers(parent)
+            for elem, edit in elem_edits:
+                try:
+                    container = containers[id(elem)]
+                except KeyError as exc:
+                    raise ValueError(f"Element not found in parent: {elem}") from exc
+                _, list_edits, _ = by_list.setdefault(
+                    id(container), (container, {}, parent)
+                )
+                list_edits[id(elem)] = edit
+        if self._index is not None:
+            self._update_index()
+        for container, list_edits, parent in by_list.values():
+            apply_edits(container, list_edits)
+            if parent is not None and container is self._wrapped.get(id(parent)):
+                parent["c"] = container[0] if len(container) == 1 else container
+        self._edits = {}
+        self._wrapped = {}
+
+    def _get_containers(self, parent):
+        """Map IDs of the children of parent to the lists containing them."""
+        if parent is None:
+            return {id(elem): self._ast for elem in self._ast}
+        content = parent.get("c")
+        if isinstance(content, dict) and "t" in content:
+            wrapped = self._wrapped.setdefault(id(parent), [content])
+            return {id(content): wrapped}
+        containers = {}
+        _collect_lists(content, containers)
+        return containers
+
+    def _update_index(self):
+        # remove all replaced sub-trees first as new elements may be moved there
+        for elem, _, edit in self._edits.values():
+            if edit.replacement is not None:
+                self._index.remove(elem)
+        for _, parent, edit in self._edits.values():
+            new_elems = edit.before + (edit.replacement or []) + edit.after
+            for new_elem in new_elems:
+                self._index.add(new_elem, parent)
+
+
+def _collect_lists(value, containers):
+    """Map IDs of list items to their list, not descending into elements."""
+    if isinstance(value, list):
+        for item in value:
+            containers.setdefault(id(item), value)
+        candidates = value
+    elif isinstance(value, dict) and "t" not in value:
+        candidates = value.values()
+    else:
+        return
+    for item in candidates:
+        _collect_lists(item, containers)
@@ -1,9 +1,21 @@
 """Utility module."""
 
+from contextlib import contextmanager
+import filecmp
 import json
-from subprocess import PIPE, Popen
+import os
+from subprocess import PIPE
+from tempfile import TemporaryFile
 
 from innoconv.constants import ALLOWED_SECTION_TYPES, ENCODING
+from innoconv.instrumentation import span
+from innoconv.instrumentation.resources import MeasuredPopen
+
+#: Command used to convert a content file to JSON
+PANDOC_CMD = ["pandoc", "--strip-comments", "--to=json"]
+
+#: Element type key for hooks that are called on every element
+ANY_ELEMENT = "*"
 
 
 def to_string(ast):
@@ -22,42 +34,76 @@ def to_string(ast):
     return out
 
 
-def to_ast(filepath, ignore_missing_title=False):
+def write_if_changed(path, write):
     """
-    Convert a file to abstract syntax tree using pandoc.
+    Write a text file unless its content is identical to the existing file.
 
-    :param filepath: Path of file
-    :type filepath: str
+    Content is written to a temporary file next to ``path`` first. It only
+    replaces ``path`` if the content differs. Unchanged files keep their
+    modification time, so deployment tools like rsync don't transfer them.
 
-    :param ignore_missing_title: Accept missing title in source file
-    :type ignore_missing_title: bool
+    :param path: File path
+    :type path: str
+    :param write: Callback that writes the content to the file object it
+                  receives
+    :type write: function(file)
 
-    :rtype: (list of dicts, str, str, str)
-    :returns: (Pandoc AST, title, short_title, section_type)
+    :rtype: (bool, int)
+    :returns: (If the file was written, file size in bytes)
+    """
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, "w", encoding=ENCODING) as out_file:
+            write(out_file)
+            output_bytes = out_file.tell()
+        if os.path.exists(path) and filecmp.cmp(tmp_path, path, shallow=False):
+            os.remove(tmp_path)
+            return False, output_bytes
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True, output_bytes
 
-    :raises RuntimeError: if pandoc exits with an error
-    :raises ValueError: if no title was found
+
+def make_object_hook(element_hooks):
     """
-    pandoc_cmd = ["pandoc", "--strip-comments", "--to=json", filepath]
+    Create a JSON object hook that calls element hooks while decoding.
 
-    with Popen(pandoc_cmd, stdout=PIPE, stderr=PIPE) as proc:
-        out, err = proc.communicate(timeout=60)
-        out = out.decode(ENCODING)
-        err = err.decode(ENCODING)
+    The JSON decoder builds objects bottom-up, so a hook sees an element only
+    after all of its children have been decoded (and hooked).
 
-        if proc.returncode != 0:
-            msg = (
-                f"pandoc process returned exit code ({proc.returncode}). "
-                f"This is the pandoc output:\n{err}"
-            )
-            raise RuntimeError(msg)
+    Hooks registered for a specific type are called before hooks registered for
+    :data:`ANY_ELEMENT`. Objects without a type (``"t"`` key) are passed through.
+
+    :param element_hooks: Element type mapped to a list of callbacks. Callbacks
+                          receive the element and may modify it in-place.
+    :type element_hooks: dict(str, list(function(dict)))
+
+    :rtype: function(dict)
+    :returns: Object hook suitable for :func:`json.loads`
+    """
+    any_hooks = element_hooks.get(ANY_ELEMENT, [])
 
-    loaded = json.loads(out)
-    blocks = loaded["blocks"]
+    def object_hook(obj):
+        try:
+            elem_type = obj["t"]
+        except KeyError:
+            return obj
+        for hook in element_hooks.get(elem_type, ()):
+            hook(obj)
+        for hook in any_hooks:
+            hook(obj)
+        return obj
 
-    # extract title
+    return object_hook
+
+
+def _parse_meta(meta, filepath, ignore_missing_title):
+    """Extract title, short title and section type from meta block."""
     try:
-        title_ast = loaded["meta"]["title"]["c"]
+        title_ast = meta["title"]["c"]
     except KeyError as err:
         if ignore_missing_title:
             title_ast = []
@@ -66,7 +112,7 @@ def to_ast(filepath, ignore_missing_title=False):
             raise ValueError(msg) from err
     title = to_string(title_ast)
     try:
-        short_title_ast = loaded["meta"]["short_title"]["c"]
+        short_title_ast = meta["short_title"]["c"]
     except KeyError:
         short_title_ast = None
     short_title = to_string(short_title_ast) if short_title_ast else title
@@ -74,10 +120,188 @@ def to_ast(filepath, ignore_missing_title=False):
     # extract type
     section_type = None
     try:
-        section_type = to_string(loaded["meta"]["type"]["c"])
+        section_type = to_string(meta["type"]["c"])
         if section_type not in ALLOWED_SECTION_TYPES:
             raise ValueError(f"Invalid section type: {section_type}")
     except KeyError:
         pass
 
-    return blocks, title, short_title, section_type
+    return title, short_title, section_type
+
+
+def _pandoc_error(returncode, err):
+    msg = (
+        f"pandoc process returned exit code ({returncode}). "
+        f"This is the pandoc output:\n{err.decode(ENCODING)}"
+    )
+    return RuntimeError(msg)
+
+
+def to_ast(filepath, ignore_missing_title=False, element_hooks=None):
+    """
+    Convert a file to abstract syntax tree using pandoc.
+
+    :param filepath: Path of file
+    :type filepath: str
+
+    :param ignore_missing_title: Accept missing title in source file
+    :type ignore_missing_title: bool
+
+    :param element_hooks: Callbacks called on elements during JSON decoding
+                          (see :func:`make_object_hook`)
+    :type element_hooks: dict(str, list(function(dict)))
+
+    :rtype: (list of dicts, str, str, str)
+    :returns: (Pandoc AST, title, short_title, section_type)
+
+    :raises RuntimeError: if pandoc exits with an error
+    :raises ValueError: if no title was found
+    """
+    pandoc_cmd = PANDOC_CMD + [filepath]
+
+    with span("subprocess", "pandoc", filepath) as current, MeasuredPopen(
+        pandoc_cmd, stdout=PIPE, stderr=PIPE, span=current
+    ) as proc:
+        out, err = proc.communicate(timeout=60)
+        if proc.returncode != 0:
+            raise _pandoc_error(proc.returncode, err)
+
+    # json.loads decodes the bytes itself (detecting UTF-8/16/32), the raw
+    # output is released as soon as it's parsed
+    object_hook = make_object_hook(element_hooks) if element_hooks else None
+    loaded = json.loads(out, object_hook=object_hook)
+    del out
+    title, short_title, section_type = _parse_meta(
+        loaded["meta"], filepath, ignore_missing_title
+    )
+    return loaded["blocks"], title, short_title, section_type
+
+
+def _apply_object_hook(value, object_hook):
+    """Call object hook bottom-up on all objects (like the JSON decoder)."""
+    if isinstance(value, list):
+        for item in value:
+            _apply_object_hook(item, object_hook)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _apply_object_hook(item, object_hook)
+        object_hook(value)
+
+
+def _import_ijson():
+    """Import ijson which is only needed in streaming mode."""
+    try:
+        import ijson  # pylint: disable=import-outside-toplevel
+    except ImportError as err:
+        raise RuntimeError(
+            "Streaming mode requires ijson (pip install innoconv[stream])."
+        ) from err
+    return ijson
+
+
+def _iter_document(events, ijson):
+    """
+    Build meta block and top-level blocks from a stream of ijson events.
+
+    Yields ``("meta", meta)`` followed by ``("block", block)`` for every block.
+    Blocks are buffered in case pandoc outputs the meta block last.
+    """
+    meta = None
+    buffered = []
+    builder = builder_prefix = None
+    for prefix, event, value in events:
+        if builder is None:
+            if prefix in ("meta", "blocks.item") and event == "start_map":
+                builder = ijson.ObjectBuilder()
+                builder_prefix = prefix
+            else:
+                continue
+        builder.event(event, value)
+        if prefix == builder_prefix and event == "end_map":
+            if builder_prefix == "meta":
+                meta = builder.value
+                yield "meta", meta
+                for block in buffered:
+                    yield "block", block
+                buffered = []
+            elif meta is None:
+                buffered.append(builder.value)
+            else:
+                yield "block", builder.value
+            builder = None
+    if meta is None:
+        yield "meta", {}
+        for block in buffered:
+            yield "block", block
+
+
+@contextmanager
+def stream_ast(filepath, ignore_missing_title=False, element_hooks=None):
+    """
+    Convert a file using pandoc and read the top-level blocks incrementally.
+
+    This is a memory-saving alternative to :func:`to_ast` for very large
+    documents. pandoc output is parsed while it is being read, so only a single
+    top-level block is materialized at a time. Requires
+    `ijson <https://pypi.org/project/ijson/>`_ (``innoconv[stream]``).
+
+    Used as a context manager that yields a tuple
+    ``(blocks, title, short_title, section_type)`` where ``blocks`` is an
+    iterator over the top-level blocks.
+
+    :param filepath: Path of file
+    :type filepath: str
+
+    :param ignore_missing_title: Accept missing title in source file
+    :type ignore_missing_title: bool
+
+    :param element_hooks: Callbacks called on elements of every block (see
+                          :func:`make_object_hook`)
+    :type element_hooks: dict(str, list(function(dict)))
+
+    :raises RuntimeError: if pandoc exits with an error or ijson is missing
+    :raises ValueError: if no title was found
+    """
+    ijson = _import_ijson()
+    object_hook = make_object_hook(element_hooks) if element_hooks else None
+
+    # stderr goes to a file so a chatty pandoc can't block on a full pipe
+    with span("subprocess", "pandoc", filepath) as current, TemporaryFile() as err_file:
+        with MeasuredPopen(
+            PANDOC_CMD + [filepath], stdout=PIPE, stderr=err_file, span=current
+        ) as proc:
+            document = _iter_document(ijson.parse(proc.stdout, use_float=True), ijson)
+            try:
+                _, meta = next(document, ("meta", {}))
+            except ijson.JSONError as err:
+                _raise_parse_error(proc, err_file, err)
+            if object_hook:
+                _apply_object_hook(meta, object_hook)
+            title, short_title, section_type = _parse_meta(
+                meta, filepath, ignore_missing_title
+            )
+            blocks = _iter_blocks(document, object_hook, proc, err_file, ijson)
+            yield blocks, title, short_title, section_type
+
+
+def _check_returncode(proc, err_file):
+    proc.wait(timeout=60)
+    if proc.returncode != 0:
+        err_file.seek(0)
+        raise _pandoc_error(proc.returncode, err_file.read())
+
+
+def _raise_parse_error(proc, err_file, err):
+    _check_returncode(proc, err_file)  # prefer reporting pandoc errors
+    raise RuntimeError(f"Could not parse pandoc output: {err}") from err
+
+
+def _iter_blocks(document, object_hook, proc, err_file, ijson):
+    try:
+        for _, block in document:
+            if object_hook:
+                _apply_object_hook(block, object_hook)
+            yield block
+    except ijson.JSONError as err:
+        _raise_parse_error(proc, err_file, err)
+    _check_returncode(proc, err_file)
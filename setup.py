@@ -39,7 +39,8 @@ def setup_package():
             "PyYAML>=6,<7",
             "scour>=0,<1",
         ],
-        packages=["innoconv", "innoconv.ext"],
+        extras_require={"stream": ["ijson>=3,<4"]},
+        packages=["innoconv", "innoconv.ext", "innoconv.instrumentation"],
         python_requires=">=3.7.0",
         keywords=["innodoc", "pandoc", "markdown", "education"],
         license=METADATA["license"],
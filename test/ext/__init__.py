@@ -1,11 +1,12 @@
 """Unit tests for extensions."""
 
-from copy import deepcopy
+import json
 from os.path import join
 import unittest
 
 from innoconv.ext.abstract import AbstractExtension
 from innoconv.manifest import Manifest
+from innoconv.utils import make_object_hook
 from ..utils import get_filler_content
 
 SOURCE = "/source"
@@ -28,33 +29,83 @@ class TestExtension(unittest.TestCase):
     """
 
     @staticmethod
-    def _run(extension, ast=None, languages=("en", "de"), paths=PATHS, manifest=None):
-        if ast is None:
-            ast = get_filler_content()
-        title = {}
-        for language in languages:
-            title[language] = f"Title ({language})"
+    def _post_process(ext, ast, title, stream):
+        if stream:
+            for block in ast:
+                ext.post_process_block(block, "section")
+            ext.post_process_file([], title, "section", "test")
+        else:
+            ext.post_process_file(ast, title, "section", "test")
+
+    @staticmethod
+    def _get_extension(extension, languages, manifest):
         if manifest is None:
+            title = {}
+            for language in languages:
+                title[language] = f"Title ({language})"
             manifest = Manifest(
                 {"languages": languages, "title": title, "min_score": 90}
             )
         try:
             if issubclass(extension, AbstractExtension):
-                ext = extension(manifest)
-            else:
-                raise ValueError("extension not a sub-class of AbstractExtension!")
+                return extension(manifest)
+            raise ValueError("extension not a sub-class of AbstractExtension!")
         except TypeError:
-            ext = extension
+            return extension
+
+    @staticmethod
+    def _get_parser(ext):
+        """Simulate parsing pandoc output with element hooks."""
+        element_hooks = {k: [v] for k, v in ext.element_hooks().items()}
+        object_hook = make_object_hook(element_hooks)
+        return lambda ast: json.loads(json.dumps(ast), object_hook=object_hook)
+
+    @staticmethod
+    def _run(  # pylint: disable=too-many-arguments
+        extension,
+        ast=None,
+        languages=("en", "de"),
+        paths=PATHS,
+        manifest=None,
+        *,
+        stream=False,
+        contributions=None,
+    ):
+        if ast is None:
+            ast = get_filler_content()
+        ext = TestExtension._get_extension(extension, languages, manifest)
+        parse = TestExtension._get_parser(ext)
         ext.start(DEST, SOURCE)
         asts = []
         for language in languages:
             ext.pre_conversion(language)
             for title, path in paths:
                 ext.pre_process_file(join(language, *path))
-                file_ast = deepcopy(ast)
+                file_ast = parse(ast)
                 asts.append(file_ast)
                 file_title = f"{title} {language}"
-                ext.post_process_file(file_ast, file_title, "section", "test")
+                TestExtension._post_process(ext, file_ast, file_title, stream)
+                if contributions is not None:
+                    contributions.append(ext.get_contribution())
             ext.post_conversion(language)
         ext.finish()
         return ext, asts
+
+    @staticmethod
+    def _replay(extension, contributions, languages=("en", "de"), paths=PATHS):
+        """Simulate a run where cached contributions are replayed for all files."""
+        ext = TestExtension._get_extension(extension, languages, None)
+        # contributions are cached as JSON
+        contributions = iter(json.loads(json.dumps(contributions)))
+        ext.start(DEST, SOURCE)
+        for language in languages:
+            ext.pre_conversion(language)
+            for _, path in paths:
+                ext.pre_process_file(join(language, *path))
+                contribution = next(contributions)
+                if not ext.is_contribution_valid(contribution):
+                    raise RuntimeError("Contribution is invalid!")
+                ext.replay_contribution(contribution)
+            ext.post_conversion(language)
+        ext.finish()
+        return ext
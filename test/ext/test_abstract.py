@@ -28,10 +28,14 @@ class TestAbstractExtension(unittest.TestCase):
         test_extension = MyCrazyExtension(MANIFEST)
         events = (
             "extension_list",
+            "dependency_graph",
             "start",
             "pre_conversion",
             "pre_process_file",
             "post_process_file",
+            "get_contribution",
+            "is_contribution_valid",
+            "replay_contribution",
             "post_conversion",
             "finish",
         )
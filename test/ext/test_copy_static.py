@@ -2,10 +2,11 @@
 
 import itertools
 from os.path import join
-from unittest.mock import call, patch
+from unittest.mock import call, Mock, patch
 
 from innoconv.constants import STATIC_FOLDER
 from innoconv.ext.copy_static import CopyStatic
+from innoconv.instrumentation import add_recorder, remove_recorder
 from . import DEST, PATHS, SOURCE, TestExtension
 from ..utils import (
     get_complex_ast,
@@ -61,7 +62,7 @@ def _is_file_mock_non_localized(filename):
 @patch("os.path.lexists", return_value=True)
 @patch("os.path.isfile", side_effect=_is_file_mock_no_logo)
 @patch("shutil.copyfile")
-class TestCopyStatic(TestExtension):
+class TestCopyStatic(TestExtension):  # pylint: disable=too-many-public-methods
     """Test the CopyStatic extension."""
 
     def test_logo(self, copyfile, isfile, *_):
@@ -155,6 +156,17 @@ class TestCopyStatic(TestExtension):
                 with self.assertRaises(RuntimeError):
                     self._run(CopyStatic, ast)
 
+    def test_file_does_not_exist_keep_going(self, *args):
+        """Ensure missing files are passed to the error handler in keep-going mode."""
+        _, isfile, _, _ = args
+        isfile.side_effect = itertools.cycle((False,))
+        ext = self._get_extension(CopyStatic, ("en", "de"), None)
+        errors = []
+        ext.error_handler(errors.append)
+        self._run(ext, [get_image_ast("/not-present.png")])
+        self.assertEqual(len(errors), 8)
+        self.assertEqual(str(errors[0]), "Missing static file not-present.png")
+
     def test_ignore_remote(self, copyfile, *_):
         """Ensure ignoring of remote image references."""
         tests = (
@@ -324,3 +336,106 @@ class TestCopyStatic(TestExtension):
                     asts[i + len(PATHS)][1]["c"][0]["c"][2][0],
                     "_de/present.png",
                 )
+
+    @patch("os.stat")
+    def test_without_dependency_graph(self, stat, copyfile, isfile, *_):
+        """Ensure files are always copied without dependency graph."""
+        isfile.side_effect = _is_file_mock_present_non_localized
+        # same size and newer copy
+        stat.side_effect = lambda path: Mock(
+            st_size=42, st_mtime=2 if DEST in path else 1
+        )
+        self._run(CopyStatic, [get_image_ast("/present.jpg")], languages=("en",))
+        self.assertTrue(copyfile.called)
+
+    @patch("innoconv.ext.copy_static.getsize", return_value=42)
+    def test_dependency_graph(self, _, copyfile, isfile, *__):
+        """Ensure copies are recorded and skipped if up to date."""
+        isfile.side_effect = _is_file_mock_present_non_localized
+        ast = [get_image_ast("/present.jpg")]
+        src = join(SOURCE, STATIC_FOLDER, "present.jpg")
+        dst = join(DEST, STATIC_FOLDER, "present.jpg")
+        recorder = Mock()
+        add_recorder(recorder)
+        try:
+            for up_to_date in (True, False):
+                with self.subTest(up_to_date=up_to_date):
+                    copyfile.reset_mock()
+                    recorder.reset_mock()
+                    graph = Mock(is_up_to_date=Mock(return_value=up_to_date))
+                    ext = CopyStatic(None)
+                    ext.dependency_graph(graph)
+                    self._run(ext, ast, languages=("en",))
+                    self.assertEqual(copyfile.called, not up_to_date)
+                    self.assertEqual(graph.is_up_to_date.call_args, call(dst, (src,)))
+                    self.assertEqual(graph.record.call_args_list, [call(dst, (src,))])
+                    event = "static_skipped" if up_to_date else "static_copied"
+                    self.assertEqual(
+                        recorder.event_recorded.call_args,
+                        call(event, {"src": src, "dst": dst, "bytes": 42}),
+                    )
+        finally:
+            remove_recorder(recorder)
+
+    def test_replay(self, copyfile, isfile, *_):
+        """Ensure replayed contributions copy the same files."""
+        isfile.side_effect = _is_file_mock_present_non_localized
+        ast = [get_image_ast("/present.jpg"), get_image_ast("present.jpg")]
+        contributions = []
+        self._run(CopyStatic, ast, contributions=contributions)
+        self.assertEqual(
+            contributions[1],
+            [
+                ("present.jpg", "", *(join(STATIC_FOLDER, "present.jpg"),) * 2),
+                (
+                    "present.jpg",
+                    "title-1/",
+                    *(join(STATIC_FOLDER, "title-1", "present.jpg"),) * 2,
+                ),
+            ],
+        )
+        copied = sorted(copyfile.call_args_list)
+        copyfile.reset_mock()
+        self._replay(CopyStatic, contributions)
+        self.assertEqual(sorted(copyfile.call_args_list), copied)
+
+    def test_contribution_invalid(self, _, isfile, *__):
+        """Ensure contributions are invalid if a reference resolves differently."""
+        isfile.side_effect = _is_file_mock_present_localized
+        contributions = []
+        self._run(
+            CopyStatic,
+            [get_image_ast("/present.jpg")],
+            languages=("en",),
+            contributions=contributions,
+        )
+        for name, is_file in (
+            ("unchanged", _is_file_mock_present_localized),
+            ("localized removed", _is_file_mock_present_non_localized),
+            ("all removed", lambda _: False),
+        ):
+            with self.subTest(name):
+                isfile.side_effect = is_file
+                ext = CopyStatic(None)
+                ext.start(DEST, SOURCE)
+                ext.pre_conversion("en")
+                ext.pre_process_file("en")
+                self.assertEqual(
+                    ext.is_contribution_valid(contributions[0]), name == "unchanged"
+                )
+
+    def test_copy_missing_file(self, copyfile, isfile, *_):
+        """Ensure removed files of replayed contributions are reported."""
+        isfile.side_effect = _is_file_mock_present_localized
+        contributions = []
+        ast = [get_image_ast("/present.jpg")]
+        self._run(CopyStatic, ast, languages=("en",), contributions=contributions)
+        isfile.side_effect = lambda _: False
+        copyfile.reset_mock()
+        ext = CopyStatic(None)
+        ext.start(DEST, SOURCE)
+        ext.pre_conversion("en")
+        ext.replay_contribution(contributions[0])
+        with self.assertRaisesRegex(RuntimeError, "Missing static file en/_static"):
+            ext.finish()
+        self.assertFalse(copyfile.called)
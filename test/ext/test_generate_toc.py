@@ -64,3 +64,12 @@ class TestGenerateToc(TestExtension):
 
         manifest_fields = generate_toc.manifest_fields()
         self.assertIs(manifest_fields["toc"], toc)
+
+    def test_replay(self):
+        """Ensure replayed contributions yield identical results."""
+        contributions = []
+        generate_toc, _ = self._run(
+            GenerateToc, paths=PATHS, contributions=contributions
+        )
+        replayed = self._replay(GenerateToc, contributions, paths=PATHS)
+        self.assertEqual(generate_toc.manifest_fields(), replayed.manifest_fields())
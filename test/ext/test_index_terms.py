@@ -1,7 +1,8 @@
 """Unit tests for IndexTerms."""
 
 from innoconv.ext.index_terms import IndexTerms
-from . import TestExtension
+from innoconv.traverse_ast import TraverseAst
+from . import DEST, PATHS, SOURCE, TestExtension
 from ..utils import get_filler_content, get_index_term, get_para_ast
 
 AST = [
@@ -10,6 +11,21 @@ AST = [
     get_para_ast(get_index_term(get_filler_content(), "Term B")),
 ]
 
+NESTED_AST = [
+    get_para_ast(
+        [
+            get_index_term(
+                [
+                    get_index_term([get_filler_content()], "Term A"),
+                    get_index_term([get_filler_content()], "Term B"),
+                ],
+                "Term A",
+            ),
+            get_index_term([get_filler_content()], "Term A"),
+        ]
+    ),
+]
+
 
 class TestIndexTerms(TestExtension):
     """Test the IndexTerms extension."""
@@ -22,6 +38,46 @@ class TestIndexTerms(TestExtension):
             self.assertEqual(ast[1]["c"]["c"][0][0], "index-term-term-a-1")
             self.assertEqual(ast[2]["c"]["c"][0][0], "index-term-term-b-0")
 
+    def test_nested_index_terms(self):
+        """Ensure nested index terms are numbered in document order."""
+
+        def collect_ids(elem, _):
+            if elem["t"] == "Span":
+                ids.append(elem["c"][0][0])
+
+        for stream in (False, True):
+            with self.subTest(stream=stream):
+                _, asts = self._run(
+                    IndexTerms, NESTED_AST, ("en",), PATHS[:1], stream=stream
+                )
+                ids = []
+                TraverseAst(collect_ids).traverse(asts[0])
+                self.assertEqual(
+                    ids,
+                    [
+                        "index-term-term-a-0",
+                        "index-term-term-a-1",
+                        "index-term-term-b-0",
+                        "index-term-term-a-2",
+                    ],
+                )
+
+    def test_index_terms_in_meta(self):
+        """Ensure index terms in meta data (e.g. the title) are ignored."""
+        index_terms = self._get_extension(IndexTerms, ("en",), None)
+        parse = self._get_parser(index_terms)
+        index_terms.start(DEST, SOURCE)
+        index_terms.pre_conversion("en")
+        index_terms.pre_process_file("en")
+        title = get_index_term([get_filler_content()], "Title")
+        document = parse(
+            {"meta": {"title": {"t": "MetaInlines", "c": [title]}}, "blocks": AST}
+        )
+        index_terms.post_process_file(document["blocks"], "Title", "section")
+        self.assertEqual(document["meta"]["title"]["c"][0]["c"][0][0], "")
+        fields = index_terms.manifest_fields()["indexTerms"]["en"]
+        self.assertEqual(list(fields), ["term-a", "term-b"])
+
     def test_index_terms_manifest_fields(self):
         """Test index_terms manifest field."""
         index_terms, _ = self._run(IndexTerms, AST, languages=("en",))
@@ -53,3 +109,10 @@ class TestIndexTerms(TestExtension):
             }
         }
         self.assertEqual(manifest_fields["indexTerms"], index_terms_field)
+
+    def test_replay(self):
+        """Ensure replayed contributions yield identical results."""
+        contributions = []
+        index_terms, _ = self._run(IndexTerms, AST, contributions=contributions)
+        replayed = self._replay(IndexTerms, contributions)
+        self.assertEqual(index_terms.manifest_fields(), replayed.manifest_fields())
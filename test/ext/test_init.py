@@ -0,0 +1,78 @@
+"""Unit tests for the extension registry."""
+
+from subprocess import run
+import sys
+import unittest
+
+from innoconv.ext import EXTENSION_PATHS, ExtensionRegistry, EXTENSIONS
+from innoconv.ext.abstract import AbstractExtension
+from innoconv.ext.join_strings import JoinStrings
+
+#: Modules that must not be imported unless an extension needs them
+HEAVY_MODULES = ("scour", "slugify", "camel_converter")
+
+IMPORT_SCRIPT = """
+import sys
+{statement}
+ext_modules = [mod for mod in sys.modules if mod.startswith("innoconv.ext.")]
+heavy = [mod for mod in {heavy_modules} if mod in sys.modules]
+print(",".join(sorted(ext_modules + heavy)))
+"""
+
+
+def _get_imported_modules(statement):
+    """Run statement in a fresh interpreter and return imported modules."""
+    script = IMPORT_SCRIPT.format(statement=statement, heavy_modules=HEAVY_MODULES)
+    proc = run(
+        [sys.executable, "-c", script], capture_output=True, check=True, text=True
+    )
+    return set(filter(None, proc.stdout.strip().split(",")))
+
+
+class TestExtensionRegistry(unittest.TestCase):
+    """Test the extension registry."""
+
+    def test_lookup(self):
+        """Ensure extension classes are imported on lookup."""
+        registry = ExtensionRegistry(EXTENSION_PATHS)
+        self.assertIs(registry["join_strings"], JoinStrings)
+        self.assertIs(registry["join_strings"], JoinStrings)
+
+    def test_unknown_extension(self):
+        """Ensure unknown extensions raise KeyError."""
+        with self.assertRaises(KeyError):
+            EXTENSIONS["does_not_exist"]  # pylint: disable=pointless-statement
+
+    def test_import_error(self):
+        """Ensure import errors are propagated."""
+        registry = ExtensionRegistry({"broken": "innoconv.ext.does_not_exist.Foo"})
+        with self.assertRaises(ImportError):
+            registry["broken"]  # pylint: disable=pointless-statement
+
+    def test_mapping(self):
+        """Test names and classes of all extensions."""
+        self.assertEqual(list(EXTENSIONS), list(EXTENSION_PATHS))
+        self.assertEqual(len(EXTENSIONS), len(EXTENSION_PATHS))
+        self.assertIn("tikz2svg", EXTENSIONS)
+        for name, ext_class in EXTENSIONS.items():
+            with self.subTest(extension=name):
+                self.assertTrue(issubclass(ext_class, AbstractExtension))
+
+
+class TestImportTime(unittest.TestCase):
+    """Make sure extensions and their dependencies are only loaded when used."""
+
+    def test_cli_import(self):
+        """Importing the CLI must not import any extension."""
+        self.assertEqual(_get_imported_modules("import innoconv.cli"), set())
+
+    def test_single_extension(self):
+        """Enabling an extension must only import that extension."""
+        statement = (
+            "from innoconv.runner import InnoconvRunner\n"
+            "InnoconvRunner(None, None, None, ['join_strings'])"
+        )
+        self.assertEqual(
+            _get_imported_modules(statement),
+            {"innoconv.ext.abstract", "innoconv.ext.join_strings"},
+        )
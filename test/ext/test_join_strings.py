@@ -10,14 +10,25 @@ class TestJoinStrings(TestExtension):
     """Test the JoinStrings extension."""
 
     @staticmethod
-    def _run(
+    def _run(  # pylint: disable=too-many-arguments
         extension=JoinStrings,
         ast=None,
         languages=("en",),
         paths=PATHS,
         manifest=None,
+        *,
+        stream=False,
+        contributions=None,
     ):
-        _, [ast] = TestExtension._run(extension, ast, languages=languages, paths=paths)
+        _, [ast] = TestExtension._run(
+            extension,
+            ast,
+            languages=languages,
+            paths=paths,
+            manifest=manifest,
+            stream=stream,
+            contributions=contributions,
+        )
         return ast
 
     def test_unchanged(self):
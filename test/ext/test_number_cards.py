@@ -68,6 +68,24 @@ class TestNumberCards(TestExtension):
                 self.assertEqual(ast[4]["c"][0][0], "EXER_ID")
                 self.assertEqual(ast[4]["c"][0][2][0], ("data-number", f"{section}.3"))
 
+    def test_streaming(self, warning):
+        """Ensure streaming mode yields identical results."""
+        number_cards, asts = self._run(NumberCards, AST)
+        number_cards_stream, asts_stream = self._run(NumberCards, AST, stream=True)
+        self.assertEqual(warning.call_count, 0)
+        self.assertEqual(asts, asts_stream)
+        self.assertEqual(
+            number_cards.manifest_fields(), number_cards_stream.manifest_fields()
+        )
+
+    def test_card_in_exercise(self, warning):
+        """Ensure cards nested in exercises are not numbered."""
+        ast = [get_exercise_ast([get_div_ast(classes="info")], div_id="EXER_ID")]
+        number_cards, _ = self._run(NumberCards, ast, languages=("en",))
+        self.assertEqual(warning.call_count, 0)
+        cards = number_cards.manifest_fields()["cards"]
+        self.assertEqual(cards["title-1"], [("EXER_ID", "1.0.1", "exercise", 0, 0)])
+
     def test_missing_card(self, warning):
         """Test detection of missing card."""
         number_cards, _ = self._run(NumberCards, AST, languages=("en",))
@@ -101,3 +119,23 @@ class TestNumberCards(TestExtension):
                 ),
                 warning.call_args_list,
             )
+
+    def test_replay(self, warning):
+        """Ensure replayed contributions yield identical results."""
+        contributions = []
+        number_cards, _ = self._run(NumberCards, AST, contributions=contributions)
+        replayed = self._replay(NumberCards, contributions)
+        self.assertEqual(warning.call_count, 0)
+        self.assertEqual(number_cards.manifest_fields(), replayed.manifest_fields())
+
+    def test_contribution_invalid(self, _):
+        """Ensure contributions are invalid if numbering changed."""
+        contributions = []
+        self._run(NumberCards, AST, languages=("en",), contributions=contributions)
+        self.assertEqual(contributions[2]["start"], [2, 0, 0])
+        # title-2 is the first section now
+        number_cards = NumberCards(None)
+        number_cards.pre_conversion("en")
+        number_cards.pre_process_file("en/title-2")
+        self.assertFalse(number_cards.is_contribution_valid(contributions[2]))
+        self.assertTrue(number_cards.is_contribution_valid(contributions[1]))
@@ -5,17 +5,20 @@ from hashlib import md5
 from os.path import join
 from unittest.mock import MagicMock, Mock, patch
 
+from innoconv.constants import STATIC_FOLDER
 from innoconv.ext.tikz2svg import (
     Tikz2Svg,
     TIKZ_FILENAME,
     TIKZ_FOLDER,
     TIKZ_IMG_TAG_ALT,
+    TIKZ_VALUES,
 )
+from innoconv.instrumentation import add_recorder, remove_recorder
 from innoconv.manifest import Manifest
+from innoconv.traverse_ast import ElementIndex
 from . import TestExtension
 from ..utils import get_image_ast, get_para_ast
 
-
 PATHS = (("Foo", ("foo",)),)
 TIKZ_STRING = r"""
 \begin{tikzpicture}[x=1.0cm, y=1.0cm]
@@ -31,6 +34,8 @@ TIKZ_PREAMBLE = r"""
 \mycrazypreamble
 """
 
+MANIFEST = Manifest({"languages": ("en",), "title": {"en": "Foo"}, "min_score": 90})
+
 IMAGE_BLOCK = get_image_ast(
     join(TIKZ_FOLDER, f"{TIKZ_FILENAME.format(TIKZ_HASH)}.svg"),
     description="TikZ Image",
@@ -50,7 +55,7 @@ IMAGE_BLOCK = get_image_ast(
 )
 @patch("innoconv.ext.tikz2svg.makedirs")
 @patch(
-    "innoconv.ext.tikz2svg.Popen",
+    "innoconv.ext.tikz2svg.MeasuredPopen",
     return_value=MagicMock(__enter__=Mock(return_value=Mock(returncode=0))),
 )
 class TestTikz2Svg(TestExtension):
@@ -90,6 +95,42 @@ class TestTikz2Svg(TestExtension):
         self.assertEqual(image["t"], "Image")
         self.assertEqual(image["c"][1][0]["c"], "Lorem Ipsum")
 
+    def test_with_caption_index(self, *_):
+        """Ensure the shared element index is updated."""
+        div = {
+            "c": [["", ["figure"], []], [get_para_ast(), deepcopy(TIKZ_BLOCK)]],
+            "t": "Div",
+        }
+        ast = [div]
+        index = ElementIndex(ast)
+        index.find("CodeBlock")
+        tikz2svg = Tikz2Svg(
+            Manifest({"languages": ("en",), "title": {}, "min_score": 90})
+        )
+        tikz2svg.element_index(index)
+        tikz2svg.post_process_file(ast, "Title", "section")
+        self.assertEqual(index.find("CodeBlock"), [])
+        self.assertEqual(index.find("Para"), [])
+        image = div["c"][1][0]
+        self.assertEqual(index.find("Image"), [(image, div)])
+        self.assertEqual(index.find("Str"), [(image["c"][1][0], image)])
+
+    def test_streaming(self, *_):
+        """Ensure top-level and figure code blocks are replaced in streaming mode."""
+        input_ast = [
+            deepcopy(TIKZ_BLOCK),
+            {
+                "c": [["", ["figure"], []], [get_para_ast(), deepcopy(TIKZ_BLOCK)]],
+                "t": "Div",
+            },
+        ]
+        _, asts = self._run(
+            Tikz2Svg, input_ast, languages=("en",), paths=PATHS, stream=True
+        )
+        self.assertEqual(asts[0][0]["t"], "Image")
+        self.assertEqual(asts[0][1]["c"][1][0]["t"], "Image")
+        self.assertEqual(len(asts[0][1]["c"][1]), 1)
+
     def test_with_preamble(self, mock_popen, *_):
         """Test conversion with LaTeX preamble."""
         manifest_data = {
@@ -104,6 +145,62 @@ class TestTikz2Svg(TestExtension):
         pipe_mock = mock_popen.return_value.__enter__.return_value
         self.assertIn(TIKZ_PREAMBLE, pipe_mock.stdin.write.call_args[0][0].decode())
 
+    def test_dependency_graph(self, mock_popen, *_):
+        """Ensure up-to-date images are not rendered again."""
+        svg_path = join(
+            STATIC_FOLDER, TIKZ_FOLDER, f"{TIKZ_FILENAME.format(TIKZ_HASH)}.svg"
+        )
+        for up_to_date in (True, False):
+            with self.subTest(up_to_date=up_to_date):
+                mock_popen.reset_mock()
+                graph = Mock(is_up_to_date=Mock(return_value=up_to_date))
+                ext = Tikz2Svg(MANIFEST)
+                ext.dependency_graph(graph)
+                self._run(ext, [deepcopy(TIKZ_BLOCK)], languages=("en",), paths=PATHS)
+                self.assertEqual(graph.set_value.call_args[0], ("tikz_preamble", ""))
+                self.assertEqual(mock_popen.called, not up_to_date)
+                self.assertEqual(
+                    graph.record.call_args_list,
+                    [((svg_path,), {"values": TIKZ_VALUES})],
+                )
+
+    def test_cache_events(self, *_):
+        """Ensure cache events are recorded once per image."""
+        for up_to_date in (True, False):
+            with self.subTest(up_to_date=up_to_date):
+                graph = Mock(is_up_to_date=Mock(return_value=up_to_date))
+                ext = Tikz2Svg(MANIFEST)
+                ext.dependency_graph(graph)
+                recorder = Mock()
+                add_recorder(recorder)
+                try:
+                    self._run(
+                        ext,
+                        [deepcopy(TIKZ_BLOCK), deepcopy(TIKZ_BLOCK)],
+                        languages=("en", "de"),
+                        paths=PATHS,
+                    )
+                finally:
+                    remove_recorder(recorder)
+                events = [c[0] for c in recorder.event_recorded.call_args_list]
+                name = "tikz_cache_hit" if up_to_date else "tikz_rendered"
+                self.assertEqual(events, [(name, {"tikz_hash": TIKZ_HASH})])
+
+    def test_replay(self, mock_popen, *_):
+        """Ensure replayed contributions render the same images."""
+        contributions = []
+        self._run(
+            Tikz2Svg,
+            [deepcopy(TIKZ_BLOCK)],
+            languages=("en",),
+            paths=PATHS,
+            contributions=contributions,
+        )
+        self.assertEqual(contributions, [{TIKZ_HASH: TIKZ_STRING.strip()}])
+        mock_popen.reset_mock()
+        self._replay(Tikz2Svg, contributions, languages=("en",), paths=PATHS)
+        self.assertEqual(mock_popen.call_count, 2)
+
     def test_no_tikz_images(self, *_):
         """Test without any TikZ images."""
         input_ast = [{"c": [{"t": "Str", "c": "Foo"}]}]
@@ -122,3 +219,17 @@ class TestTikz2Svg(TestExtension):
                 self._run(Tikz2Svg, input_ast, languages=("en",), paths=PATHS)
         finally:
             mock_popen.return_value.__enter__.return_value.returncode = rc_orig
+
+    def test_conversion_error_keep_going(self, mock_popen, *_):
+        """Ensure failed images are passed to the error handler in keep-going mode."""
+        rc_orig = mock_popen.return_value.__enter__.return_value.returncode
+        try:
+            mock_popen.return_value.__enter__.return_value.returncode = 1
+            ext = self._get_extension(Tikz2Svg, ("en",), None)
+            errors = []
+            ext.error_handler(errors.append)
+            self._run(ext, [deepcopy(TIKZ_BLOCK)], languages=("en",), paths=PATHS)
+            self.assertEqual(len(errors), 1)
+            self.assertRegex(str(errors[0]), r"^TikZ image tikz_\w+\.svg: ")
+        finally:
+            mock_popen.return_value.__enter__.return_value.returncode = rc_orig
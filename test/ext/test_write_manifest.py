@@ -1,24 +1,30 @@
 """Unit tests for WriteManifest."""
 
-from unittest.mock import call, patch
+from unittest.mock import call, Mock, patch
 
 from innoconv.ext.abstract import AbstractExtension
-from innoconv.ext.write_manifest import WriteManifest
+from innoconv.ext.write_manifest import MANIFEST_VALUES, WriteManifest
 from innoconv.manifest import Manifest
 from . import DEST, TestExtension
 
 
+@patch("os.replace")
 @patch("json.dump")
 @patch("builtins.open")
 class TestWriteManifest(TestExtension):
     """Test the WriteManifest extension."""
 
-    def test_write_manifest(self, mock_open, mock_dump):
+    def test_write_manifest(self, mock_open, mock_dump, mock_replace):
         """Test the creation of a manifest file in the destination directory."""
         self._run(WriteManifest)
         self.assertIs(mock_open.call_count, 1)
         self.assertEqual(
-            mock_open.call_args, call(f"{DEST}/manifest.json", "w", encoding="utf-8")
+            mock_open.call_args,
+            call(f"{DEST}/manifest.json.tmp", "w", encoding="utf-8"),
+        )
+        self.assertEqual(
+            mock_replace.call_args,
+            call(f"{DEST}/manifest.json.tmp", f"{DEST}/manifest.json"),
         )
         self.assertIs(mock_dump.call_count, 1)
         manifest_dict = mock_dump.call_args[0][0]
@@ -26,9 +32,23 @@ class TestWriteManifest(TestExtension):
         self.assertEqual(manifest_dict["title"]["de"], "Title (de)")
         self.assertEqual(manifest_dict["languages"], ("en", "de"))
 
-    def test_custom_field(self, _, mock_dump):
+    def test_dependency_graph(self, *_):
+        """Ensure the manifest is recorded in the dependency graph."""
+        graph = Mock()
+        manifest = Manifest(
+            {"languages": ("en",), "title": {"en": "Title"}, "min_score": 90}
+        )
+        ext = WriteManifest(manifest)
+        ext.dependency_graph(graph)
+        self._run(ext, languages=("en",), manifest=manifest)
+        self.assertEqual(
+            graph.record.call_args, call("manifest.json", values=MANIFEST_VALUES)
+        )
+
+    def test_custom_field(self, *args):
         """Test inclusion of custom field from other extension."""
         # pylint: disable=abstract-method
+        _, mock_dump, _ = args
 
         class ExtA(AbstractExtension):
             """Extension that does not write custom fields."""
@@ -0,0 +1 @@
+"""Unit tests for innoconv.instrumentation."""
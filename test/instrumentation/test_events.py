@@ -0,0 +1,79 @@
+"""Unit tests for innoconv.instrumentation.events."""
+
+from io import StringIO
+import json
+import unittest
+
+from innoconv.instrumentation import (
+    add_recorder,
+    record_event,
+    remove_recorder,
+    span,
+)
+from innoconv.instrumentation.events import EventStream
+
+
+class TestEventStream(unittest.TestCase):
+    """Test the EventStream recorder."""
+
+    def setUp(self):
+        """Simulate a build."""
+        self.out_file = StringIO()
+        stream = EventStream(self.out_file)
+        add_recorder(stream)
+        try:
+            with span("runner", "run"):
+                with span("runner", "convert", language="en"):
+                    with span("file", "en/content.md", "en/content.md"):
+                        with span("extension", "foo.post_process_file"):
+                            pass
+                        record_event(
+                            "file_written",
+                            path="en/content.md",
+                            output="/out/en/content.json",
+                            bytes=42,
+                        )
+                record_event("static_copied", src="a", dst="b", bytes=10)
+                record_event("error", message="Foo")
+            record_event("build_finished", status="failed", exit_code=11)
+        finally:
+            remove_recorder(stream)
+        self.events = [
+            json.loads(line) for line in self.out_file.getvalue().split("\n") if line
+        ]
+
+    def test_events(self):
+        """Test the sequence of events."""
+        self.assertEqual(
+            [event["event"] for event in self.events],
+            [
+                "phase_started",
+                "file_started",
+                "file_finished",
+                "phase_finished",
+                "static_copied",
+                "error",
+                "build_finished",
+            ],
+        )
+        for event in self.events:
+            self.assertIsInstance(event["time"], float)
+
+    def test_file_finished(self):
+        """Ensure output of a file is reported when it's finished."""
+        event = self.events[2]
+        self.assertEqual(event["path"], "en/content.md")
+        self.assertEqual(event["output"], "/out/en/content.json")
+        self.assertEqual(event["bytes"], 42)
+        self.assertTrue(event["changed"])
+        self.assertGreaterEqual(event["duration"], 0)
+
+    def test_data(self):
+        """Ensure event data is passed on."""
+        self.assertEqual(self.events[0]["phase"], "convert")
+        self.assertEqual(self.events[0]["language"], "en")
+        self.assertEqual(self.events[3]["language"], "en")
+        self.assertIn("duration", self.events[3])
+        self.assertEqual(self.events[4]["bytes"], 10)
+        self.assertEqual(self.events[5]["message"], "Foo")
+        self.assertEqual(self.events[6]["exit_code"], 11)
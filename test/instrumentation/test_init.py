@@ -0,0 +1,110 @@
+"""Unit tests for the span API in innoconv.instrumentation."""
+
+from time import perf_counter, sleep
+import unittest
+from unittest.mock import Mock
+
+from innoconv.instrumentation import (
+    add_recorder,
+    CallTimer,
+    is_active,
+    remove_recorder,
+    span,
+)
+
+
+class TestSpan(unittest.TestCase):
+    """Test spans and recorder registration."""
+
+    def test_inactive(self):
+        """Ensure spans are no-ops without recorders."""
+        self.assertFalse(is_active())
+        with span("file", "foo.md") as current:
+            self.assertIsNone(current)
+
+    def test_recorder(self):
+        """Ensure recorders are notified about spans."""
+        recorder = Mock()
+        add_recorder(recorder)
+        try:
+            self.assertTrue(is_active())
+            with span("extension", "foo.start", "en/content.md") as current:
+                recorder.span_started.assert_called_once_with(current)
+                self.assertFalse(recorder.span_finished.called)
+        finally:
+            remove_recorder(recorder)
+        recorder.span_finished.assert_called_once_with(current)
+        self.assertEqual(current.category, "extension")
+        self.assertEqual(current.name, "foo.start")
+        self.assertEqual(current.path, "en/content.md")
+        self.assertGreaterEqual(current.wall, 0)
+        self.assertGreaterEqual(current.cpu, 0)
+        self.assertFalse(is_active())
+
+    def test_exception(self):
+        """Ensure spans finish if an exception is raised."""
+        recorder = Mock()
+        add_recorder(recorder)
+        try:
+            with self.assertRaises(RuntimeError):
+                with span("pandoc", "pandoc"):
+                    raise RuntimeError()
+        finally:
+            remove_recorder(recorder)
+        self.assertEqual(recorder.span_finished.call_count, 1)
+
+
+class TestCallTimer(unittest.TestCase):
+    """Test summing up many calls."""
+
+    def test_report(self):
+        """Ensure calls are reported as a single span."""
+        timer = CallTimer("extension", "foo.element_hooks")
+        func = timer.wrap(lambda elem, doc: elem)
+        self.assertEqual(func("elem", "doc"), "elem")
+        self.assertEqual(func("elem", "doc"), "elem")
+        recorder = Mock()
+        add_recorder(recorder)
+        try:
+            timer.report("en/content.md")
+            timer.report("en/content.md")
+        finally:
+            remove_recorder(recorder)
+        recorder.span_finished.assert_called_once()
+        current = recorder.span_finished.call_args[0][0]
+        self.assertEqual(current.category, "extension")
+        self.assertEqual(current.name, "foo.element_hooks")
+        self.assertEqual(current.path, "en/content.md")
+        self.assertEqual(current.args, {"calls": 2})
+        self.assertGreaterEqual(current.wall, 0)
+        self.assertEqual(timer.calls, 0)
+
+    def test_start(self):
+        """Ensure the reported span starts with the first call."""
+        timer = CallTimer("extension", "foo.element_hooks")
+        func = timer.wrap(lambda elem: elem)
+        before = perf_counter()
+        func("elem")
+        after = perf_counter()
+        sleep(0.01)
+        recorder = Mock()
+        add_recorder(recorder)
+        try:
+            timer.report()
+        finally:
+            remove_recorder(recorder)
+        current = recorder.span_finished.call_args[0][0]
+        self.assertGreaterEqual(current.start, before)
+        self.assertLessEqual(current.start + current.wall, after)
+        self.assertIsNone(timer.start)
+
+    def test_exception(self):
+        """Ensure calls that raise are counted."""
+        timer = CallTimer("extension", "foo.element_hooks")
+
+        def fail(_):
+            raise RuntimeError()
+
+        with self.assertRaises(RuntimeError):
+            timer.wrap(fail)("elem")
+        self.assertEqual(timer.calls, 1)
@@ -0,0 +1,79 @@
+"""Unit tests for innoconv.instrumentation.memory."""
+
+from os.path import dirname
+import tracemalloc
+import unittest
+
+from innoconv.instrumentation import add_recorder, remove_recorder, Span, span
+from innoconv.instrumentation import memory
+from innoconv.instrumentation.memory import MemoryReport
+from innoconv.instrumentation.timings import Timings
+
+MIB = 2**20
+
+
+class TestMemoryReport(unittest.TestCase):
+    """Test the MemoryReport recorder."""
+
+    def setUp(self):
+        """Simulate a build with a retaining and a transient extension."""
+        self.retained = []
+        self.memory = MemoryReport(3)
+        add_recorder(self.memory)
+        try:
+            with span("runner", "run"):
+                with span("runner", "convert", language="en"):
+                    for _ in range(2):
+                        with span("extension", "foo.post_process_file"):
+                            self.retained.append(bytearray(2 * MIB))
+                        with span("extension", "bar.post_process_file"):
+                            transient = [bytearray(MIB) for _ in range(8)]
+                            del transient
+                with span("runner", "finish"):
+                    pass
+        finally:
+            remove_recorder(self.memory)
+            self.memory.stop()
+
+    def test_tracing_stopped(self):
+        """Ensure tracing is stopped."""
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_per_extension(self):
+        """Test net allocation and peak per extension."""
+        usage = {name: values for name, *values in self.memory.per_extension()}
+        self.assertEqual(self.memory.per_extension()[0][0], "foo")
+        foo_calls, foo_net, _ = usage["foo"]
+        self.assertEqual(foo_calls, 2)
+        self.assertGreaterEqual(foo_net, 4 * MIB)
+        _, bar_net, bar_peak = usage["bar"]
+        self.assertLess(bar_net, MIB)
+        self.assertGreaterEqual(bar_peak, 8 * MIB)
+
+    def test_report(self):
+        """Test the report contains phases, extensions and sites."""
+        report = self.memory.report()
+        self.assertIn("convert [en]", report)
+        self.assertIn("finish", report)
+        self.assertIn("foo", report)
+        self.assertIn("test_memory.py", report)
+        self.assertNotIn("memory.py:", report.replace("test_memory.py", ""))
+
+
+class TestSnapshot(unittest.TestCase):
+    """Test filtering of snapshots."""
+
+    def test_ignore_instrumentation(self):
+        """Ensure allocations of all recorders are ignored."""
+        tracemalloc.start()
+        try:
+            timings = Timings()
+            for _ in range(1000):
+                timings.span_finished(Span("file", "foo.md", "foo.md"))
+            snapshot = memory._take_snapshot()  # pylint: disable=protected-access
+        finally:
+            tracemalloc.stop()
+        self.assertEqual(len(timings.to_json()), 1000)
+        filenames = {trace.traceback[0].filename for trace in snapshot.traces}
+        package_dir = dirname(memory.__file__)
+        self.assertFalse([name for name in filenames if name.startswith(package_dir)])
@@ -0,0 +1,108 @@
+"""Unit tests for innoconv.instrumentation.metrics."""
+
+from os import listdir
+from os.path import join
+from tempfile import TemporaryDirectory
+import unittest
+from unittest.mock import patch
+
+from innoconv.instrumentation import (
+    add_recorder,
+    record_event,
+    remove_recorder,
+    span,
+)
+from innoconv.instrumentation.metrics import Metrics
+
+
+class TestMetrics(unittest.TestCase):
+    """Test the Metrics recorder."""
+
+    def setUp(self):
+        """Simulate a build."""
+        self.metrics = Metrics()
+        add_recorder(self.metrics)
+        try:
+            with span("runner", "run"):
+                for _ in range(2):
+                    with span("runner", "convert"):
+                        with span("subprocess", "pandoc"):
+                            pass
+                        record_event("file_written", path="a.md", bytes=100)
+                record_event("file_unchanged", path="c.md", bytes=50)
+                record_event("file_skipped", path="b.md", output="b.json")
+                record_event("tikz_cache_hit", tikz_hash="abc")
+                record_event("tikz_rendered", tikz_hash="abc")
+                record_event("static_copied", src="a", dst="b", bytes=10)
+                record_event("static_skipped", src="c", dst="d", bytes=20)
+                record_event("manifest_written", output="m.json", bytes=5)
+                record_event("manifest_unchanged", output="m.json", bytes=5)
+            with patch("time.time", return_value=1234.5):
+                record_event("build_finished", status="failed", exit_code=11)
+        finally:
+            remove_recorder(self.metrics)
+
+    def _get_samples(self):
+        samples = {}
+        for line in self.metrics.to_text().split("\n"):
+            if line and not line.startswith("#"):
+                name, value = line.rsplit(" ", 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_samples(self):
+        """Test metric values."""
+        samples = self._get_samples()
+        self.assertGreater(
+            samples['innoconv_phase_duration_seconds{phase="convert"}'], 0
+        )
+        self.assertGreater(samples["innoconv_build_duration_seconds"], 0)
+        expected = {
+            "innoconv_files_converted_total": 3,
+            "innoconv_files_skipped_total": 1,
+            'innoconv_tool_calls_total{tool="pandoc"}': 2,
+            "innoconv_tikz_cache_hits_total": 1,
+            "innoconv_tikz_cache_misses_total": 1,
+            "innoconv_static_bytes_copied_total": 10,
+            "innoconv_static_bytes_skipped_total": 20,
+            "innoconv_output_bytes_total": 205,
+            "innoconv_outputs_written_total": 3,
+            "innoconv_outputs_unchanged_total": 3,
+            "innoconv_exit_code": 11,
+            "innoconv_last_run_timestamp_seconds": 1234.5,
+        }
+        for name, value in expected.items():
+            with self.subTest(name):
+                self.assertEqual(samples[name], value)
+
+    def test_format(self):
+        """Ensure every metric has help and type lines."""
+        lines = self.metrics.to_text().split("\n")
+        self.assertIn("# TYPE innoconv_files_converted_total counter", lines)
+        self.assertIn("# TYPE innoconv_exit_code gauge", lines)
+        for line in lines:
+            if line.startswith("# HELP"):
+                self.assertEqual(len(line.split(" ", 3)), 4)
+        self.assertEqual(lines[-1], "")
+
+    def test_escape_labels(self):
+        """Ensure label values are escaped."""
+        metrics = Metrics()
+        add_recorder(metrics)
+        try:
+            with span("subprocess", 'foo "bar"\\'):
+                pass
+        finally:
+            remove_recorder(metrics)
+        self.assertIn(
+            'innoconv_tool_calls_total{tool="foo \\"bar\\"\\\\"} 1', metrics.to_text()
+        )
+
+    def test_write(self):
+        """Test writing the metrics file."""
+        with TemporaryDirectory() as tmp_dir:
+            path = join(tmp_dir, "innoconv.prom")
+            self.metrics.write(path)
+            with open(path, encoding="utf-8") as metrics_file:
+                self.assertEqual(metrics_file.read(), self.metrics.to_text())
+            self.assertEqual(listdir(tmp_dir), ["innoconv.prom"])
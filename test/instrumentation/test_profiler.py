@@ -0,0 +1,102 @@
+"""Unit tests for innoconv.instrumentation.profiler."""
+
+from os.path import join
+import pstats
+from tempfile import TemporaryDirectory
+import unittest
+
+from innoconv.instrumentation import add_recorder, remove_recorder, span
+from innoconv.instrumentation.profiler import COLLAPSED_SUFFIX, Profiler
+
+
+def outside():
+    """Do some work outside of the profiled phase."""
+    return sum(range(1000))
+
+
+def inner():
+    """Do some work."""
+    return sum(i * i for i in range(20000))
+
+
+def outer():
+    """Call inner function."""
+    return inner() + inner()
+
+
+def run(profiler):
+    """Simulate a run with extension events."""
+    add_recorder(profiler)
+    try:
+        with span("runner", "run"):
+            outside()
+            with span("runner", "convert"):
+                with span("extension", "foo.post_process_file"):
+                    outer()
+                with span("extension", "bar.post_process_file"):
+                    inner()
+    finally:
+        remove_recorder(profiler)
+
+
+def get_function_names(profiler):
+    """Return names of all profiled functions."""
+    return {name for _, _, name in profiler.get_stats()}
+
+
+class TestProfiler(unittest.TestCase):
+    """Test the Profiler recorder."""
+
+    def test_whole_run(self):
+        """Ensure the whole run is profiled by default."""
+        profiler = Profiler()
+        run(profiler)
+        self.assertTrue({"outside", "outer", "inner"} <= get_function_names(profiler))
+
+    def test_phase(self):
+        """Ensure profiling can be limited to an extension event."""
+        profiler = Profiler("post_process_file")
+        run(profiler)
+        names = get_function_names(profiler)
+        self.assertTrue({"outer", "inner"} <= names)
+        self.assertNotIn("outside", names)
+
+    def test_nested_phase(self):
+        """Ensure nested spans of a phase don't stop profiling early."""
+        profiler = Profiler("convert")
+        run(profiler)
+        names = get_function_names(profiler)
+        self.assertTrue({"outer", "inner"} <= names)
+        self.assertNotIn("outside", names)
+
+    def test_empty(self):
+        """Ensure an unmatched phase results in empty data."""
+        profiler = Profiler("bogus")
+        run(profiler)
+        self.assertEqual(profiler.get_stats(), {})
+        self.assertEqual(profiler.collapsed_stacks(), [])
+
+    def test_collapsed_stacks(self):
+        """Test collapsed stacks."""
+        profiler = Profiler("post_process_file")
+        run(profiler)
+        stacks = {}
+        for line in profiler.collapsed_stacks():
+            frames, value = line.rsplit(" ", 1)
+            stacks[tuple(frames.split(";"))] = int(value)
+            self.assertGreaterEqual(int(value), 1)
+        roots = {stack[0].split(" ")[0] for stack in stacks}
+        self.assertTrue({"outer", "inner"} <= roots)
+        self.assertIn("genexpr", ";".join(max(stacks, key=stacks.get)))
+
+    def test_write(self):
+        """Test writing pstats data and collapsed stacks."""
+        profiler = Profiler()
+        run(profiler)
+        with TemporaryDirectory() as tmp_dir:
+            path = join(tmp_dir, "innoconv.prof")
+            profiler.write(path)
+            stats = pstats.Stats(path)
+            self.assertTrue(stats.total_calls)
+            with open(f"{path}{COLLAPSED_SUFFIX}", encoding="utf-8") as stacks:
+                self.assertTrue(stacks.read())
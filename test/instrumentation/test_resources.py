@@ -0,0 +1,114 @@
+"""Unit tests for innoconv.instrumentation.resources."""
+
+import subprocess
+import sys
+import unittest
+from unittest.mock import patch
+
+from innoconv.instrumentation import add_recorder, remove_recorder, span
+from innoconv.instrumentation.resources import (
+    MeasuredPopen,
+    NO_FILE,
+    ResourceUsage,
+    Usage,
+)
+
+BUSY_CMD = [sys.executable, "-c", "sum(range(2000000)); b = bytearray(2**25)"]
+IDLE_CMD = [sys.executable, "-c", "pass"]
+# larger than the test process (forked memory counts for the child on Linux)
+BIG_CMD = [sys.executable, "-c", "b = bytearray(2**28)"]
+
+
+def run_tool(name):
+    """Run a subprocess that burns some CPU and memory."""
+    with span("subprocess", name):
+        subprocess.run(BUSY_CMD, check=True)
+
+
+class TestResourceUsage(unittest.TestCase):
+    """Test the ResourceUsage recorder."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Run tools inside and outside of files."""
+        cls.usage = ResourceUsage()
+        add_recorder(cls.usage)
+        try:
+            with span("file", "en/content.md", "en/content.md"):
+                run_tool("pandoc")
+            with span("file", "de/content.md", "de/content.md"):
+                run_tool("pandoc")
+            with span("extension", "tikz2svg.finish"):
+                run_tool("pdflatex")
+        finally:
+            remove_recorder(cls.usage)
+
+    def test_per_tool(self):
+        """Test aggregation per tool."""
+        per_tool = dict(self.usage.per_tool())
+        self.assertEqual(set(per_tool), {"pandoc", "pdflatex"})
+        pandoc = per_tool["pandoc"]
+        self.assertEqual(pandoc.calls, 2)
+        self.assertGreater(pandoc.wall, 0)
+        self.assertGreater(pandoc.user + pandoc.system, 0)
+        self.assertGreater(pandoc.max_rss, 2**25)
+
+    def test_per_file(self):
+        """Test aggregation per source file."""
+        per_file = dict(self.usage.per_file())
+        self.assertEqual(set(per_file), {"en/content.md", "de/content.md", NO_FILE})
+        self.assertEqual(per_file["en/content.md"].calls, 1)
+
+    def test_report(self):
+        """Test the summary table."""
+        report = self.usage.report(1)
+        self.assertIn("pandoc", report)
+        self.assertIn("pdflatex", report)
+        self.assertIn("MiB", report)
+        files = report.split("Most expensive files")[1].strip().split("\n")
+        self.assertEqual(len(files), 2)
+
+    def test_to_json(self):
+        """Test usage of single invocations."""
+        records = self.usage.to_json()
+        self.assertEqual(len(records), 3)
+        self.assertEqual(records[0]["tool"], "pandoc")
+        self.assertEqual(records[0]["path"], "en/content.md")
+        self.assertEqual(records[0]["calls"], 1)
+
+    def test_measured_popen(self):
+        """Ensure usage of each invocation is measured separately."""
+        usage = ResourceUsage()
+        add_recorder(usage)
+        try:
+            for name, cmd in (("big", BIG_CMD), ("idle", IDLE_CMD)):
+                with span("subprocess", name) as current, MeasuredPopen(
+                    cmd, span=current
+                ) as proc:
+                    proc.wait()
+        finally:
+            remove_recorder(usage)
+        per_tool = dict(usage.per_tool())
+        # previously the idle tool reported the peak of the big one
+        self.assertGreater(per_tool["big"].max_rss, 2**28)
+        self.assertLess(per_tool["idle"].max_rss, 2**28)
+
+    @patch("innoconv.instrumentation.resources.resource", None)
+    def test_unavailable(self):
+        """Ensure a RuntimeError is raised without resource module."""
+        with self.assertRaises(RuntimeError):
+            ResourceUsage()
+
+
+class TestUsage(unittest.TestCase):
+    """Test accumulation of resource usage."""
+
+    def test_add(self):
+        """Test times are summed up and maximum RSS is kept."""
+        usage = Usage()
+        usage.add(Usage(1, 1.0, 0.5, 0.25, 100))
+        usage.add(Usage(1, 2.0, 1.0, 0.5, 50))
+        self.assertEqual(
+            usage.to_json(),
+            {"calls": 2, "wall": 3.0, "user": 1.5, "system": 0.75, "max_rss": 100},
+        )
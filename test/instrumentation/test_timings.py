@@ -0,0 +1,88 @@
+"""Unit tests for innoconv.instrumentation.timings."""
+
+import unittest
+
+from innoconv.instrumentation import Span
+from innoconv.instrumentation.timings import Timings
+
+
+def make_span(category, name, path, wall, cpu, **args):
+    """Create a finished span."""
+    span = Span(category, name, path, args)
+    span.wall = wall
+    span.cpu = cpu
+    return span
+
+
+class TestTimings(unittest.TestCase):
+    """Test the Timings recorder."""
+
+    def setUp(self):
+        """Record a couple of spans."""
+        self.timings = Timings()
+        spans = (
+            make_span("extension", "foo.post_process_file", "a.md", 1.0, 0.5),
+            make_span("extension", "foo.post_process_file", "b.md", 2.0, 1.5),
+            make_span("extension", "bar.pre_process_file", "a.md", 0.5, 0.5),
+            make_span("pandoc", "pandoc", "a.md", 0.2, 0.1),
+            make_span("extension", "baz.element_hooks", "a.md", 0.1, 0.1, calls=42),
+            make_span("subprocess", "pdflatex", "a.md", 1.5, 0.0),
+            make_span("subprocess", "pdflatex", "b.md", 2.5, 0.0),
+            make_span("file", "a.md", "a.md", 2.0, 1.0),
+            make_span("file", "b.md", "b.md", 3.0, 2.0),
+            make_span("runner", "run", None, 5.0, 3.0),
+        )
+        for span in spans:
+            self.timings.span_started(span)
+            self.timings.span_finished(span)
+
+    def test_slowest_files(self):
+        """Test files are sorted by wall time."""
+        self.assertEqual(
+            self.timings.slowest_files(10), [("b.md", 3.0, 2.0), ("a.md", 2.0, 1.0)]
+        )
+        self.assertEqual(self.timings.slowest_files(1), [("b.md", 3.0, 2.0)])
+
+    def test_slowest_events(self):
+        """Test extension events are summed up over files."""
+        self.assertEqual(
+            self.timings.slowest_events(10),
+            [
+                ("foo.post_process_file", 2, 3.0, 2.0),
+                ("bar.pre_process_file", 1, 0.5, 0.5),
+                ("baz.element_hooks", 42, 0.1, 0.1),
+            ],
+        )
+
+    def test_tool_times(self):
+        """Test pandoc and external tools are summed up."""
+        self.assertEqual(
+            self.timings.tool_times(),
+            [("pandoc + decoding", 1, 0.2, 0.1), ("pdflatex", 2, 4.0, 0.0)],
+        )
+
+    def test_report(self):
+        """Test the summary table."""
+        report = self.timings.report(1)
+        self.assertIn("b.md", report)
+        self.assertNotIn("a.md", report)
+        self.assertIn("foo.post_process_file", report)
+        self.assertNotIn("bar.pre_process_file", report)
+        self.assertIn("pandoc + decoding", report)
+        self.assertIn("pdflatex", report)
+
+    def test_to_json(self):
+        """Ensure all recorded spans are returned."""
+        records = self.timings.to_json()
+        self.assertEqual(len(records), 9)
+        self.assertEqual(
+            records[3],
+            {
+                "category": "pandoc",
+                "name": "pandoc",
+                "path": "a.md",
+                "wall": 0.2,
+                "cpu": 0.1,
+                "calls": 1,
+            },
+        )
@@ -0,0 +1,65 @@
+"""Unit tests for innoconv.instrumentation.trace."""
+
+import json
+from os.path import join
+from tempfile import TemporaryDirectory
+import threading
+import unittest
+
+from innoconv.instrumentation import add_recorder, remove_recorder, span
+from innoconv.instrumentation.trace import Trace
+
+
+class TestTrace(unittest.TestCase):
+    """Test the Trace recorder."""
+
+    def setUp(self):
+        """Record nested spans in two threads."""
+        self.trace = Trace()
+        add_recorder(self.trace)
+        try:
+            with span("runner", "run"):
+                with span("subprocess", "pandoc", "en/content.md", foo="bar"):
+                    pass
+                thread = threading.Thread(
+                    target=self._worker, name="worker-1", daemon=True
+                )
+                thread.start()
+                thread.join()
+        finally:
+            remove_recorder(self.trace)
+
+    @staticmethod
+    def _worker():
+        with span("file", "de/content.md"):
+            pass
+
+    def test_events(self):
+        """Test complete events."""
+        events = self.trace.to_json()["traceEvents"]
+        complete = {e["name"]: e for e in events if e["ph"] == "X"}
+        self.assertEqual(set(complete), {"run", "pandoc", "de/content.md"})
+
+        run, pandoc = complete["run"], complete["pandoc"]
+        self.assertEqual(pandoc["cat"], "subprocess")
+        self.assertEqual(pandoc["args"]["path"], "en/content.md")
+        self.assertEqual(pandoc["args"]["foo"], "bar")
+        self.assertIn("cpu_ms", pandoc["args"])
+        self.assertLessEqual(run["ts"], pandoc["ts"])
+        self.assertGreaterEqual(run["ts"] + run["dur"], pandoc["ts"] + pandoc["dur"])
+        self.assertEqual(run["tid"], pandoc["tid"])
+        self.assertNotEqual(run["tid"], complete["de/content.md"]["tid"])
+
+    def test_thread_names(self):
+        """Ensure every thread gets a named track."""
+        events = self.trace.to_json()["traceEvents"]
+        names = [e["args"]["name"] for e in events if e["name"] == "thread_name"]
+        self.assertEqual(sorted(names), ["MainThread", "worker-1"])
+
+    def test_write(self):
+        """Test writing the trace file."""
+        with TemporaryDirectory() as tmp_dir:
+            path = join(tmp_dir, "trace.json")
+            self.trace.write(path)
+            with open(path, encoding="utf-8") as trace_file:
+                self.assertEqual(json.load(trace_file), self.trace.to_json())
@@ -1,9 +1,13 @@
 """Unit tests for the innoconv command-line interface."""
 
+import json
 import logging
+import os
 from os.path import join, realpath
+from tempfile import TemporaryDirectory
+import tracemalloc
 import unittest
-from unittest.mock import call, patch
+from unittest.mock import ANY, call, patch
 
 from click.testing import CliRunner
 from yaml import YAMLError
@@ -12,15 +16,23 @@ from innoconv.cli import cli
 from innoconv.constants import DEFAULT_EXTENSIONS, LOG_FORMAT
 from innoconv.manifest import Manifest
 
-
 MANIFEST = Manifest(data={"title": "Foo title", "languages": ["en"], "min_score": 80})
 
 
-@patch("innoconv.cli.Manifest.from_directory", side_effect=(MANIFEST,))
-@patch("os.path.exists", return_value=False)
-@patch("innoconv.cli.InnoconvRunner.run")
-@patch("innoconv.cli.InnoconvRunner.__init__", return_value=None)
-@patch("innoconv.cli.coloredlogs.install")
+def patch_cli(cls):
+    """Patch manifest, output directory check and runner for CLI tests."""
+    for patcher in (
+        patch("innoconv.cli.coloredlogs.install"),
+        patch("innoconv.cli.InnoconvRunner.__init__", return_value=None),
+        patch("innoconv.cli.InnoconvRunner.run"),
+        patch("os.path.exists", return_value=False),
+        patch("innoconv.cli.Manifest.from_directory", side_effect=(MANIFEST,)),
+    ):
+        cls = patcher(cls)
+    return cls
+
+
+@patch_cli
 class TestCLI(unittest.TestCase):
     """Test the command-line interface argument parsing."""
 
@@ -30,6 +42,7 @@ class TestCLI(unittest.TestCase):
         result = runner.invoke(cli, "--help")
         self.assertIs(result.exit_code, 0)
         self.assertIn("Usage: ", result.output)
+        self.assertIn(" join_strings ", result.output)
 
     def test_defaults(self, coloredlogs_install, runner_init, run, *__):
         """Test the default arguments."""
@@ -46,6 +59,11 @@ class TestCLI(unittest.TestCase):
                 realpath(join(".", "innoconv_output")),
                 MANIFEST,
                 list(DEFAULT_EXTENSIONS),
+                stream=False,
+                depgraph=ANY,
+                languages=None,
+                only=None,
+                keep_going=False,
             ),
         )
         self.assertEqual(run.call_args_list, [call()])
@@ -73,6 +91,11 @@ class TestCLI(unittest.TestCase):
                 realpath(join(".", "my_custom_output_dir")),
                 MANIFEST,
                 list(DEFAULT_EXTENSIONS),
+                stream=False,
+                depgraph=ANY,
+                languages=None,
+                only=None,
+                keep_going=False,
             ),
         )
 
@@ -111,6 +134,11 @@ class TestCLI(unittest.TestCase):
                 realpath(join(".", "innoconv_output")),
                 MANIFEST,
                 ["join_strings", "copy_static"],
+                stream=False,
+                depgraph=ANY,
+                languages=None,
+                only=None,
+                keep_going=False,
             ),
         )
 
@@ -126,3 +154,296 @@ class TestCLI(unittest.TestCase):
         runner = CliRunner()
         result = runner.invoke(cli, ".")
         self.assertIsNot(result.exit_code, 0)
+
+
+@patch_cli
+class TestCLIBuildOptions(unittest.TestCase):
+    """Test options of incremental, partial and streaming builds."""
+
+    def test_stream(self, _, runner_init, *__):
+        """Test the stream flag."""
+        runner = CliRunner()
+        result = runner.invoke(cli, "--stream .")
+        self.assertIs(result.exit_code, 0)
+        self.assertTrue(runner_init.call_args[1]["stream"])
+
+    @patch("innoconv.cli.DependencyGraph.has_previous", True)
+    @patch(
+        "innoconv.cli.InnoconvRunner.plan",
+        return_value={"en/content.json": "changed: en/content.md"},
+    )
+    def test_plan(self, _, __, ___, run, *____):
+        """Test the plan flag (dry run)."""
+        runner = CliRunner()
+        result = runner.invoke(cli, "--plan .")
+        self.assertIs(result.exit_code, 0)
+        self.assertEqual(
+            result.output,
+            "1 outputs need to be rebuilt or removed:\n"
+            " en/content.json (changed: en/content.md)\n",
+        )
+        self.assertFalse(run.called)
+
+    @patch("innoconv.cli.DependencyGraph.has_previous", True)
+    @patch("innoconv.cli.InnoconvRunner.plan", return_value={})
+    def test_plan_up_to_date(self, *_):
+        """Test the plan flag with an up-to-date output."""
+        runner = CliRunner()
+        result = runner.invoke(cli, "--plan .")
+        self.assertIs(result.exit_code, 0)
+        self.assertEqual(result.output, "Output is up to date.\n")
+
+    @patch("innoconv.cli.InnoconvRunner.plan", return_value={})
+    def test_plan_no_previous_build(self, *_):
+        """Test the plan flag without a previous build."""
+        runner = CliRunner()
+        result = runner.invoke(cli, "--plan .")
+        self.assertIs(result.exit_code, 0)
+        self.assertIn("No previous build found", result.output)
+
+    @patch("innoconv.cli.InnoconvRunner.plan", side_effect=RuntimeError)
+    def test_plan_failure(self, *_):
+        """Test failing plan."""
+        runner = CliRunner()
+        result = runner.invoke(cli, "--plan .")
+        self.assertIs(result.exit_code, 11)
+
+    def test_partial(self, _, runner_init, *__):
+        """Test partial build arguments."""
+        runner = CliRunner()
+        result = runner.invoke(cli, "--only chapter-1 --languages en,de .")
+        self.assertIs(result.exit_code, 0)
+        self.assertEqual(runner_init.call_args[1]["only"], "chapter-1")
+        self.assertEqual(runner_init.call_args[1]["languages"], ["en", "de"])
+
+    def test_keep_going(self, _, runner_init, *__):
+        """Test the keep-going flag."""
+        runner = CliRunner()
+        result = runner.invoke(cli, "--keep-going .")
+        self.assertIs(result.exit_code, 0)
+        self.assertTrue(runner_init.call_args[1]["keep_going"])
+
+    @patch("innoconv.cli.DependencyGraph.load")
+    @patch("innoconv.cli.get_changed_files", return_value={"en/content.md"})
+    def test_since(self, get_changed_files, load, *_):
+        """Test passing files changed since a git revision."""
+        runner = CliRunner()
+        result = runner.invoke(cli, "--since HEAD~1 .")
+        self.assertIs(result.exit_code, 0)
+        self.assertEqual(get_changed_files.call_args, call(realpath("."), "HEAD~1"))
+        self.assertEqual(load.call_args[0][2], {"en/content.md"})
+
+    @patch("innoconv.cli.DependencyGraph.load")
+    def test_resume(self, load, _, __, run, mock_exists, *___):
+        """Test resuming an interrupted build (without --force)."""
+        mock_exists.return_value = True
+        runner = CliRunner()
+        result = runner.invoke(cli, "--resume .")
+        self.assertIs(result.exit_code, 0)
+        self.assertEqual(load.call_args[0][3], True)
+        self.assertTrue(run.called)
+
+    @patch("innoconv.cli.DependencyGraph.load")
+    def test_full(self, load, _, runner_init, *__):
+        """Ensure the previous build is ignored for a full build."""
+        runner = CliRunner()
+        result = runner.invoke(cli, "--full .")
+        self.assertIs(result.exit_code, 0)
+        self.assertFalse(load.called)
+        self.assertFalse(runner_init.call_args[1]["depgraph"].has_previous)
+
+    def test_full_conflicts(self, *args):
+        """Ensure a full build can't be combined with incremental options."""
+        *_, manifest_from_dir = args
+        manifest_from_dir.side_effect = None
+        manifest_from_dir.return_value = MANIFEST
+        runner = CliRunner()
+        for args in ("--since HEAD", "--resume", "--only chapter-1", "--languages en"):
+            with self.subTest(args):
+                result = runner.invoke(cli, f"--full {args} .")
+                self.assertIs(result.exit_code, 2)
+                self.assertIn("Can't be combined", result.output)
+
+    @patch("innoconv.cli.get_changed_files", side_effect=RuntimeError("Bad rev"))
+    def test_since_failure(self, *_):
+        """Ensure an unknown revision is reported."""
+        runner = CliRunner()
+        result = runner.invoke(cli, "--since bogus .")
+        self.assertIs(result.exit_code, 2)
+        self.assertIn("Bad rev", result.output)
+
+
+@patch_cli
+class TestCLIInstrumentation(unittest.TestCase):
+    """Test instrumentation options."""
+
+    def test_timings(self, *_):
+        """Test the timings flag."""
+        runner = CliRunner()
+        result = runner.invoke(cli, "--timings .")
+        self.assertIs(result.exit_code, 0)
+        self.assertIn("Slowest files", result.output)
+        self.assertIn("Slowest extension events", result.output)
+
+    def test_timings_file(self, *_):
+        """Test writing timings to a JSON file."""
+        runner = CliRunner()
+        with TemporaryDirectory() as tmp_dir:
+            path = join(tmp_dir, "timings.json")
+            result = runner.invoke(cli, ["--timings-file", path, "."])
+            self.assertIs(result.exit_code, 0)
+            with open(path, encoding="utf-8") as timings_file:
+                self.assertEqual(json.load(timings_file), [])
+        self.assertNotIn("Slowest files", result.output)
+
+    def test_timings_runner_failure(self, _, run, *__):
+        """Ensure timings are reported if the runner fails."""
+        run.side_effect = (RuntimeError,)
+        runner = CliRunner()
+        result = runner.invoke(cli, "--timings .")
+        self.assertIsNot(result.exit_code, 0)
+        self.assertIn("Slowest files", result.output)
+
+    def test_resource_usage(self, *_):
+        """Test the resource usage flag."""
+        runner = CliRunner()
+        result = runner.invoke(cli, "--resource-usage .")
+        self.assertIs(result.exit_code, 0)
+        self.assertIn("External tools", result.output)
+
+    @patch("innoconv.instrumentation.resources.resource", None)
+    def test_resource_usage_unavailable(self, *_):
+        """Ensure failure if resource usage is not available."""
+        runner = CliRunner()
+        result = runner.invoke(cli, "--resource-usage .")
+        self.assertIsNot(result.exit_code, 0)
+
+    def test_memory_report(self, *_):
+        """Test the memory report flag."""
+        runner = CliRunner()
+        result = runner.invoke(cli, "--memory-report .")
+        self.assertIs(result.exit_code, 0)
+        self.assertIn("Memory retained by extensions", result.output)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_metrics_file(self, _, run, *__):
+        """Test writing a metrics file."""
+        run.side_effect = (RuntimeError,)
+        runner = CliRunner()
+        with TemporaryDirectory() as tmp_dir:
+            path = join(tmp_dir, "innoconv.prom")
+            result = runner.invoke(cli, ["--metrics-file", path, "."])
+            self.assertIsNot(result.exit_code, 0)
+            with open(path, encoding="utf-8") as metrics_file:
+                self.assertIn(
+                    f"innoconv_exit_code {result.exit_code}\n", metrics_file.read()
+                )
+
+    def test_metrics_file_value_error(self, _, run, *__):
+        """Ensure metrics are written if the runner fails with a ValueError."""
+        run.side_effect = (ValueError("No title"),)
+        runner = CliRunner()
+        with TemporaryDirectory() as tmp_dir:
+            path = join(tmp_dir, "innoconv.prom")
+            result = runner.invoke(cli, ["--metrics-file", path, "."])
+            self.assertEqual(result.exit_code, 11)
+            with open(path, encoding="utf-8") as metrics_file:
+                self.assertIn("innoconv_exit_code 11\n", metrics_file.read())
+
+    def test_metrics_file_unexpected_error(self, _, run, *__):
+        """Ensure metrics are written if the runner fails unexpectedly."""
+        run.side_effect = (KeyError("foo"),)
+        runner = CliRunner()
+        with TemporaryDirectory() as tmp_dir:
+            path = join(tmp_dir, "innoconv.prom")
+            result = runner.invoke(cli, ["--metrics-file", path, "."])
+            self.assertIsInstance(result.exception, KeyError)
+            with open(path, encoding="utf-8") as metrics_file:
+                self.assertIn("innoconv_exit_code 11\n", metrics_file.read())
+
+    def _get_events(self, run, error):
+        run.side_effect = (error,)
+        runner = CliRunner()
+        result = runner.invoke(cli, "--events ndjson --timings .")
+        self.assertIsNot(result.exit_code, 0)
+        self.assertNotIn("build_finished", result.stdout)
+        self.assertIn("Slowest files", result.stdout)
+        events = [
+            json.loads(line) for line in result.stderr.split("\n") if line[:1] == "{"
+        ]
+        self.assertEqual(events[1]["event"], "build_finished")
+        self.assertEqual(events[1]["status"], "failed")
+        self.assertEqual(events[1]["exit_code"], 11)
+        return events
+
+    def test_events(self, _, run, *__):
+        """Test the event stream on stderr."""
+        events = self._get_events(run, ValueError("Foo"))
+        self.assertEqual(events[0], {**events[0], "event": "error", "message": "Foo"})
+
+    def test_events_unexpected_error(self, _, run, *__):
+        """Ensure unexpected errors are reported as events."""
+        events = self._get_events(run, KeyError("Foo"))
+        self.assertEqual(events[0]["event"], "error")
+        self.assertEqual(events[0]["message"], "KeyError('Foo')")
+
+    def test_events_success(self, *_):
+        """Test the final event of a successful build."""
+        runner = CliRunner()
+        result = runner.invoke(cli, "--events ndjson .")
+        self.assertIs(result.exit_code, 0)
+        event = json.loads(result.stderr)
+        self.assertEqual(event["event"], "build_finished")
+        self.assertEqual(event["status"], "success")
+        self.assertEqual(event["exit_code"], 0)
+
+    def test_events_fd(self, *_):
+        """Test the event stream on a file descriptor."""
+        read_fd, write_fd = os.pipe()
+        try:
+            runner = CliRunner()
+            result = runner.invoke(cli, f"--events ndjson --events-fd {write_fd} .")
+            self.assertIs(result.exit_code, 0)
+            self.assertEqual(result.output, "")
+            os.close(write_fd)
+            with os.fdopen(read_fd, encoding="utf-8") as read_file:
+                event = json.loads(read_file.readline())
+        except BaseException:
+            os.close(read_fd)
+            raise
+        self.assertEqual(event["event"], "build_finished")
+
+    def test_events_fd_invalid(self, *_):
+        """Ensure failure for invalid file descriptors."""
+        runner = CliRunner()
+        for args in ("--events-fd 1 .", "--events ndjson --events-fd 9999 ."):
+            with self.subTest(args):
+                result = runner.invoke(cli, args)
+                self.assertIsNot(result.exit_code, 0)
+
+    def test_trace(self, *_):
+        """Test writing a trace file."""
+        runner = CliRunner()
+        with TemporaryDirectory() as tmp_dir:
+            path = join(tmp_dir, "trace.json")
+            result = runner.invoke(cli, ["--trace", path, "."])
+            self.assertIs(result.exit_code, 0)
+            with open(path, encoding="utf-8") as trace_file:
+                self.assertIn("traceEvents", json.load(trace_file))
+
+    def test_profile(self, *_):
+        """Test writing profiling data."""
+        runner = CliRunner()
+        with TemporaryDirectory() as tmp_dir:
+            path = join(tmp_dir, "innoconv.prof")
+            args = ["--profile", path, "--profile-phase", "post_process_file", "."]
+            result = runner.invoke(cli, args)
+            self.assertIs(result.exit_code, 0)
+            self.assertTrue(os.path.isfile(path))
+            self.assertTrue(os.path.isfile(f"{path}.collapsed"))
+
+    def test_profile_phase_without_profile(self, *_):
+        """Ensure profile phase requires profile option."""
+        runner = CliRunner()
+        result = runner.invoke(cli, "--profile-phase post_process_file .")
+        self.assertIsNot(result.exit_code, 0)
@@ -0,0 +1,278 @@
+"""Unit tests for innoconv.depgraph."""
+
+import json
+import os
+from os.path import exists, join
+from subprocess import run
+from tempfile import TemporaryDirectory
+import unittest
+from unittest.mock import patch
+
+from innoconv.constants import BUILD_STATE_FOLDER, DEPGRAPH_FILENAME, JOURNAL_FILENAME
+from innoconv.depgraph import DependencyGraph, get_changed_files, hash_value
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as out_file:
+        out_file.write(content)
+
+
+class DependencyGraphTestCase(unittest.TestCase):
+    """Base class with a single recorded output."""
+
+    def setUp(self):
+        """Create source and output directory with a single output."""
+        self._tmp_dir = TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.source_dir = join(self._tmp_dir.name, "source")
+        self.output_dir = join(self._tmp_dir.name, "output")
+        _write(join(self.source_dir, "en", "content.md"), "# Foo")
+        _write(join(self.output_dir, "en", "content.json"), "[]")
+        self._build()
+
+    def tearDown(self):
+        """Remove directories."""
+        self._tmp_dir.cleanup()
+
+    def _build(self, preamble="", output="en/content.json"):
+        graph = DependencyGraph.load(self.source_dir, self.output_dir)
+        graph.set_value("preamble", preamble)
+        graph.record(
+            join(self.output_dir, output),
+            (join(self.source_dir, "en", "content.md"),),
+            ("preamble",),
+        )
+        graph.save()
+        return graph
+
+    def _load(self, preamble=""):
+        graph = DependencyGraph.load(self.source_dir, self.output_dir)
+        graph.set_value("preamble", preamble)
+        return graph
+
+
+class TestDependencyGraph(DependencyGraphTestCase):
+    """Test recording and checking dependencies."""
+
+    def test_up_to_date(self):
+        """Test an unchanged build."""
+        graph = self._load()
+        self.assertTrue(graph.has_previous)
+        self.assertIsNone(graph.check("en/content.json"))
+        self.assertTrue(
+            graph.is_up_to_date("en/content.json", ("en/content.md",), ("preamble",))
+        )
+        self.assertEqual(graph.plan({}), {})
+
+    def test_hash_reused(self):
+        """Ensure unchanged files are not hashed again."""
+        graph = self._load()
+        with patch("innoconv.depgraph.hash_file") as hash_file:
+            self.assertIsNone(graph.check("en/content.json"))
+        self.assertFalse(hash_file.called)
+
+    def test_file_changed(self):
+        """Test a changed source file."""
+        _write(join(self.source_dir, "en", "content.md"), "# Bar baz")
+        graph = self._load()
+        self.assertEqual(graph.check("en/content.json"), "changed: en/content.md")
+        self.assertEqual(
+            graph.plan({"en/content.json": (("en/content.md",), ("preamble",))}),
+            {"en/content.json": "changed: en/content.md"},
+        )
+
+    def test_file_touched(self):
+        """Test a source file with new modification time but same content."""
+        os.utime(join(self.source_dir, "en", "content.md"), ns=(0, 0))
+        self.assertIsNone(self._load().check("en/content.json"))
+
+    def test_file_removed(self):
+        """Test a removed source file."""
+        os.remove(join(self.source_dir, "en", "content.md"))
+        self.assertEqual(
+            self._load().plan({}), {"en/content.json": "removed: en/content.md"}
+        )
+
+    def test_file_added(self):
+        """Test a source file that didn't exist when the output was built."""
+        graph = DependencyGraph.load(self.source_dir, self.output_dir)
+        inputs = ("en/content.md", "en/_static/foo.png")
+        graph.record("en/content.json", inputs)
+        graph.save()
+        self.assertIsNone(self._load().check("en/content.json"))
+        _write(join(self.source_dir, "en", "_static", "foo.png"), "PNG")
+        self.assertEqual(
+            self._load().check("en/content.json"), "added: en/_static/foo.png"
+        )
+
+    def test_value_changed(self):
+        """Test a changed value."""
+        graph = self._load(preamble=r"\usepackage{foo}")
+        self.assertEqual(graph.check("en/content.json"), "changed: preamble")
+
+    def test_dependencies_changed(self):
+        """Test an output with different dependencies."""
+        graph = self._load()
+        self.assertEqual(
+            graph.check("en/content.json", ("en/content.md",), ()),
+            "dependencies changed",
+        )
+
+    def test_new_output(self):
+        """Test an output that wasn't built before."""
+        graph = self._load()
+        self.assertEqual(graph.check("de/content.json", ("en/content.md",)), "new")
+
+    def test_output_missing(self):
+        """Test an output that was deleted."""
+        os.remove(join(self.output_dir, "en", "content.json"))
+        self.assertEqual(self._load().check("en/content.json"), "output missing")
+
+    def test_changed_files(self):
+        """Ensure only files known to have changed are hashed again."""
+        _write(join(self.source_dir, "en", "content.md"), "# Bar baz")
+        graph = DependencyGraph.load(self.source_dir, self.output_dir, set())
+        graph.set_value("preamble", "")
+        self.assertIsNone(graph.check("en/content.json"))
+        graph = DependencyGraph.load(
+            self.source_dir, self.output_dir, {"en/content.md"}
+        )
+        graph.set_value("preamble", "")
+        self.assertEqual(graph.check("en/content.json"), "changed: en/content.md")
+
+
+class TestDependencyGraphState(DependencyGraphTestCase):
+    """Test storing and loading the graph and removing stale outputs."""
+
+    def test_remove_stale_outputs(self):
+        """Test removing outputs that weren't built again."""
+        _write(join(self.output_dir, "en", "old.json"), "[]")
+        self._build(output="en/old.json")
+        graph = self._load()
+        graph.record("en/content.json", ("en/content.md",), ("preamble",))
+        self.assertEqual(graph.remove_stale_outputs(), ["en/old.json"])
+        self.assertFalse(exists(join(self.output_dir, "en", "old.json")))
+
+    def test_remove_empty_folders(self):
+        """Ensure folders of removed outputs are removed if they're empty."""
+        _write(join(self.output_dir, "en", "a", "b", "content.json"), "[]")
+        self._build(output="en/a/b/content.json")
+        graph = self._load()
+        graph.record("en/content.json", ("en/content.md",), ("preamble",))
+        self.assertEqual(graph.remove_stale_outputs(), ["en/a/b/content.json"])
+        self.assertFalse(exists(join(self.output_dir, "en", "a")))
+        self.assertTrue(exists(join(self.output_dir, "en", "content.json")))
+
+    def test_save(self):
+        """Test stored graph."""
+        path = join(self.output_dir, BUILD_STATE_FOLDER, DEPGRAPH_FILENAME)
+        with open(path, encoding="utf-8") as in_file:
+            data = json.load(in_file)
+        self.assertEqual(
+            data["outputs"],
+            {"en/content.json": {"inputs": ["en/content.md"], "values": ["preamble"]}},
+        )
+        self.assertEqual(data["values"], {"preamble": hash_value("")})
+        self.assertEqual(list(data["files"]), ["en/content.md"])
+
+    def test_load_outdated(self):
+        """Ensure graphs of other innoconv versions are ignored."""
+        with patch("innoconv.depgraph.__version__", "0.0.0"):
+            self.assertFalse(self._load().has_previous)
+
+    def test_load_invalid(self):
+        """Ensure invalid graphs are ignored."""
+        path = join(self.output_dir, BUILD_STATE_FOLDER, DEPGRAPH_FILENAME)
+        _write(path, "{invalid")
+        self.assertFalse(self._load().has_previous)
+
+
+class TestDependencyGraphResume(DependencyGraphTestCase):
+    """Test resuming interrupted builds from the journal."""
+
+    def _interrupted_build(self):
+        """Start a build with a new output and a changed source, don't save it."""
+        _write(join(self.source_dir, "en", "new.md"), "# New")
+        _write(join(self.output_dir, "en", "new.json"), "[]")
+        _write(join(self.source_dir, "en", "content.md"), "# Bar baz")
+        graph = self._load()
+        graph.start_journal()
+        graph.record("en/new.json", ("en/new.md",), ("preamble",), {"title": "New"})
+        return join(self.output_dir, BUILD_STATE_FOLDER, JOURNAL_FILENAME)
+
+    def test_resume(self):
+        """Ensure completed outputs of an interrupted build are up to date."""
+        self._interrupted_build()
+        graph = DependencyGraph.load(self.source_dir, self.output_dir, resume=True)
+        graph.set_value("preamble", "")
+        self.assertTrue(graph.is_resumed)
+        self.assertIsNone(graph.check("en/new.json"))
+        self.assertEqual(graph.get_data("en/new.json"), {"title": "New"})
+        self.assertEqual(graph.check("en/content.json"), "changed: en/content.md")
+
+    def test_resume_changed_value(self):
+        """Ensure previous outputs depending on changed values are dropped."""
+        _write(join(self.source_dir, "en", "new.md"), "# New")
+        graph = self._load(preamble="changed")
+        graph.start_journal()
+        graph.record("en/new.json", ("en/new.md",), ("preamble",))
+        graph = DependencyGraph.load(self.source_dir, self.output_dir, resume=True)
+        graph.set_value("preamble", "changed")
+        self.assertEqual(graph.check("en/content.json"), "new")
+
+    def test_resume_incomplete_journal(self):
+        """Ensure an incomplete last line is ignored."""
+        path = self._interrupted_build()
+        with open(path, "a", encoding="utf-8") as out_file:
+            out_file.write('{"output": "en/')
+        graph = DependencyGraph.load(self.source_dir, self.output_dir, resume=True)
+        graph.set_value("preamble", "")
+        self.assertIsNone(graph.check("en/new.json"))
+
+    def test_no_resume(self):
+        """Ensure the journal is ignored without resuming and removed on save."""
+        path = self._interrupted_build()
+        graph = self._load()
+        self.assertFalse(graph.is_resumed)
+        self.assertEqual(graph.check("en/new.json"), "new")
+        graph.start_journal()
+        graph.save()
+        self.assertFalse(exists(path))
+
+
+class TestGetChangedFiles(unittest.TestCase):
+    """Test git-aware change detection."""
+
+    def setUp(self):
+        """Create a git repository with content in a sub folder."""
+        self._tmp_dir = TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.source_dir = join(self._tmp_dir.name, "content")
+        for path in ("en/content.md", "en/section/content.md", "de/content.md"):
+            _write(join(self.source_dir, path), "# Foo")
+        _write(join(self._tmp_dir.name, "README.md"), "Foo")
+        self._git("init", "-q")
+        self._git("add", ".")
+        self._git("-c", "user.name=A", "-c", "user.email=a@b", "commit", "-qm", "A")
+
+    def tearDown(self):
+        """Remove repository."""
+        self._tmp_dir.cleanup()
+
+    def _git(self, *args):
+        run(["git", *args], cwd=self._tmp_dir.name, check=True)
+
+    def test_changed_files(self):
+        """Test changed, removed and untracked files."""
+        _write(join(self.source_dir, "en", "content.md"), "# Bar")
+        os.remove(join(self.source_dir, "de", "content.md"))
+        _write(join(self.source_dir, "en", "new", "content.md"), "# New")
+        _write(join(self._tmp_dir.name, "README.md"), "Bar")
+        self.assertEqual(
+            get_changed_files(self.source_dir, "HEAD"),
+            {"en/content.md", "de/content.md", "en/new/content.md"},
+        )
+
+    def test_unknown_revision(self):
+        """Ensure git errors raise RuntimeError."""
+        with self.assertRaises(RuntimeError):
+            get_changed_files(self.source_dir, "bogus")
@@ -1,11 +1,19 @@
 """Unit tests for innoconv.runner."""
 
+import json
+import os
+from os.path import exists, join, relpath
+from tempfile import TemporaryDirectory
 import unittest
-from unittest.mock import call, DEFAULT, patch
+from unittest.mock import call, DEFAULT, MagicMock, Mock, patch
 
+from innoconv.constants import BUILD_STATE_FOLDER
+from innoconv.depgraph import DependencyGraph
 from innoconv.ext.abstract import AbstractExtension
+from innoconv.instrumentation import add_recorder, remove_recorder
 from innoconv.manifest import Manifest
 from innoconv.runner import InnoconvRunner
+from innoconv.utils import make_object_hook
 
 MANIFEST = Manifest(
     {
@@ -113,8 +121,22 @@ def walk_side_effect_section_differs(path):
 TITLE = "Long title"
 SHORT_TITLE = "Short"
 SECTION_TYPE = "test"
+BLOCK = {"t": "Para", "c": []}
 
 
+def stream_ast_side_effect(*_, **__):
+    """Simulate streamed conversion of a file with two blocks."""
+    context = MagicMock()
+    context.__enter__.return_value = (
+        iter([BLOCK, BLOCK]),
+        TITLE,
+        SHORT_TITLE,
+        SECTION_TYPE,
+    )
+    return context
+
+
+@patch("os.replace")
 @patch("builtins.open")
 @patch(
     "innoconv.runner.to_ast",
@@ -206,6 +228,24 @@ class TestInnoconvRunner(unittest.TestCase):
         with self.assertRaises(RuntimeError):
             self.runner.run()
 
+    def test_run_problems_reported_at_once(self, *args):
+        """Ensure all structure problems are reported before converting."""
+        _, _, walk, mock_exists, _, to_ast, *_ = args
+        walk.side_effect = walk_side_effect_section_differs
+        mock_exists.side_effect = lambda path: not path.endswith("/de/_pages/test2.md")
+        with self.assertRaises(RuntimeError) as context:
+            self.runner.run()
+        self.assertFalse(to_ast.called)
+        msg = str(context.exception)
+        self.assertIn("Found 3 problems", msg)
+        self.assertIn("Page test2 is missing: /src/de/_pages/test2.md", msg)
+        self.assertIn("Section section-b is missing in language de.", msg)
+        self.assertIn("Section section-2 is missing in language en.", msg)
+
+    def test_check_structure(self, *_):
+        """Test an intact structure."""
+        self.assertEqual(self.runner.check_structure(), [])
+
     def test_run_to_ast_fails(self, *args):
         """Ensure RuntimeError is raised on failed AST conversion."""
         _, _, _, _, _, to_ast, *_ = args
@@ -213,6 +253,18 @@ class TestInnoconvRunner(unittest.TestCase):
         with self.assertRaises(RuntimeError):
             self.runner.run()
 
+    @patch("innoconv.runner.stream_ast", side_effect=stream_ast_side_effect)
+    def test_run_stream(self, stream_ast, *args):
+        """Ensure blocks are written one-by-one in streaming mode."""
+        _, _, _, _, json_dump, to_ast, *_ = args
+        runner = InnoconvRunner("/src", "/out", MANIFEST, [], stream=True)
+        runner.run()
+        self.assertFalse(to_ast.called)
+        self.assertEqual(stream_ast.call_count, 18)
+        self.assertEqual(json_dump.call_count, 36)
+        for dump_call in json_dump.call_args_list:
+            self.assertEqual(dump_call[0][0], BLOCK)
+
     def test_run_no_pages(self, *_):
         """Ensure pages key can be missing from manifest."""
         manifest = Manifest(
@@ -225,6 +277,7 @@ class TestInnoconvRunner(unittest.TestCase):
             self.fail("Exception was raised with missing pages key!")
 
 
+@patch("os.replace")
 @patch("builtins.open")
 @patch("innoconv.runner.EXTENSIONS", {"my_ext": AbstractExtension})
 @patch(
@@ -252,6 +305,130 @@ class TestInnoconvRunnerExtensions(unittest.TestCase):
         with self.assertRaises(RuntimeError):
             InnoconvRunner("/src", "/out", MANIFEST, extensions)
 
+    def test_element_hooks(self, *args):
+        """Ensure element hooks of extensions are passed to to_ast."""
+        *_, to_ast, _, _ = args
+        hook = Mock()
+        with patch(
+            "innoconv.ext.abstract.AbstractExtension.element_hooks",
+            return_value={"Span": hook},
+        ):
+            runner = InnoconvRunner("/src", "/out", MANIFEST, ("my_ext", "my_ext"))
+        runner.run()
+        for to_ast_call in to_ast.call_args_list:
+            self.assertEqual(to_ast_call[1]["element_hooks"], {"Span": [hook, hook]})
+
+    def test_stream_unsupported_ext(self, *_):
+        """Ensure a RuntimeError is raised for extensions without streaming."""
+        with self.assertRaises(RuntimeError):
+            InnoconvRunner("/src", "/out", MANIFEST, ("my_ext",), stream=True)
+
+    @patch("innoconv.runner.stream_ast", side_effect=stream_ast_side_effect)
+    @patch("innoconv.ext.abstract.AbstractExtension._supports_streaming", True)
+    @patch("innoconv.ext.abstract.AbstractExtension.post_process_block")
+    def test_notify_ext_stream(self, post_process_block, *_):
+        """Ensure extensions are notified about every block."""
+        runner = InnoconvRunner("/src", "/out", MANIFEST, ("my_ext",), stream=True)
+        runner.run()
+        self.assertEqual(post_process_block.call_count, 36)
+        self.assertEqual(post_process_block.call_args_list[0], call(BLOCK, "section"))
+        self.assertEqual(post_process_block.call_args_list[10], call(BLOCK, "page"))
+        self.assertEqual(post_process_block.call_args_list[14], call(BLOCK, "fragment"))
+
+    def test_instrumentation(self, *_):
+        """Ensure files, pandoc runs and extension events are measured."""
+        recorder = Mock()
+        add_recorder(recorder)
+        try:
+            runner = InnoconvRunner("/src", "/out", MANIFEST, ("my_ext",))
+            runner.run()
+        finally:
+            remove_recorder(recorder)
+        spans = [c[0][0] for c in recorder.span_finished.call_args_list]
+        events = [c[0] for c in recorder.event_recorded.call_args_list]
+        self.assertEqual(len(events), 18)
+        self.assertEqual(events[0][0], "file_written")
+        self.assertEqual(events[0][1]["path"], "de/content.md")
+        self.assertEqual(events[0][1]["output"], "/out/de/content.json")
+        names = [(s.category, s.name, s.path) for s in spans]
+        self.assertEqual(names[0], ("extension", "my_ext.extension_list", None))
+        self.assertIn(("extension", "my_ext.start", None), names)
+        self.assertIn(
+            ("extension", "my_ext.post_process_file", "de/section-1/content.md"),
+            names,
+        )
+        self.assertIn(("pandoc", "pandoc", "de/section-1/content.md"), names)
+        self.assertIn(
+            ("file", "de/section-1/content.md", "de/section-1/content.md"), names
+        )
+        self.assertEqual(names[-3], ("extension", "my_ext.finish", None))
+        self.assertEqual(names[-2], ("runner", "finish", None))
+        self.assertEqual(names[-1], ("runner", "run", None))
+        self.assertEqual(len([n for n in names if n[0] == "file"]), 18)
+        phases = [s.name for s in spans if s.category == "runner"]
+        self.assertEqual(
+            phases,
+            ["preflight", "start"]
+            + ["pre_conversion", "convert", "post_conversion"] * 2
+            + ["finish", "run"],
+        )
+        self.assertEqual(
+            spans[names.index(("runner", "convert", None))].args, {"language": "de"}
+        )
+
+    def test_instrumentation_element_hooks(self, *args):
+        """Ensure element hooks are measured per extension and file."""
+        *_, to_ast, _, _ = args
+
+        def to_ast_hooked(*_, element_hooks, **__):
+            for hook in element_hooks["Span"]:
+                hook({"t": "Span"})
+                hook({"t": "Span"})
+            return ["content_ast"], TITLE, SHORT_TITLE, SECTION_TYPE
+
+        to_ast.side_effect = to_ast_hooked
+        hook = Mock()
+        recorder = Mock()
+        with patch(
+            "innoconv.ext.abstract.AbstractExtension.element_hooks",
+            return_value={"Span": hook},
+        ):
+            runner = InnoconvRunner("/src", "/out", MANIFEST, ("my_ext",))
+        add_recorder(recorder)
+        try:
+            runner.run()
+        finally:
+            remove_recorder(recorder)
+        self.assertEqual(hook.call_count, 36)
+        spans = [c[0][0] for c in recorder.span_finished.call_args_list]
+        hook_spans = [s for s in spans if s.name == "my_ext.element_hooks"]
+        self.assertEqual(len(hook_spans), 18)
+        self.assertEqual(hook_spans[0].category, "extension")
+        self.assertEqual(hook_spans[0].path, "de/content.md")
+        self.assertEqual(hook_spans[0].args, {"calls": 2})
+        # hook time is reported within the pandoc span
+        names = [(s.category, s.name, s.path) for s in spans]
+        self.assertEqual(
+            names.index(("extension", "my_ext.element_hooks", "de/content.md")) + 1,
+            names.index(("pandoc", "pandoc", "de/content.md")),
+        )
+
+    @patch("innoconv.runner.stream_ast", side_effect=stream_ast_side_effect)
+    @patch("innoconv.ext.abstract.AbstractExtension._supports_streaming", True)
+    def test_instrumentation_stream(self, *_):
+        """Ensure pandoc runs are measured in streaming mode."""
+        recorder = Mock()
+        add_recorder(recorder)
+        try:
+            runner = InnoconvRunner("/src", "/out", MANIFEST, ("my_ext",), stream=True)
+            runner.run()
+        finally:
+            remove_recorder(recorder)
+        spans = [c[0][0] for c in recorder.span_finished.call_args_list]
+        names = [(s.category, s.name, s.path) for s in spans]
+        self.assertEqual(len([n for n in names if n[0] == "pandoc"]), 18)
+        self.assertIn(("pandoc", "pandoc", "de/section-1/content.md"), names)
+
     @patch.multiple(
         "innoconv.ext.abstract.AbstractExtension",
         start=DEFAULT,
@@ -336,3 +513,430 @@ class TestInnoconvRunnerExtensions(unittest.TestCase):
         self.assertEqual(mocks["post_conversion"].call_args_list[1], call("en"))
 
         self.assertEqual(mocks["finish"].call_count, 1)
+
+
+class BuildTestCase(unittest.TestCase):
+    """Base class for tests that build content in a temporary directory."""
+
+    #: Languages of the course
+    LANGUAGES = ("en",)
+    #: Extensions used by default
+    EXTENSIONS = ()
+
+    def setUp(self):
+        """Create source and output directory and the course manifest."""
+        self._tmp_dir = TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.source_dir = join(self._tmp_dir.name, "src")
+        self.output_dir = join(self._tmp_dir.name, "out")
+        titles = {"en": "Title", "de": "Titel"}
+        self.manifest = Manifest(
+            {
+                "title": {lang: titles[lang] for lang in self.LANGUAGES},
+                "languages": self.LANGUAGES,
+                "min_score": 90,
+            }
+        )
+
+    def tearDown(self):
+        """Remove directories."""
+        self._tmp_dir.cleanup()
+
+    def _write(self, path, content="# Foo"):
+        path = join(self.source_dir, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as out_file:
+            out_file.write(content)
+
+    def _get_runner(self, extensions=None, output_dir=None, resume=False, **kwargs):
+        """Create a runner using the dependency graph of the previous build."""
+        if extensions is None:
+            extensions = self.EXTENSIONS
+        output_dir = output_dir or self.output_dir
+        depgraph = DependencyGraph.load(self.source_dir, output_dir, resume=resume)
+        return InnoconvRunner(
+            self.source_dir,
+            output_dir,
+            self.manifest,
+            extensions,
+            depgraph=depgraph,
+            **kwargs,
+        )
+
+    def _exists(self, path):
+        return exists(join(self.output_dir, path))
+
+
+@patch(
+    "innoconv.runner.to_ast",
+    return_value=(["content_ast"], TITLE, "Short", "test"),
+)
+class TestInnoconvRunnerDependencyGraph(BuildTestCase):
+    """Test incremental builds using a dependency graph."""
+
+    def setUp(self):
+        """Create content directory."""
+        super().setUp()
+        for path in ("content.md", "section-1/content.md", "section-2/content.md"):
+            self._write(join("en", path))
+
+    def test_plan_initial(self, _):
+        """Test planning the first build."""
+        self.assertEqual(
+            self._get_runner().plan(),
+            {
+                "en/content.json": "new",
+                "en/section-1/content.json": "new",
+                "en/section-2/content.json": "new",
+            },
+        )
+
+    def test_up_to_date(self, to_ast):
+        """Ensure an unchanged build is skipped."""
+        self._get_runner().run()
+        self.assertEqual(to_ast.call_count, 3)
+        self.assertEqual(self._get_runner().plan(), {})
+        self._get_runner().run()
+        self.assertEqual(to_ast.call_count, 3)
+
+    def test_changed(self, to_ast):
+        """Test planning and building after a content file changed."""
+        self._get_runner().run()
+        self._write("en/section-1/content.md", "# Bar")
+        self.assertEqual(
+            self._get_runner().plan(),
+            {"en/section-1/content.json": "changed: en/section-1/content.md"},
+        )
+        self._get_runner().run()
+        self.assertEqual(to_ast.call_count, 4)
+        self.assertEqual(self._get_runner().plan(), {})
+
+    def test_section_removed(self, _):
+        """Ensure outputs of removed sections are removed."""
+        self._get_runner().run()
+        os.remove(join(self.source_dir, "en", "section-2", "content.md"))
+        os.rmdir(join(self.source_dir, "en", "section-2"))
+        self.assertEqual(
+            self._get_runner().plan(),
+            {"en/section-2/content.json": "removed: en/section-2/content.md"},
+        )
+        self._get_runner().run()
+        self.assertFalse(self._exists("en/section-2"))
+        self.assertTrue(self._exists("en/section-1/content.json"))
+        self.assertEqual(self._get_runner().plan(), {})
+
+    def test_section_added(self, to_ast):
+        """Ensure only a new section is converted."""
+        self._get_runner().run()
+        self._write("en/section-3/content.md")
+        self.assertEqual(
+            self._get_runner().plan(), {"en/section-3/content.json": "new"}
+        )
+        self._get_runner().run()
+        self.assertEqual(to_ast.call_count, 4)
+
+    def test_static_file_shadowed(self, to_ast):
+        """Ensure adding or removing a localized static file is detected."""
+        to_ast.side_effect = to_ast_image
+        for path in ("content.md", "section-1/content.md", "section-2/content.md"):
+            self._write(join("en", path), "/pic.png")
+        self._write("_static/pic.png", "PNG")
+        self._get_runner(["copy_static"]).run()
+        for action, reason, url in (
+            ("added", "added: en/_static/pic.png", "_en/pic.png"),
+            ("removed", "removed: en/_static/pic.png", "pic.png"),
+        ):
+            with self.subTest(action):
+                if action == "added":
+                    self._write("en/_static/pic.png", "PNG")
+                else:
+                    os.remove(join(self.source_dir, "en", "_static", "pic.png"))
+                planned = self._get_runner(["copy_static"]).plan()
+                content = [o for o in planned if o.endswith("content.json")]
+                self.assertEqual(len(content), 3)
+                self.assertEqual({planned[output] for output in content}, {reason})
+                self._get_runner(["copy_static"]).run()
+                path = join(self.output_dir, "en", "section-1", "content.json")
+                with open(path, encoding="utf-8") as in_file:
+                    self.assertEqual(json.load(in_file)[0]["c"][0]["c"][2][0], url)
+
+    def test_extensions_changed(self, _):
+        """Ensure everything is rebuilt if extensions change."""
+        self._get_runner().run()
+        planned = self._get_runner(["join_strings"]).plan()
+        self.assertEqual(len(planned), 3)
+        self.assertEqual(set(planned.values()), {"changed: extensions"})
+
+    def test_unchanged_output(self, to_ast):
+        """Ensure outputs with unchanged content are not rewritten."""
+        self._get_runner().run()
+        path = join(self.output_dir, "en", "section-1", "content.json")
+        os.utime(path, ns=(0, 0))
+        self._write("en/section-1/content.md", "# Bar")
+        recorder = Mock()
+        add_recorder(recorder)
+        try:
+            self._get_runner().run()
+        finally:
+            remove_recorder(recorder)
+        self.assertEqual(to_ast.call_count, 4)
+        self.assertEqual(os.stat(path).st_mtime_ns, 0)
+        events = [c[0][0] for c in recorder.event_recorded.call_args_list]
+        self.assertEqual(events.count("file_unchanged"), 1)
+        self.assertEqual(events.count("file_skipped"), 2)
+        self.assertNotIn("file_written", events)
+
+    def test_plan_without_depgraph(self, _):
+        """Ensure planning requires a dependency graph."""
+        runner = InnoconvRunner(self.source_dir, self.output_dir, self.manifest, [])
+        with self.assertRaises(RuntimeError):
+            runner.plan()
+
+
+def to_ast_title(filepath, **_):
+    """Return the file content as title."""
+    with open(filepath, encoding="utf-8") as in_file:
+        title = in_file.read()
+    return ["content_ast"], title, title, None
+
+
+@patch("innoconv.runner.to_ast", side_effect=to_ast_title)
+class TestInnoconvRunnerPartial(BuildTestCase):
+    """Test partial builds of sections and languages."""
+
+    EXTENSIONS = ("generate_toc", "write_manifest")
+    LANGUAGES = ("en", "de")
+
+    def setUp(self):
+        """Create content directory with two languages."""
+        super().setUp()
+        for lang in self.LANGUAGES:
+            for path in ("", "section-1", "section-1/section-1.1", "section-2"):
+                self._write_section(lang, path, f"{lang} {path}")
+
+    def _write_section(self, lang, path, content):
+        self._write(join(lang, path, "content.md"), content)
+
+    def _run(self, **kwargs):
+        self._get_runner(**kwargs).run()
+
+    def _get_toc_titles(self):
+        with open(join(self.output_dir, "manifest.json"), encoding="utf-8") as in_file:
+            toc = json.load(in_file)["toc"]
+        return [section["title"]["en"] for section in toc]
+
+    def _converted(self, to_ast):
+        return sorted(relpath(c[0][0], self.source_dir) for c in to_ast.call_args_list)
+
+    def test_only(self, to_ast):
+        """Ensure only the selected section and its subsections are converted."""
+        self._run()
+        to_ast.reset_mock()
+        for path in ("section-1", "section-1/section-1.1", "section-2"):
+            self._write_section("en", path, f"changed {path}")
+        self._run(only="/section-1/")
+        self.assertEqual(
+            self._converted(to_ast),
+            ["en/section-1/content.md", "en/section-1/section-1.1/content.md"],
+        )
+        self.assertEqual(self._get_toc_titles(), ["changed section-1", "en section-2"])
+        # previous build state is kept
+        self.assertEqual(len(self._get_runner().plan()), 4)
+
+    def test_languages(self, to_ast):
+        """Ensure only selected languages are converted."""
+        self._run()
+        to_ast.reset_mock()
+        self._write_section("en", "section-2", "changed")
+        self._write_section("de", "section-2", "geändert")
+        self._run(languages=["de"])
+        self.assertEqual(self._converted(to_ast), ["de/section-2/content.md"])
+        self.assertEqual(self._get_toc_titles(), ["en section-1", "en section-2"])
+
+    def test_structure_checks(self, _):
+        """Ensure the structure of all languages is still checked."""
+        self._run()
+        self._write_section("de", "section-3", "extra")
+        with self.assertRaises(RuntimeError):
+            self._run(only="section-1")
+
+    def test_no_previous_build(self, _):
+        """Ensure partial builds require a previous build."""
+        with self.assertRaises(RuntimeError):
+            self._run(only="section-1")
+
+    def test_invalid_selection(self, _):
+        """Ensure unknown languages and sections are rejected."""
+        self._run()
+        with self.assertRaises(RuntimeError):
+            self._run(languages=["fr"])
+        with self.assertRaises(RuntimeError):
+            self._run(only="section-3")
+        with self.assertRaises(RuntimeError):
+            self._run(only="section-1/content.md")
+
+    def test_without_depgraph(self, _):
+        """Ensure partial builds require a dependency graph."""
+        with self.assertRaises(RuntimeError):
+            InnoconvRunner(
+                self.source_dir, self.output_dir, self.manifest, [], only="section-1"
+            )
+
+
+def to_ast_image(filepath, **_):
+    """Return an image referencing the file content (or fail if it's invalid)."""
+    with open(filepath, encoding="utf-8") as in_file:
+        src = in_file.read()
+    if src == "invalid":
+        raise RuntimeError("Pandoc failed")
+    image = {"t": "Image", "c": [["", [], []], [], [src, ""]]}
+    return [{"t": "Para", "c": [image]}], src, src, None
+
+
+@patch("innoconv.runner.to_ast", side_effect=to_ast_image)
+class TestInnoconvRunnerKeepGoing(BuildTestCase):
+    """Test collecting errors and continuing a build."""
+
+    EXTENSIONS = ("copy_static", "generate_toc", "write_manifest")
+
+    def setUp(self):
+        """Create content with a missing static file and an invalid file."""
+        super().setUp()
+        self._write("en/content.md", "/ok.png")
+        self._write("en/_static/ok.png", "PNG")
+        self._write("en/section-1/content.md", "missing.png")
+        self._write("en/section-2/content.md", "invalid")
+        self._write("en/section-3/content.md", "/ok.png")
+
+    def _run(self, keep_going=True):
+        self._get_runner(keep_going=keep_going).run()
+
+    def test_keep_going(self, to_ast):
+        """Ensure all errors are reported and the remaining files are converted."""
+        with self.assertRaises(RuntimeError) as context:
+            self._run()
+        self.assertEqual(
+            str(context.exception),
+            "Found 2 errors:\n"
+            " - en/section-1/content.md: Missing static file missing.png\n"
+            " - en/section-2/content.md: Pandoc failed",
+        )
+        self.assertEqual(to_ast.call_count, 4)
+        self.assertTrue(self._exists("en/content.json"))
+        self.assertTrue(self._exists("en/section-3/content.json"))
+        self.assertTrue(self._exists("_static/_en/ok.png"))
+        self.assertTrue(self._exists("manifest.json"))
+        # files with errors are not written
+        self.assertFalse(self._exists("en/section-1/content.json"))
+        self.assertFalse(self._exists("en/section-2/content.json"))
+        # extensions don't see files that failed to convert
+        with open(join(self.output_dir, "manifest.json"), encoding="utf-8") as file:
+            toc = json.load(file)["toc"]
+        self.assertEqual([child["id"] for child in toc], ["section-1", "section-3"])
+
+        # only files with errors are converted again
+        to_ast.reset_mock()
+        self._write("en/_static/section-1/missing.png", "PNG")
+        self._write("en/section-2/content.md", "/ok.png")
+        self._run()
+        self.assertEqual(
+            sorted(relpath(c[0][0], self.source_dir) for c in to_ast.call_args_list),
+            ["en/section-1/content.md", "en/section-2/content.md"],
+        )
+        self.assertTrue(self._exists("_static/_en/section-1/missing.png"))
+
+    def test_without_keep_going(self, to_ast):
+        """Ensure the first error aborts the build."""
+        with self.assertRaises(RuntimeError) as context:
+            self._run(keep_going=False)
+        self.assertEqual(str(context.exception), "Missing static file missing.png")
+        self.assertEqual(to_ast.call_count, 2)
+        self.assertFalse(self._exists("manifest.json"))
+
+
+def to_ast_cards(filepath, element_hooks, **_):
+    """Return an AST with a number of cards (file content) and index terms."""
+    with open(filepath, encoding="utf-8") as in_file:
+        num = int(in_file.read())
+    term = {
+        "t": "Span",
+        "c": [["", [], [["data-index-term", "Term"]]], [{"t": "Str", "c": "Term"}]],
+    }
+    card = {"t": "Div", "c": [["", ["info"], []], [{"t": "Para", "c": [term]}]]}
+    object_hook = make_object_hook(element_hooks)
+    ast = json.loads(json.dumps([card] * num), object_hook=object_hook)
+    return ast, f"Title {filepath}", "Short", None
+
+
+@patch("innoconv.runner.to_ast", side_effect=to_ast_cards)
+class TestInnoconvRunnerContributions(BuildTestCase):
+    """Test replaying cached extension contributions."""
+
+    EXTENSIONS = ("generate_toc", "index_terms", "number_cards", "write_manifest")
+    LANGUAGES = ("en", "de")
+
+    def setUp(self):
+        """Create content directory."""
+        super().setUp()
+        for path in ("", "01", "01/01", "01/01/01", "01/02", "02"):
+            self._write_languages(join(path, "content.md"), "2")
+
+    def _write_languages(self, path, content):
+        for language in self.LANGUAGES:
+            self._write(join(language, path), content)
+
+    def _build(self, output_name, resume=False):
+        output_dir = join(self._tmp_dir.name, output_name)
+        self._get_runner(output_dir=output_dir, resume=resume).run()
+        outputs = {}
+        for root, dirs, files in os.walk(output_dir):
+            dirs[:] = [name for name in dirs if name != BUILD_STATE_FOLDER]
+            for filename in files:
+                path = join(root, filename)
+                with open(path, encoding="utf-8") as in_file:
+                    outputs[relpath(path, output_dir)] = in_file.read()
+        return outputs
+
+    def test_same_output(self, to_ast):
+        """Ensure an incremental build has the same output as a full build."""
+        self._build("incremental")
+        self.assertEqual(to_ast.call_count, 12)
+        # numbering of the following subsection changes too
+        self._write_languages(join("01", "01", "content.md"), "3")
+        incremental = self._build("incremental")
+        self.assertEqual(to_ast.call_count, 16)
+        self.assertEqual(incremental, self._build("full"))
+        self.assertIn('"cards"', incremental["manifest.json"])
+        self.assertIn('"indexTerms"', incremental["manifest.json"])
+        self.assertIn("1.1.5", incremental["en/01/01/01/content.json"])
+
+    def test_resume(self, to_ast):
+        """Ensure a resumed build has the same output as a full build."""
+
+        def interrupt(filepath, **kwargs):
+            if to_ast.call_count > 7:
+                raise RuntimeError("Interrupted")
+            return to_ast_cards(filepath, **kwargs)
+
+        to_ast.side_effect = interrupt
+        with self.assertRaises(RuntimeError):
+            self._build("resumed")
+        to_ast.side_effect = to_ast_cards
+        resumed = self._build("resumed", resume=True)
+        self.assertEqual(to_ast.call_count, 8 + 5)
+        self.assertEqual(resumed, self._build("full"))
+        journal = join(
+            self._tmp_dir.name, "resumed", BUILD_STATE_FOLDER, "journal.ndjson"
+        )
+        self.assertFalse(exists(journal))
+
+    def test_resume_finish(self, to_ast):
+        """Ensure a build interrupted after converting all files is finished."""
+        with patch(
+            "innoconv.ext.write_manifest.WriteManifest.finish",
+            side_effect=RuntimeError("Interrupted"),
+        ):
+            with self.assertRaises(RuntimeError):
+                self._build("resumed")
+        resumed = self._build("resumed", resume=True)
+        self.assertEqual(to_ast.call_count, 12)
+        self.assertIn("manifest.json", resumed)
@@ -3,14 +3,25 @@
 import unittest
 from unittest.mock import call, Mock
 
-from innoconv.traverse_ast import IgnoreSubtreeError, TraverseAst
+from innoconv.traverse_ast import (
+    apply_edits,
+    AstEditor,
+    Edit,
+    ElementIndex,
+    IgnoreSubtreeError,
+    RewriteAst,
+    TraverseAst,
+)
 from .utils import (
     get_bullet_list_ast,
     get_definitionlist_ast,
     get_div_ast,
+    get_filler_content,
     get_header_ast,
+    get_image_ast,
     get_ordered_list_ast,
     get_para_ast,
+    get_plain_ast,
     get_table_ast,
 )
 
@@ -111,3 +122,165 @@ class TestTraverseAst(unittest.TestCase):
         traverse_ast.traverse(ast)
         self.assertEqual(callback_mock.call_count, 1)
         self.assertEqual(callback_mock.call_args_list[0], call(ast[0], None))
+
+
+class TestElementIndex(unittest.TestCase):
+    """Test the ElementIndex class."""
+
+    def setUp(self):
+        """Create an AST and index."""
+        self.div_a = get_div_ast([get_para_ast()], classes=["a"])
+        self.div_b = get_div_ast([self.div_a], classes=["b"])
+        self.ast = [get_para_ast(), self.div_b]
+        self.index = ElementIndex(self.ast)
+
+    def test_find(self):
+        """Test finding elements by type and class."""
+        self.assertEqual(
+            self.index.find("Div"), [(self.div_b, None), (self.div_a, self.div_b)]
+        )
+        self.assertEqual(self.index.find("Div", "a"), [(self.div_a, self.div_b)])
+        self.assertEqual(self.index.find("Div", "c"), [])
+        self.assertEqual(len(self.index.find("Para")), 2)
+        self.assertEqual(self.index.find("Image"), [])
+
+    def test_get_parent(self):
+        """Test parent lookup."""
+        self.assertIs(self.index.get_parent(self.div_a), self.div_b)
+        self.assertIsNone(self.index.get_parent(self.div_b))
+        with self.assertRaises(KeyError):
+            self.index.get_parent(get_para_ast())
+
+    def test_add_remove(self):
+        """Ensure index is updated on insertion and removal."""
+        self.index.find("Div")
+        para = self.div_a["c"][1].pop(0)
+        self.index.remove(para)
+        self.assertEqual(len(self.index.find("Para")), 1)
+        self.assertEqual(len(self.index.find("Str")), 1)
+        image = get_image_ast("foo.png")
+        self.div_a["c"][1].append(image)
+        self.index.add(image, self.div_a)
+        self.assertEqual(self.index.find("Image"), [(image, self.div_a)])
+        # added elements come last
+        para = get_para_ast()
+        self.ast.insert(0, para)
+        self.index.add(para, None)
+        self.assertIs(self.index.find("Para")[-1][0], para)
+
+    def test_update(self):
+        """Ensure an element that changed type is re-indexed."""
+        self.index.find("Div")
+        self.div_a["t"] = "Span"
+        self.div_a["c"][1] = [get_filler_content()]
+        self.index.update(self.div_a, "Div")
+        self.assertEqual(self.index.find("Div"), [(self.div_b, None)])
+        self.assertEqual(self.index.find("Span", "a"), [(self.div_a, self.div_b)])
+        self.assertIs(self.index.get_parent(self.div_a["c"][1][0]), self.div_a)
+
+    def test_invalidate(self):
+        """Ensure index is rebuilt after invalidation."""
+        self.index.find("Div")
+        self.ast.append(get_div_ast())
+        self.assertEqual(len(self.index.find("Div")), 2)
+        self.index.invalidate()
+        self.assertEqual(len(self.index.find("Div")), 3)
+
+
+def get_str(text):
+    """Create Str element."""
+    return {"t": "Str", "c": text}
+
+
+class TestEdits(unittest.TestCase):
+    """Test deferred AST edits."""
+
+    def test_apply_edits(self):
+        """Test all edit types in a single rebuild."""
+        ast = [get_str("A"), get_str("B"), get_str("C"), get_str("D")]
+        edits = {
+            id(ast[0]): Edit.insert_before(get_str("0")),
+            id(ast[1]): Edit.delete(),
+            id(ast[2]): Edit.replace(get_str("X"), get_str("Y")),
+            id(ast[3]): Edit.insert_after(get_str("E")),
+        }
+        ast_id = id(ast)
+        apply_edits(ast, edits)
+        self.assertEqual(id(ast), ast_id)
+        self.assertEqual([e["c"] for e in ast], ["0", "A", "X", "Y", "D", "E"])
+
+    def test_merge(self):
+        """Test merging edits of the same element."""
+        edit = Edit.insert_before(get_str("0")).merge(Edit.replace(get_str("X")))
+        ast = [get_str("A")]
+        apply_edits(ast, {id(ast[0]): edit})
+        self.assertEqual([e["c"] for e in ast], ["0", "X"])
+
+    def test_rewrite_ast(self):
+        """Test edits returned from the traversal callback."""
+
+        def callback(elem, _):
+            if elem["t"] == "Str" and elem["c"] == "del":
+                return Edit.delete()
+            if elem["t"] == "Div":
+                return Edit.replace(get_para_ast())
+            return None
+
+        callback_mock = Mock(side_effect=callback)
+        ast = [
+            get_para_ast([get_str("keep"), get_str("del"), get_str("del")]),
+            get_para_ast(get_str("del")),
+            get_div_ast([get_para_ast()]),
+        ]
+        RewriteAst(callback_mock).traverse(ast)
+        self.assertEqual(ast[0]["c"], [get_str("keep")])
+        self.assertEqual(ast[1]["c"], [])
+        self.assertEqual(ast[2], get_para_ast())
+        # replaced div was not descended into
+        self.assertEqual(callback_mock.call_count, 7)
+
+    def test_ast_editor(self):
+        """Test edits located via parents with index update."""
+        caption = get_para_ast()
+        code = {"t": "CodeBlock", "c": [["", [], []], "code"]}
+        div = get_div_ast([caption, code], classes=["figure"])
+        ast = [get_str("top"), div]
+        index = ElementIndex(ast)
+        index.find("Div")
+        image = get_image_ast("foo.png")
+        image["c"][1] = caption["c"]
+
+        editor = AstEditor(ast, index)
+        editor.edit(code, div, Edit.replace(image))
+        editor.edit(caption, div, Edit.delete())
+        editor.edit(ast[0], None, Edit.delete())
+        editor.apply()
+
+        self.assertEqual(ast, [div])
+        self.assertEqual(div["c"][1], [image])
+        self.assertEqual(index.find("CodeBlock"), [])
+        self.assertEqual(index.find("Para"), [])
+        self.assertEqual(index.find("Image"), [(image, div)])
+        self.assertEqual(index.find("Str"), [(image["c"][1][0], image)])
+
+    def test_ast_editor_lists(self):
+        """Test edits of many children in several lists of one parent."""
+        items = [[get_plain_ast([get_str(str(i))])] for i in range(4)]
+        bullet_list = {"t": "BulletList", "c": items}
+        quote = {"t": "BlockQuote", "c": get_para_ast()}
+        ast = [bullet_list, quote]
+        editor = AstEditor(ast)
+        for item in items:
+            editor.edit(item[0], bullet_list, Edit.insert_after(get_para_ast()))
+        editor.edit(quote["c"], quote, Edit.replace(get_str("X"), get_str("Y")))
+        editor.apply()
+        self.assertEqual([len(item) for item in items], [2, 2, 2, 2])
+        self.assertEqual(bullet_list["c"], items)
+        self.assertEqual(quote["c"], [get_str("X"), get_str("Y")])
+
+    def test_ast_editor_not_found(self):
+        """Ensure ValueError is raised for elements not found in parent."""
+        editor = AstEditor([get_para_ast()])
+        editor.edit(get_str("A"), get_para_ast(), Edit.delete())
+        with self.assertRaises(ValueError):
+            editor.apply()
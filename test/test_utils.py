@@ -1,9 +1,15 @@
 """Unit tests for innoconv.utils."""
 
+from importlib.util import find_spec
+from io import BytesIO
+import os
+from os.path import exists, join
+import sys
+from tempfile import TemporaryDirectory
 import unittest
-from unittest.mock import MagicMock, Mock, patch
+from unittest.mock import call, MagicMock, Mock, patch
 
-from innoconv.utils import to_ast
+from innoconv.utils import ANY_ELEMENT, stream_ast, to_ast, write_if_changed
 
 
 def patch_popen(returncode=0, output=""):
@@ -11,7 +17,7 @@ def patch_popen(returncode=0, output=""):
 
     def decorator(func):
         @patch(
-            target="innoconv.utils.Popen",
+            target="innoconv.utils.MeasuredPopen",
             return_value=MagicMock(
                 __enter__=Mock(
                     return_value=Mock(
@@ -96,3 +102,152 @@ class TestToAst(unittest.TestCase):
         _, __, ___, section_type = to_ast("/some/document.md")
         self.assertTrue(popen_mock.called)
         self.assertEqual(section_type, "exercises")
+
+    @patch_popen(
+        output=(
+            '{"blocks":[{"t":"Para","c":[{"t":"Str","c":"A"}]}],'
+            '"meta":{"title":{"t":"MetaInlines","c":[]}}}'
+        )
+    )
+    def test_element_hooks(self, _):
+        """Ensure element hooks are called bottom-up while decoding."""
+        str_hook = Mock()
+        any_hook = Mock()
+        element_hooks = {"Str": [str_hook], ANY_ELEMENT: [any_hook]}
+        blocks, *_ = to_ast("/some/document.md", element_hooks=element_hooks)
+        para = blocks[0]
+        self.assertEqual(str_hook.call_args_list, [call(para["c"][0])])
+        self.assertEqual(
+            any_hook.call_args_list,
+            [call(para["c"][0]), call(para), call({"t": "MetaInlines", "c": []})],
+        )
+
+
+def patch_popen_stream(returncode=0, output=""):
+    """Patch Popen with custom return code and streamed stdout output."""
+    return patch(
+        target="innoconv.utils.MeasuredPopen",
+        return_value=MagicMock(
+            __enter__=Mock(
+                return_value=Mock(
+                    returncode=returncode,
+                    stdout=BytesIO(output.encode()),
+                    wait=Mock(),
+                )
+            )
+        ),
+    )
+
+
+@unittest.skipIf(find_spec("ijson") is None, "ijson is not installed")
+class TestStreamAst(unittest.TestCase):
+    """Test stream_ast() utility function mocking away pandoc functionality."""
+
+    @patch_popen_stream(
+        output=(
+            '{"pandoc-api-version":[1,22],'
+            '"meta":{"title":{"t":"MetaInlines","c":[{"t":"Str","c":"Test"},'
+            '{"t":"Space"},{"t":"Str","c":"Title"}]}},'
+            '"blocks":[{"t":"Para","c":[{"t":"Str","c":"A"}]},'
+            '{"t":"Plain","c":[{"t":"Str","c":"B"}]}]}'
+        )
+    )
+    def test_stream_ast(self, popen_mock):
+        """Ensure blocks are yielded one-by-one and hooks are called."""
+        hook = Mock()
+        with stream_ast("/some/document.md", element_hooks={"Para": [hook]}) as res:
+            blocks, title, short_title, section_type = res
+            self.assertEqual(next(blocks), {"t": "Para", "c": [{"t": "Str", "c": "A"}]})
+            self.assertEqual(hook.call_count, 1)
+            self.assertEqual(
+                list(blocks), [{"t": "Plain", "c": [{"t": "Str", "c": "B"}]}]
+            )
+        self.assertTrue(popen_mock.called)
+        self.assertEqual(title, "Test Title")
+        self.assertEqual(short_title, "Test Title")
+        self.assertIsNone(section_type)
+
+    @patch_popen_stream(
+        output=(
+            '{"blocks":[{"t":"Para","c":[]}],'
+            '"meta":{"title":{"t":"MetaInlines","c":[{"t":"Str","c":"Test"}]}}}'
+        )
+    )
+    def test_stream_ast_meta_last(self, _):
+        """Ensure blocks are buffered if meta block comes last."""
+        with stream_ast("/some/document.md") as (blocks, title, *_):
+            self.assertEqual(title, "Test")
+            self.assertEqual(list(blocks), [{"t": "Para", "c": []}])
+
+    @patch_popen_stream(returncode=255)
+    def test_stream_ast_fails(self, _):
+        """Ensure a RuntimeError is raised when pandoc fails."""
+        with self.assertRaises(RuntimeError):
+            with stream_ast("/some/document.md"):
+                pass
+
+    @patch_popen_stream(output='{"blocks":[{"t":"Para","c":[]}],"meta":{}}')
+    def test_stream_ast_fails_without_title(self, _):
+        """Ensure a ValueError is raised when title is missing."""
+        with self.assertRaises(ValueError):
+            with stream_ast("/some/document.md"):
+                pass
+
+    @patch.dict(sys.modules, {"ijson": None})
+    def test_stream_ast_without_ijson(self):
+        """Ensure a RuntimeError is raised when ijson is missing."""
+        with self.assertRaisesRegex(RuntimeError, r"innoconv\[stream\]"):
+            with stream_ast("/some/document.md"):
+                pass
+
+
+class TestWriteIfChanged(unittest.TestCase):
+    """Test writing files only if their content changed."""
+
+    def setUp(self):
+        """Create a file."""
+        self._tmp_dir = TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.path = join(self._tmp_dir.name, "content.json")
+        self.assertEqual(
+            write_if_changed(self.path, lambda out_file: out_file.write("[1]")),
+            (True, 3),
+        )
+        os.utime(self.path, ns=(0, 0))
+
+    def tearDown(self):
+        """Remove directory."""
+        self._tmp_dir.cleanup()
+
+    def _read(self):
+        with open(self.path, encoding="utf-8") as in_file:
+            return in_file.read()
+
+    def test_unchanged(self):
+        """Ensure an identical file is left untouched."""
+        self.assertEqual(
+            write_if_changed(self.path, lambda out_file: out_file.write("[1]")),
+            (False, 3),
+        )
+        self.assertEqual(os.stat(self.path).st_mtime_ns, 0)
+        self.assertFalse(exists(f"{self.path}.tmp"))
+
+    def test_changed(self):
+        """Ensure a file with different content is replaced."""
+        self.assertEqual(
+            write_if_changed(self.path, lambda out_file: out_file.write("[2]")),
+            (True, 3),
+        )
+        self.assertEqual(self._read(), "[2]")
+        self.assertNotEqual(os.stat(self.path).st_mtime_ns, 0)
+
+    def test_write_fails(self):
+        """Ensure the existing file is kept if writing fails."""
+
+        def write(out_file):
+            out_file.write("[2")
+            raise ValueError("Failed")
+
+        with self.assertRaises(ValueError):
+            write_if_changed(self.path, write)
+        self.assertEqual(self._read(), "[1]")
+        self.assertFalse(exists(f"{self.path}.tmp"))